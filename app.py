@@ -12,12 +12,13 @@
 技术栈：Flask + HTML5 + CSS3 + JavaScript + Chart.js
 """
 
-from flask import Flask, render_template, request, jsonify, send_from_directory
+from flask import Flask, render_template, request, jsonify, send_from_directory, Response, stream_with_context
 from flask_cors import CORS
 import os
 import sys
 import traceback
 import json
+import base64
 from flask.json.provider import JSONProvider
 from datetime import datetime
 import pandas as pd
@@ -28,8 +29,11 @@ sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
 
 # 导入算法模块
 from src.pke import ecc_scheme, elgamal_scheme, sm2_scheme
-from src.ibe import get_scheme as get_ibe_scheme, list_schemes as list_ibe_schemes
+from src.ibe import get_scheme as get_ibe_scheme, list_schemes as list_ibe_schemes, key_cache_info as ibe_key_cache_info
+from src.ibe.bulk_extract import max_workers as ibe_max_workers
+from src.ibe.key_store import default_store_dir as ibe_key_store_dir
 from src.utils.dataset_manager import DatasetManager
+from src.utils.bigint_backend import backend_info as bigint_backend_info
 
 # --- 最终修复：正确的自定义JSON序列化 ---
 class CustomJSONProvider(JSONProvider):
@@ -125,6 +129,7 @@ def get_pke_schemes():
     """获取支持的PKE方案列表"""
     return jsonify({
         'schemes': ['ECC', 'ElGamal', 'SM2'],
+        'arithmetic_backend': bigint_backend_info(),
         'status': 'success'
     })
 
@@ -133,6 +138,7 @@ def get_ibe_schemes():
     """获取支持的IBE方案列表"""
     return jsonify({
         'schemes': list_ibe_schemes(),
+        'key_cache': ibe_key_cache_info(),
         'status': 'success'
     })
 
@@ -228,7 +234,11 @@ def pke_generate_keys():
                 'public_key': public_key
             }
         elif scheme == 'ELGAMAL':
-            private_key, public_key = elgamal_scheme.generate_keys()
+            # 默认使用内置群参数（ffdhe2048），可通过parameter_set指定其他参数集，
+            # subgroup=True 时使用256位素数阶子群模式
+            parameter_set = data.get('parameter_set')
+            subgroup = bool(data.get('subgroup', False))
+            private_key, public_key = elgamal_scheme.generate_keys(parameter_set=parameter_set, subgroup=subgroup)
             result = {
                 'private_key': {
                     'p': str(private_key.p),
@@ -240,8 +250,15 @@ def pke_generate_keys():
                     'p': str(public_key.p),
                     'g': str(public_key.g),
                     'y': str(public_key.y)
-                }
+                },
+                'parameter_set': public_key.parameter_set
             }
+            if public_key.q:
+                result['private_key']['q'] = str(private_key.q)
+                result['public_key']['q'] = str(public_key.q)
+            # 定长二进制编码的base64形式，回传时无需解析十进制大整数
+            result['private_key_b64'] = elgamal_scheme.export_key_b64(private_key)
+            result['public_key_b64'] = elgamal_scheme.export_key_b64(public_key)
         elif scheme == 'SM2':
             private_key, public_key = sm2_scheme.generate_keys()
             result = {
@@ -260,6 +277,21 @@ def pke_generate_keys():
     except Exception as e:
         return jsonify({'error': f'密钥生成失败: {str(e)}'}), 500
 
+def load_elgamal_key(key_data):
+    """
+    将请求中的ElGamal密钥转换为ElGamalKey对象。
+    支持定长编码的base64字符串，以及十进制字符串组成的字典（旧格式）。
+    """
+    if isinstance(key_data, str):
+        return elgamal_scheme.import_key_b64(key_data)
+    return elgamal_scheme.ElGamalKey(
+        p=int(key_data['p']),
+        g=int(key_data['g']),
+        y=int(key_data['y']),
+        x=int(key_data['x']) if key_data.get('x') else None,
+        q=int(key_data['q']) if key_data.get('q') else None
+    )
+
 @app.route('/api/pke/encrypt', methods=['POST'])
 def pke_encrypt():
     """PKE加密API"""
@@ -278,22 +310,23 @@ def pke_encrypt():
             # --- 健壮性修复：预处理公钥 ---
             if isinstance(public_key, str) and len(public_key) % 2 != 0:
                 public_key = '0' + public_key
-            result = ecc_scheme.encrypt(public_key, message_bytes)
+            # compressed=True 时临时公钥使用33字节压缩点，短字段的密文明显变小
+            compressed = bool(data.get('compressed', False))
+            result = ecc_scheme.encrypt(public_key, message_bytes, compressed=compressed)
+            expansion_ratio = len(result) / len(message_bytes)
             # 将bytes结果转换为hex字符串以便JSON传输
             result = result.hex()
         elif scheme == 'ELGAMAL':
             # ElGamal需要处理字符串到bytes的转换和密钥对象重构
             message_bytes = message.encode('utf-8') if isinstance(message, str) else message
             # 重构ElGamal公钥对象
-            elgamal_public_key = elgamal_scheme.ElGamalKey(
-                p=int(public_key['p']),
-                g=int(public_key['g']),
-                y=int(public_key['y']),
-                x=None
-            )
+            elgamal_public_key = load_elgamal_key(public_key)
             result = elgamal_scheme.encrypt(elgamal_public_key, message_bytes)
-            # 将bytes结果转换为hex字符串以便JSON传输
-            result = result.hex()
+            # 将bytes结果转换为hex（默认）或base64字符串以便JSON传输
+            if data.get('encoding') == 'base64':
+                result = base64.b64encode(result).decode('ascii')
+            else:
+                result = result.hex()
         elif scheme == 'SM2':
             # SM2需要处理字符串到bytes的转换
             message_bytes = message.encode('utf-8') if isinstance(message, str) else message
@@ -306,11 +339,15 @@ def pke_encrypt():
         else:
             return jsonify({'error': f'不支持的PKE方案: {scheme}'}), 400
             
-        return jsonify({
+        response = {
             'status': 'success',
             'scheme': scheme,
             'ciphertext': result
-        })
+        }
+        if scheme == 'ECC':
+            response['compressed'] = compressed
+            response['expansion_ratio'] = round(expansion_ratio, 4)
+        return jsonify(response)
         
     except Exception as e:
         return jsonify({'error': f'加密失败: {str(e)}'}), 500
@@ -340,19 +377,16 @@ def pke_decrypt():
 
         elif scheme == 'ELGAMAL':
             # --- 健壮性修复：预处理密文 ---
-            if isinstance(ciphertext, str):
+            if isinstance(ciphertext, str) and data.get('encoding') == 'base64':
+                ciphertext_bytes = base64.b64decode(ciphertext)
+            elif isinstance(ciphertext, str):
                 if len(ciphertext) % 2 != 0:
                     ciphertext = '0' + ciphertext
                 ciphertext_bytes = bytes.fromhex(ciphertext)
             else:
                 ciphertext_bytes = ciphertext
 
-            elgamal_private_key = elgamal_scheme.ElGamalKey(
-                p=int(private_key['p']),
-                g=int(private_key['g']),
-                y=int(private_key['y']),
-                x=int(private_key['x'])
-            )
+            elgamal_private_key = load_elgamal_key(private_key)
             result_bytes = elgamal_scheme.decrypt(elgamal_private_key, ciphertext_bytes)
             result = result_bytes.decode('utf-8')
 
@@ -400,17 +434,52 @@ def get_ibe_instance(scheme_name):
         print(f"[ERROR] 获取IBE方案失败: {e}")
         raise
 
+def _ibe_master_path(scheme):
+    """
+    启用身份密钥持久化（环境变量 CRYPTO_IBE_KEY_STORE）时主密钥文件的路径，未启用时返回None。
+    主密钥文件与存储放在同一目录，权限为0600，必须与存储一样妥善保护。
+    """
+    store_dir = ibe_key_store_dir()
+    return os.path.join(store_dir, f"{scheme}.master.json") if store_dir else None
+
+def _save_ibe_master(path, setup_result):
+    """原子地写入主密钥文件（先写临时文件再替换）"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'w') as f:
+        json.dump(setup_result, f)
+    os.replace(tmp_path, path)
+
 @app.route('/api/ibe/setup', methods=['POST'])
 def ibe_setup():
-    """IBE系统设置API"""
+    """
+    IBE系统设置API
+    启用持久化时复用已保存的主密钥，服务重启后此前提取的身份密钥直接来自磁盘存储；
+    请求中 "rotate": true 时生成新主密钥（旧主密钥的存储文件不再使用）
+    """
     try:
         data = request.get_json()
         scheme = data.get('scheme', '').lower()
+        rotate = bool(data.get('rotate', False))
         
         print(f"[DEBUG] IBE Setup请求 - scheme: {scheme}")
         
         ibe = get_ibe_instance(scheme)
-        setup_result = ibe.setup()
+        
+        # 被替换的实例先关闭它的存储，新实例可能打开同一个文件
+        previous = ibe_systems.pop(scheme, None)
+        if previous is not None:
+            previous['ibe_instance'].close_key_store()
+        
+        master_path = _ibe_master_path(scheme)
+        restore_from = None
+        if master_path is not None and not rotate and os.path.exists(master_path):
+            with open(master_path) as f:
+                restore_from = json.load(f)
+        setup_result = ibe.setup(restore_from=restore_from)
+        if master_path is not None and restore_from is None:
+            _save_ibe_master(master_path, setup_result)
         
         # 保存系统状态
         ibe_systems[scheme] = {
@@ -421,7 +490,8 @@ def ibe_setup():
         return jsonify({
             'status': 'success',
             'scheme': scheme,
-            'public_params': setup_result['public_params']
+            'public_params': setup_result['public_params'],
+            'restored': restore_from is not None
         })
         
     except Exception as e:
@@ -456,6 +526,41 @@ def ibe_extract():
         traceback.print_exc()
         return jsonify({'error': f'密钥提取失败: {str(e)}'}), 500
 
+@app.route('/api/ibe/extract_many', methods=['POST'])
+def ibe_extract_many():
+    """IBE批量密钥提取API：线程池并发提取，按完成顺序以NDJSON逐行返回"""
+    try:
+        data = request.get_json()
+        scheme = data.get('scheme', '').lower()
+        identities = data.get('identities') or []
+        workers = data.get('workers')
+        
+        if not identities:
+            return jsonify({'error': '身份列表不能为空'}), 400
+        if not isinstance(identities, list) or not all(isinstance(identity, str) and identity for identity in identities):
+            return jsonify({'error': '身份列表必须是非空字符串组成的数组'}), 400
+        # 参数在开始流式响应之前校验，否则错误只能在200响应发出后出现
+        if workers is not None:
+            if isinstance(workers, bool) or not isinstance(workers, int) or workers < 1:
+                return jsonify({'error': 'workers 必须是正整数'}), 400
+            workers = min(workers, ibe_max_workers())
+            
+        if scheme not in ibe_systems:
+            return jsonify({'error': f'IBE系统未初始化，请先调用setup接口'}), 400
+            
+        ibe = ibe_systems[scheme]['ibe_instance']
+        results = ibe.extract_many(identities, workers)
+        
+        def generate():
+            for item in results:
+                yield app.json.dumps(item) + '\n'
+        
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+        
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({'error': f'批量密钥提取失败: {str(e)}'}), 500
+
 @app.route('/api/ibe/encrypt', methods=['POST'])
 def ibe_encrypt():
     """IBE加密API"""
@@ -612,17 +717,30 @@ def pke_encrypt_transactions():
         if df is None:
             return jsonify({'status': 'error', 'message': '无法加载数据集'}), 500
         
-        # 使用SM2算法进行加密
-        # 生成密钥对
+        # mode='sm4_batch'（默认）：整张表只用SM2封装一次SM4批次密钥，各字段用 SM4-CTR + HMAC-SM3 加密；
+        # mode='sm2'：每个字段单独做一次SM2加密
+        mode = data.get('mode', 'sm4_batch')
+        if mode not in ('sm4_batch', 'sm2'):
+            return jsonify({'status': 'error', 'message': f'不支持的加密模式: {mode}'}), 400
+        
+        # 生成密钥对，公钥的解析和预计算在整个任务中只做一次
         private_key_hex, public_key_hex = sm2_scheme.generate_keys()
+        batch_header = None
+        if mode == 'sm4_batch':
+            encryptor = sm2_scheme.SM4BatchEncryptor(public_key_hex)
+            batch_header = encryptor.header.hex()
+        else:
+            encryptor = sm2_scheme.SM2Encryptor(public_key_hex)
         
         encrypted_data = []
         performance_stats = {
             'total_records': len(df),
             'encrypted_fields': fields_to_encrypt,
+            'mode': mode,
+            'public_key_operations': 1 if mode == 'sm4_batch' else 0,
             'encryption_times': [],
             'original_size': 0,
-            'encrypted_size': 0
+            'encrypted_size': len(encryptor.header) if mode == 'sm4_batch' else 0
         }
         
         import time
@@ -631,16 +749,19 @@ def pke_encrypt_transactions():
             encrypted_row = row.to_dict()
             row_start_time = time.time()
             
-            # 加密指定字段
-            for field in fields_to_encrypt:
-                if field in encrypted_row:
-                    original_value = str(encrypted_row[field])
-                    performance_stats['original_size'] += len(original_value.encode('utf-8'))
-                    
-                    # 使用SM2加密
-                    encrypted_value = sm2_scheme.encrypt(public_key_hex, original_value.encode('utf-8'))
-                    encrypted_row[field] = encrypted_value.hex()
-                    performance_stats['encrypted_size'] += len(encrypted_value)
+            # 加密指定字段（批次模式下以字段名作为附加认证数据，防止字段间互换密文）
+            row_fields = [field for field in fields_to_encrypt if field in encrypted_row]
+            original_values = [str(encrypted_row[field]).encode('utf-8') for field in row_fields]
+            if mode == 'sm4_batch':
+                encrypted_values = [encryptor.encrypt(value, field.encode('utf-8'))
+                                    for field, value in zip(row_fields, original_values)]
+            else:
+                encrypted_values = encryptor.encrypt_many(original_values)
+                performance_stats['public_key_operations'] += len(encrypted_values)
+            for field, original_value, encrypted_value in zip(row_fields, original_values, encrypted_values):
+                performance_stats['original_size'] += len(original_value)
+                encrypted_row[field] = encrypted_value.hex()
+                performance_stats['encrypted_size'] += len(encrypted_value)
             
             row_end_time = time.time()
             performance_stats['encryption_times'].append((row_end_time - row_start_time) * 1000)  # 毫秒
@@ -648,6 +769,9 @@ def pke_encrypt_transactions():
             # 添加加密标记
             encrypted_row['_encrypted'] = True
             encrypted_row['_encrypted_fields'] = fields_to_encrypt
+            encrypted_row['_encryption_mode'] = mode
+            if batch_header:
+                encrypted_row['_batch_header'] = batch_header
             
             encrypted_data.append(encrypted_row)
         
@@ -690,6 +814,10 @@ def pke_decrypt_transactions():
         
         import time
         
+        # 私钥只解析一次；SM4批次头在同一批次内只解封一次
+        decryptor = sm2_scheme.SM2Decryptor(private_key_hex)
+        batch_decryptors = {}
+        
         for encrypted_row in encrypted_data:
             decrypted_row = encrypted_row.copy()
             row_start_time = time.time()
@@ -699,15 +827,28 @@ def pke_decrypt_transactions():
                 
                 try:
                     # 解密指定字段
-                    for field in encrypted_fields:
-                        if field in encrypted_row and field != '_encrypted' and field != '_encrypted_fields':
-                            encrypted_value = bytes.fromhex(encrypted_row[field])
-                            decrypted_value = sm2_scheme.decrypt(private_key_hex, encrypted_value)
-                            decrypted_row[field] = decrypted_value.decode('utf-8')
+                    row_fields = [field for field in encrypted_fields
+                                  if field in encrypted_row and field != '_encrypted' and field != '_encrypted_fields']
+                    if encrypted_row.get('_encryption_mode') == 'sm4_batch':
+                        header = encrypted_row.get('_batch_header', '')
+                        if header not in batch_decryptors:
+                            batch_decryptors[header] = sm2_scheme.SM4BatchDecryptor(private_key_hex, bytes.fromhex(header))
+                        batch_decryptor = batch_decryptors[header]
+                        for field in row_fields:
+                            plaintext = batch_decryptor.decrypt(bytes.fromhex(encrypted_row[field]), field.encode('utf-8'))
+                            decrypted_row[field] = plaintext.decode('utf-8')
+                    else:
+                        results = decryptor.decrypt_many(bytes.fromhex(encrypted_row[field]) for field in row_fields)
+                        for field, result in zip(row_fields, results):
+                            if result['error']:
+                                raise ValueError(f"字段 {field} 解密失败: {result['error']}")
+                            decrypted_row[field] = result['plaintext'].decode('utf-8')
                     
                     # 移除加密标记
                     decrypted_row.pop('_encrypted', None)
                     decrypted_row.pop('_encrypted_fields', None)
+                    decrypted_row.pop('_encryption_mode', None)
+                    decrypted_row.pop('_batch_header', None)
                     
                     performance_stats['verification_success'] += 1
                     
@@ -736,6 +877,57 @@ def pke_decrypt_transactions():
         traceback.print_exc()
         return jsonify({'error': f'批量解密失败: {str(e)}'}), 500
 
+@app.route('/api/pke/aggregate_transactions', methods=['POST'])
+def pke_aggregate_transactions():
+    """加密数值列的分组求和（加法同态ElGamal，只解密聚合结果）"""
+    try:
+        data = request.json or {}
+        size = data.get('size', 'medium')
+        fields = data.get('fields', ['amount', 'balance'])
+        group_by = data.get('group_by', 'booth')
+        
+        result = dataset_manager.aggregate_encrypted(size, fields, group_by)
+        if 'error' in result:
+            return jsonify({'status': 'error', 'message': result['error']}), 400
+        
+        return jsonify({
+            'status': 'success',
+            'data': result
+        })
+        
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({'error': f'加密聚合失败: {str(e)}'}), 500
+
+@app.route('/api/pke/sign_transactions', methods=['POST'])
+def pke_sign_transactions():
+    """对交易记录逐条SM2签名，并用同一公钥批量验签"""
+    try:
+        data = request.json or {}
+        size = data.get('size', 'medium')
+        
+        signed = dataset_manager.sign_transactions(size)
+        if 'error' in signed:
+            return jsonify({'status': 'error', 'message': signed['error']}), 400
+        
+        verified = dataset_manager.verify_transactions(signed['public_key'], signed['signatures'], size)
+        if 'error' in verified:
+            return jsonify({'status': 'error', 'message': verified['error']}), 400
+        
+        return jsonify({
+            'status': 'success',
+            'data': {
+                'public_key': signed['public_key'],
+                'signatures': signed['signatures'][:10],  # 只返回前10条用于预览
+                'invalid_rows': verified['invalid_rows'],
+                'stats': {**signed['stats'], **verified['stats']}
+            }
+        })
+        
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({'error': f'签名验证失败: {str(e)}'}), 500
+
 @app.route('/api/pke/performance_stats')
 def pke_performance_stats():
     """获取PKE应用演示的性能统计"""
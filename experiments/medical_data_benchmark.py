@@ -185,12 +185,15 @@ def benchmark_pke_with_medical_data():
     for algo_name, algo_module in algorithms:
         print(f"\n--- 测试 {algo_name} 算法 ---")
         
-        # 密钥生成测试
-        start_time = time.perf_counter()
+        # ElGamal使用KEM/DEM混合模式，检验报告和影像元数据也可以测试
         if algo_name == "ElGamal":
-            priv_key, pub_key = algo_module.generate_keys()
+            encrypt_func, decrypt_func = algo_module.encrypt_hybrid, algo_module.decrypt_hybrid
         else:
-            priv_key, pub_key = algo_module.generate_keys()
+            encrypt_func, decrypt_func = algo_module.encrypt, algo_module.decrypt
+        
+        # 密钥生成测试
+        start_time = time.perf_counter()
+        priv_key, pub_key = algo_module.generate_keys()
         end_time = time.perf_counter()
         key_gen_time = end_time - start_time
         
@@ -206,23 +209,19 @@ def benchmark_pke_with_medical_data():
         
         # 测试不同类型的医疗数据
         for data_type, category, data_generator in test_cases:
-            if algo_name == "ElGamal" and category in ["medium", "large"]:
-                # ElGamal有大小限制，跳过大数据测试
-                continue
-            
             try:
                 medical_data = data_generator()
                 data_size = len(medical_data)
                 
                 # 加密测试
                 start_time = time.perf_counter()
-                ciphertext = algo_module.encrypt(pub_key, medical_data)
+                ciphertext = encrypt_func(pub_key, medical_data)
                 end_time = time.perf_counter()
                 encrypt_time = end_time - start_time
                 
                 # 解密测试
                 start_time = time.perf_counter()
-                decrypted_data = algo_module.decrypt(priv_key, ciphertext)
+                decrypted_data = decrypt_func(priv_key, ciphertext)
                 end_time = time.perf_counter()
                 decrypt_time = end_time - start_time
                 
@@ -24,29 +24,24 @@ class SecureMessageSystem:
     def __init__(self, crypto_scheme):
         self.scheme_name = crypto_scheme.__name__.split('.')[-1].upper()
         self.generate_keys = crypto_scheme.generate_keys
-        self.encrypt = crypto_scheme.encrypt
-        self.decrypt = crypto_scheme.decrypt
+        # ElGamal使用KEM/DEM混合模式，消息长度不受模数限制
+        if 'elgamal' in crypto_scheme.__name__:
+            self.encrypt = crypto_scheme.encrypt_hybrid
+            self.decrypt = crypto_scheme.decrypt_hybrid
+        else:
+            self.encrypt = crypto_scheme.encrypt
+            self.decrypt = crypto_scheme.decrypt
         
         print(f"🔐 初始化 {self.scheme_name} 安全消息系统")
         
-        # 生成密钥对
-        if 'elgamal' in crypto_scheme.__name__:
-            self.private_key, self.public_key = self.generate_keys(key_size=512)
-        else:
-            self.private_key, self.public_key = self.generate_keys()
+        # 生成密钥对（ElGamal默认使用内置的 ffdhe2048 群参数）
+        self.private_key, self.public_key = self.generate_keys()
     
     def send_message(self, message, recipient_name="Alice"):
         """发送加密消息"""
         print(f"\n📤 {recipient_name} 发送消息 (使用 {self.scheme_name})")
         
-        # ElGamal消息长度限制处理
-        if 'ELGAMAL' in self.scheme_name and len(message.encode('utf-8')) > 50:
-            original_message = message
-            message = "机密文件摘要：新产品计划"
-            print(f"原始消息: {original_message}")
-            print(f"⚠️  ElGamal消息长度限制，使用简化消息: {message}")
-        else:
-            print(f"原始消息: {message}")
+        print(f"原始消息: {message}")
         
         start_time = time.time()
         ciphertext = self.encrypt(self.public_key, message.encode('utf-8'))
@@ -143,22 +138,23 @@ def scenario_2_file_encryption():
     for scheme, name in zip(schemes, scheme_names):
         try:
             # 生成密钥
+            private_key, public_key = scheme.generate_keys()
+            test_data = file_data
+            
+            # ElGamal使用KEM/DEM混合模式加密完整文件
             if name == "ElGamal":
-                private_key, public_key = scheme.generate_keys(key_size=512)
-                # ElGamal消息长度限制，使用较短内容
-                test_data = "财务数据:营收1.2亿"
+                encrypt_func, decrypt_func = scheme.encrypt_hybrid, scheme.decrypt_hybrid
             else:
-                private_key, public_key = scheme.generate_keys()
-                test_data = file_data
+                encrypt_func, decrypt_func = scheme.encrypt, scheme.decrypt
             
             # 加密测试
             start = time.time()
-            ciphertext = scheme.encrypt(public_key, test_data.encode('utf-8'))
+            ciphertext = encrypt_func(public_key, test_data.encode('utf-8'))
             encrypt_time = time.time() - start
             
             # 解密测试
             start = time.time()
-            decrypted = scheme.decrypt(private_key, ciphertext)
+            decrypted = decrypt_func(private_key, ciphertext)
             decrypt_time = time.time() - start
             
             print(f"{name:<10} {encrypt_time:<12.6f} {len(ciphertext):<12} {decrypt_time:<12.6f}")
@@ -193,6 +189,14 @@ def scenario_3_multi_user_system():
         }
         print(f"✅ 为用户 {user} 生成密钥对")
     
+    # ElGamal密钥对批量生成，分摊到多个进程
+    start_time = time.time()
+    elgamal_keypairs = elgamal.generate_keys_many(len(users))
+    for user, (private_key, public_key) in zip(users, elgamal_keypairs):
+        user_keys[user]['elgamal_private_key'] = private_key
+        user_keys[user]['elgamal_public_key'] = public_key
+    print(f"✅ 批量生成 {len(users)} 个ElGamal密钥对，耗时 {time.time() - start_time:.3f}秒")
+    
     print(f"\n📡 模拟用户间消息传递:")
     
     # 模拟消息传递
@@ -209,6 +213,11 @@ def scenario_3_multi_user_system():
                 received_message = decrypted.decode('utf-8')
                 
                 print(f"📤 {sender} → {receiver}: 消息长度 {len(message)} → 密文 {len(ciphertext)}字节")
+                
+                # 同一消息使用接收方的ElGamal公钥（混合模式）传输
+                elgamal_ciphertext = elgamal.encrypt_hybrid(user_keys[receiver]['elgamal_public_key'], message.encode('utf-8'))
+                assert elgamal.decrypt_hybrid(user_keys[receiver]['elgamal_private_key'], elgamal_ciphertext).decode('utf-8') == message
+                print(f"📤 {sender} → {receiver} (ElGamal): 密文 {len(elgamal_ciphertext)}字节")
                 break  # 每个发送方只演示一次传输
 
 def scenario_4_performance_analysis():
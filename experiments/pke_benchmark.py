@@ -23,7 +23,7 @@ from src.pke import ecc_scheme, elgamal_scheme, sm2_scheme
 # 定义要测试的数据大小 (bytes)
 DATA_SIZES = [16, 128, 1024, 1024 * 10]
 # ElGamal特殊数据大小（受密钥长度限制）
-ELGAMAL_DATA_SIZES = [16, 32]  # ElGamal使用512位密钥，只能处理小消息
+ELGAMAL_DATA_SIZES = [16, 32]  # ElGamal明文需小于模数，只测试小消息
 # 定义每个测试的重复次数，以获得更稳定的平均值
 NUM_ITERATIONS = 10
 
@@ -33,8 +33,8 @@ def benchmark_elgamal():
     results = []
 
     # 1. 评测密钥生成
-    # ElGamal密钥生成非常耗时，我们减少迭代次数以避免长时间等待
-    key_gen_iterations = 1
+    # 使用内置群参数后密钥生成只需一次模幂运算
+    key_gen_iterations = NUM_ITERATIONS
     start_time = time.perf_counter()
     for _ in range(key_gen_iterations):
         priv_key, pub_key = elgamal_scheme.generate_keys()
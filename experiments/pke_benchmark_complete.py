@@ -9,6 +9,7 @@ import sys
 import os
 import time
 import pandas as pd
+import ecies
 
 # 添加源代码路径
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
@@ -42,10 +43,7 @@ def benchmark_scheme(scheme_name, key_gen_func, encrypt_func, decrypt_func, iter
         
         for i in range(iterations):
             start_time = time.time()
-            if scheme_name == "ElGamal":
-                private_key, public_key = key_gen_func(key_size=512)  # ElGamal使用512位
-            else:
-                private_key, public_key = key_gen_func()
+            private_key, public_key = key_gen_func()  # ElGamal默认使用内置群参数
             end_time = time.time()
             key_gen_times.append(end_time - start_time)
         
@@ -66,11 +64,6 @@ def benchmark_scheme(scheme_name, key_gen_func, encrypt_func, decrypt_func, iter
             # 准备测试数据
             test_data = b'A' * data_size
             
-            # 调整消息大小以适应ElGamal
-            if scheme_name == "ElGamal" and data_size > 50:
-                test_data = b'A' * 50  # ElGamal限制消息大小
-                print(f"  注意: ElGamal消息大小调整为50字节")
-            
             encrypt_times = []
             decrypt_times = []
             ciphertext_sizes = []
@@ -124,6 +117,56 @@ def benchmark_scheme(scheme_name, key_gen_func, encrypt_func, decrypt_func, iter
     
     return results
 
+def benchmark_ecc_engines(iterations=500, data_sizes=(8, 32, 1024)):
+    """
+    对比ECIES各实现的单次操作开销和密文膨胀率：eciespy库、eciespy兼容引擎、native引擎（含压缩点模式）
+    
+    :param iterations: 每项测试的迭代次数
+    :param data_sizes: 测试数据大小（字节）
+    :return: 性能数据列表
+    """
+    print("--- 开始评测 ECIES 引擎开销 ---")
+    private_key_hex, public_key_hex = ecc.generate_keys()
+    public_key = ecc.load_public_key(public_key_hex)
+    private_key = ecc.load_private_key(private_key_hex)
+    
+    variants = [
+        ('eciespy库', lambda m: ecies.encrypt(public_key_hex, m), lambda c: ecies.decrypt(private_key_hex, c)),
+        ('eciespy兼容引擎', lambda m: ecc.encrypt(public_key, m, engine='eciespy'), lambda c: ecc.decrypt(private_key, c)),
+        ('native引擎', lambda m: ecc.encrypt(public_key, m, engine='native'), lambda c: ecc.decrypt(private_key, c)),
+        ('native引擎(压缩点)', lambda m: ecc.encrypt(public_key, m, engine='native', compressed=True),
+         lambda c: ecc.decrypt(private_key, c)),
+    ]
+    
+    results = []
+    for data_size in data_sizes:
+        test_data = b'A' * data_size
+        for engine_name, encrypt_func, decrypt_func in variants:
+            start_time = time.perf_counter()
+            for _ in range(iterations):
+                ciphertext = encrypt_func(test_data)
+            encrypt_time = (time.perf_counter() - start_time) / iterations
+            
+            start_time = time.perf_counter()
+            for _ in range(iterations):
+                decrypted = decrypt_func(ciphertext)
+            decrypt_time = (time.perf_counter() - start_time) / iterations
+            
+            if decrypted != test_data:
+                print(f"  警告: {engine_name} 解密结果不正确")
+            results.append({
+                'engine': engine_name,
+                'data_size': data_size,
+                'encrypt_time': encrypt_time,
+                'decrypt_time': decrypt_time,
+                'ciphertext_size': len(ciphertext),
+                'expansion_ratio': len(ciphertext) / data_size
+            })
+            print(f"{engine_name} {data_size}B: 加密 {encrypt_time * 1e6:.1f}µs, "
+                  f"解密 {decrypt_time * 1e6:.1f}µs, 密文 {len(ciphertext)}B "
+                  f"(膨胀率 {len(ciphertext) / data_size:.2f}x)")
+    return results
+
 def main():
     """主函数，执行完整的PKE性能评测"""
     print("=== PKE方案完整性能评测 ===")
@@ -144,12 +187,17 @@ def main():
     )
     all_results.extend(ecc_results)
     
+    # ECIES引擎开销对比
+    engine_results = benchmark_ecc_engines()
+    pd.DataFrame(engine_results).to_csv('results/ecc_engine_comparison.csv', index=False)
+    print("ECIES引擎对比结果已保存到 results/ecc_engine_comparison.csv")
+    
     # 评测ElGamal
     elgamal_results = benchmark_scheme(
         "ElGamal", 
         elgamal.generate_keys, 
-        elgamal.encrypt, 
-        elgamal.decrypt,
+        elgamal.encrypt_hybrid,  # KEM/DEM混合模式，消息长度不受模数限制
+        elgamal.decrypt_hybrid,
         iterations=2  # ElGamal较慢，减少迭代次数
     )
     all_results.extend(elgamal_results)
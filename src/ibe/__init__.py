@@ -11,9 +11,18 @@ Identity-Based Encryption (IBE) 算法包
 每个方案都提供统一的接口：
 - setup(): 系统设置，生成主密钥
 - extract(identity): 身份密钥提取
+- extract_many(identities, workers): 线程池并发提取，按完成顺序流式返回
 - encrypt(identity, message): 基于身份的加密
 - decrypt(private_key, ciphertext): 解密
 
+各方案派生的身份密钥存放在共享的LRU+TTL缓存中（见 key_cache），
+setup() 更换主密钥时自动失效，可用 key_cache_info() 查看命中统计。
+指定 key_store_dir（或环境变量 CRYPTO_IBE_KEY_STORE）后，提取结果还会加密保存到
+按方案和主密钥区分的磁盘存储中（见 key_store），setup(restore_from=...) 恢复主密钥后可直接复用。
+Web应用在启用该环境变量时会把主密钥保存在同一目录（<方案>.master.json，权限0600），重启后 /api/ibe/setup 自动恢复。
+身份密钥派生的成本由KDF档位决定（'interactive'/'bulk'/'archival'，见 kdf_profiles），
+档位ID记录在私钥与密文的 'kdf_profile' 字段中。
+
 使用示例：
     from src.ibe import boneh_franklin_scheme as bf
     
@@ -34,6 +43,9 @@ Identity-Based Encryption (IBE) 算法包
 from . import boneh_franklin_scheme_simple as boneh_franklin
 from . import boneh_boyen_scheme as boneh_boyen
 from . import sakai_kasahara_scheme as sakai_kasahara
+from .key_cache import identity_key_cache, key_cache_info, clear_key_cache
+from .key_store import IdentityKeyStore
+from .kdf_profiles import KDFProfile, calibrate_iterations
 
 # 定义支持的IBE方案
 SUPPORTED_SCHEMES = {
@@ -64,6 +76,20 @@ def get_scheme(scheme_name):
     
     return SUPPORTED_SCHEMES[scheme_name]
 
+def extract_many(scheme_name, identities, workers=None):
+    """
+    用指定方案的全局实例并发提取多个身份的私钥
+    
+    参数:
+        scheme_name (str): 方案名称，见 get_scheme()
+        identities (iterable): 身份字符串
+        workers (int): 线程数，默认为CPU核心数
+    
+    返回:
+        generator: 按完成顺序产出 {'identity', 'key', 'error'} 字典
+    """
+    return get_scheme(scheme_name).extract_many(identities, workers)
+
 def list_schemes():
     """
     列出所有支持的IBE方案
@@ -86,6 +112,13 @@ __all__ = [
     'bb_ibe',
     'sk_ibe',
     'get_scheme',
+    'extract_many',
     'list_schemes',
-    'SUPPORTED_SCHEMES'
+    'SUPPORTED_SCHEMES',
+    'identity_key_cache',
+    'key_cache_info',
+    'clear_key_cache',
+    'IdentityKeyStore',
+    'KDFProfile',
+    'calibrate_iterations'
 ] 
\ No newline at end of file
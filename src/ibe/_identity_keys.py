@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+
+"""
+三种IBE方案共享的身份密钥管理
+
+各方案只负责"如何从主密钥派生一个身份密钥"，其余流程在这里统一实现：
+- 进程内的 LRU+TTL 缓存（key_cache），setup() 更换主密钥时按作用域失效；
+- 可选的持久化存储（key_store），进程重启后恢复主密钥即可直接取回已提取的身份密钥；
+- KDF成本档位（kdf_profiles），档位ID写入私钥与密文；
+- 线程池批量提取（bulk_extract）。
+
+方案类继承 IdentityKeyMixin，并提供：
+- 类属性 KDF_PROFILES（build_profiles 的结果）与 KDF_PASSES（一次派生调用KDF的次数）；
+- _master_secrets()：返回主密钥分量组成的元组；
+- _derive_identity_key(identity, profile)：按档位派生身份密钥字典（需包含 'kdf_profile'）。
+__init__ 中调用 _init_identity_keys()，setup() 安装主密钥和 system_params 后调用 _reset_key_cache()。
+"""
+
+try:
+    from .key_cache import identity_key_cache, master_fingerprint
+    from .bulk_extract import extract_concurrently
+    from .key_store import IdentityKeyStore, default_store_dir
+    from .kdf_profiles import KDFProfile, KDF_PBKDF2, PROFILE_ARCHIVAL, resolve_profile, check_profile_cost, calibrate_iterations
+except ImportError:
+    from key_cache import identity_key_cache, master_fingerprint
+    from bulk_extract import extract_concurrently
+    from key_store import IdentityKeyStore, default_store_dir
+    from kdf_profiles import KDFProfile, KDF_PBKDF2, PROFILE_ARCHIVAL, resolve_profile, check_profile_cost, calibrate_iterations
+
+class IdentityKeyMixin:
+    """身份密钥的缓存、持久化、KDF档位与批量提取"""
+
+    KDF_PROFILES = {}
+    KDF_PASSES = 1
+
+    def _init_identity_keys(self, key_store_dir=None, kdf_profile=None):
+        """
+        :param key_store_dir: 身份密钥持久化目录，None 时使用环境变量 CRYPTO_IBE_KEY_STORE（未设置则不持久化）
+        :param kdf_profile: KDF档位名称（'interactive'/'bulk'/'archival'）、档位ID或 KDFProfile，
+                            None 时使用环境变量 CRYPTO_IBE_KDF_PROFILE，未设置则为 'archival'
+        """
+        self._cache_scope = None
+        self.key_store_dir = key_store_dir or default_store_dir()
+        self._key_store = None
+        # 可用于 extract 的档位：命名档位加上显式登记的自定义档位（按ID）
+        self._kdf_profiles = dict(self.KDF_PROFILES)
+        self.kdf_profile = self.register_kdf_profile(kdf_profile)
+
+    def _master_secrets(self):
+        """主密钥分量组成的元组（用于缓存作用域、存储文件与存储密钥）"""
+        raise NotImplementedError
+
+    def _derive_identity_key(self, identity, profile):
+        """按KDF档位从主密钥派生身份密钥字典"""
+        raise NotImplementedError
+
+    def _require_setup(self):
+        if self.system_params is None or None in self._master_secrets():
+            raise ValueError("必须先执行setup()初始化系统")
+
+    def _reset_key_cache(self):
+        """安装新主密钥后使旧主密钥下缓存的身份密钥失效，并切换到新主密钥对应的持久化存储"""
+        if self._cache_scope is not None:
+            identity_key_cache.invalidate(self._cache_scope)
+        self._cache_scope = (self.system_params['system_id'], master_fingerprint(*self._master_secrets()))
+        if self.key_store_dir is not None:
+            self.open_key_store(self.key_store_dir)
+
+    def open_key_store(self, directory):
+        """
+        打开当前主密钥对应的持久化身份密钥存储（文件按方案ID和主密钥指纹区分）
+        """
+        self._require_setup()
+        self.close_key_store()
+        self.key_store_dir = directory
+        self._key_store = IdentityKeyStore(directory, self.system_params['system_id'], self._master_secrets())
+        return self._key_store
+
+    def close_key_store(self):
+        """把持久化存储写回磁盘并关闭"""
+        if self._key_store is not None:
+            self._key_store.close()
+            self._key_store = None
+
+    def _load_identity_key(self, identity, profile):
+        """内存缓存未命中时调用：先查持久化存储，仍未命中才重新派生"""
+        if self._key_store is None:
+            return self._derive_identity_key(identity, profile)
+        # 存储中的条目同样按档位区分
+        return self._key_store.get_or_create(f"{profile.id}|{identity}",
+                                             lambda _: self._derive_identity_key(identity, profile))
+
+    def register_kdf_profile(self, profile):
+        """
+        登记自定义档位，之后 extract 才接受该档位ID（例如服务重启后恢复此前校准的档位）
+
+        :param profile: 档位名称、档位ID或 KDFProfile（来自调用方配置，而不是密文）
+        :return: 登记的 KDFProfile
+        """
+        profile = resolve_profile(profile, self._kdf_profiles, trusted=True)
+        check_profile_cost(profile, self.KDF_PROFILES[PROFILE_ARCHIVAL].iterations)
+        if profile not in self._kdf_profiles.values():
+            self._kdf_profiles[profile.id] = profile
+        return profile
+
+    def set_kdf_profile(self, profile):
+        """
+        切换KDF档位（之后的提取与加密使用新档位，已有密文仍可用对应档位的私钥解密）
+
+        :param profile: 档位名称、档位ID或 KDFProfile
+        :return: 生效的 KDFProfile
+        """
+        self.kdf_profile = self.register_kdf_profile(profile)
+        if self.system_params is not None:
+            self.system_params['kdf_profile'] = self.kdf_profile.id
+        return self.kdf_profile
+
+    def calibrate_kdf_profile(self, target_ms, name='calibrated', apply=True):
+        """
+        在本机测量PBKDF2速度，生成一次身份密钥派生耗时约为 target_ms 毫秒的档位
+
+        :param target_ms: 目标延迟（毫秒）
+        :param name: 档位名称
+        :param apply: 是否立即切换到该档位（无论是否切换，档位都会被登记）
+        :return: KDFProfile
+        """
+        profile = self.register_kdf_profile(
+            KDFProfile(name, KDF_PBKDF2, calibrate_iterations(target_ms, passes=self.KDF_PASSES)))
+        if apply:
+            self.set_kdf_profile(profile)
+        return profile
+
+    def extract(self, identity, kdf_profile=None):
+        """
+        Extract阶段：为指定身份生成私钥
+        同一主密钥下重复提取同一身份时直接返回缓存的结果
+        kdf_profile 为None时使用实例的档位；解密其他档位的密文时传入密文中的 'kdf_profile'（只接受已登记的档位）
+        """
+        self._require_setup()
+        profile = self.kdf_profile if kdf_profile is None else resolve_profile(kdf_profile, self._kdf_profiles)
+        key_data = identity_key_cache.get(self._cache_scope + (profile.id,), identity,
+                                          lambda: self._load_identity_key(identity, profile))
+        return dict(key_data)
+
+    def extract_many(self, identities, workers=None, kdf_profile=None):
+        """
+        批量提取身份私钥：线程池并发执行（PBKDF2计算期间释放GIL），结果按完成顺序流式返回
+        每项为 {'identity': 身份, 'key': extract的返回值或None, 'error': 错误信息或None}
+        """
+        self._require_setup()
+        return extract_concurrently(lambda identity: self.extract(identity, kdf_profile), identities, workers)
+
+    def _check_kdf_profile(self, private_key_data, ciphertext_data):
+        """私钥与密文必须来自同一KDF档位（没有该字段的旧数据视为archival档位）"""
+        legacy = self.KDF_PROFILES[PROFILE_ARCHIVAL].id
+        key_profile = private_key_data.get('kdf_profile', legacy)
+        ciphertext_profile = ciphertext_data.get('kdf_profile', legacy)
+        if key_profile != ciphertext_profile:
+            raise ValueError(f"私钥的KDF档位 {key_profile} 与密文的档位 {ciphertext_profile} 不一致，"
+                             f"请用 extract(identity, kdf_profile='{ciphertext_profile}') 提取私钥")
+
+def self_test(scheme_class, first_step):
+    """
+    各方案 __main__ 共用的身份密钥自检：缓存、批量提取、持久化存储与KDF档位。
+
+    :param scheme_class: 方案类
+    :param first_step: 第一项的步骤编号（接在方案自身的测试步骤之后）
+    """
+    import os
+    import time
+    import tempfile
+    try:
+        from .key_cache import key_cache_info, clear_key_cache
+    except ImportError:
+        from key_cache import key_cache_info, clear_key_cache
+
+    # 身份密钥缓存：重复加密命中缓存，setup() 更换主密钥后旧条目失效
+    print(f"{first_step}. 身份密钥缓存测试...")
+    pkg = scheme_class()
+    pkg.setup()
+    doctor_identity = "DOC0001@cardiology.hospital.com"
+    start_time = time.perf_counter()
+    pkg.encrypt(doctor_identity, "cache warm-up")
+    cold_time = time.perf_counter() - start_time
+    start_time = time.perf_counter()
+    for _ in range(100):
+        pkg.encrypt(doctor_identity, "cached")
+    warm_time = (time.perf_counter() - start_time) / 100
+    print(f"   首次加密: {cold_time * 1000:.2f} 毫秒，命中缓存后: {warm_time * 1e6:.1f} 微秒")
+    old_key = pkg.extract(doctor_identity)['private_key']
+    pkg.setup()
+    assert pkg.extract(doctor_identity)['private_key'] != old_key
+    print(f"   重新setup后缓存已失效: {key_cache_info()}")
+    print("✅ 身份密钥缓存测试通过！")
+
+    # 批量提取：线程池并发，按完成顺序流式返回
+    print(f"{first_step + 1}. 批量提取测试...")
+    directory = [f"DOC{i:04d}@{dept}.hospital.com" for i in range(40) for dept in ("cardiology", "oncology")]
+    start_time = time.perf_counter()
+    provisioned = {item['identity']: item['key'] for item in pkg.extract_many(directory, workers=4)}
+    bulk_time = time.perf_counter() - start_time
+    assert set(provisioned) == set(directory)
+    assert all(provisioned[identity]['private_key'] == pkg.extract(identity)['private_key'] for identity in directory[:5])
+    print(f"   {len(directory)} 个身份并发提取耗时: {bulk_time:.3f} 秒（CPU核心数: {os.cpu_count()}）")
+    print("✅ 批量提取测试通过！")
+
+    # 持久化身份密钥存储：模拟进程重启后恢复主密钥，已提取的身份无需重新派生
+    print(f"{first_step + 2}. 持久化存储测试...")
+    with tempfile.TemporaryDirectory() as store_dir:
+        pkg = scheme_class(key_store_dir=store_dir)
+        master = pkg.setup()
+        original_keys = [pkg.extract(identity)['private_key'] for identity in directory[:20]]
+        pkg.close_key_store()
+        clear_key_cache()
+        restarted = scheme_class(key_store_dir=store_dir)
+        restarted.setup(restore_from=master)
+        start_time = time.perf_counter()
+        warm_keys = [restarted.extract(identity) for identity in directory[:20]]
+        warm_time = time.perf_counter() - start_time
+        assert [key['private_key'] for key in warm_keys] == original_keys
+        assert restarted._key_store.stats()['hits'] == 20
+        message = restarted.encrypt(directory[0], "warm restart")
+        assert restarted.decrypt(warm_keys[0], message) == b"warm restart"
+        restarted.setup()
+        assert len(restarted._key_store) == 0
+        restarted.close_key_store()
+    print(f"   重启后20个身份的提取耗时: {warm_time * 1000:.2f} 毫秒（全部来自持久化存储）")
+    print("✅ 持久化存储测试通过！")
+
+    # KDF成本档位：档位ID写入私钥与密文，解密方按密文中的档位提取私钥
+    print(f"{first_step + 3}. KDF档位测试...")
+    patient_identity = "DOC0002@neurology.hospital.com"
+    for profile_name in ("interactive", "bulk", "archival"):
+        pkg = scheme_class(kdf_profile=profile_name)
+        pkg.setup()
+        start_time = time.perf_counter()
+        key = pkg.extract(patient_identity)
+        extract_time = time.perf_counter() - start_time
+        message = pkg.encrypt(patient_identity, "profile test")
+        assert message['kdf_profile'] == key['kdf_profile'] == pkg.kdf_profile.id
+        assert pkg.decrypt(key, message) == b"profile test"
+        print(f"   {pkg.kdf_profile.id:<28} 提取耗时 {extract_time * 1000:.2f} 毫秒")
+    archived = pkg.encrypt(patient_identity, "archived record")
+    pkg.set_kdf_profile("bulk")
+    try:
+        pkg.decrypt(pkg.extract(patient_identity), archived)
+        raise AssertionError("应检测到KDF档位不一致")
+    except ValueError:
+        pass
+    try:
+        pkg.extract(patient_identity, kdf_profile='forged:pbkdf2:2000000000')
+        raise AssertionError("应拒绝未登记的KDF档位")
+    except ValueError:
+        pass
+    assert pkg.decrypt(pkg.extract(patient_identity, kdf_profile=archived['kdf_profile']), archived) == b"archived record"
+    calibrated = pkg.calibrate_kdf_profile(10)
+    start_time = time.perf_counter()
+    calibrated_key = pkg.extract("DOC0003@neurology.hospital.com")
+    print(f"   校准档位 {calibrated.id}: 目标 10 毫秒，实测 {(time.perf_counter() - start_time) * 1000:.2f} 毫秒")
+    assert calibrated_key['kdf_profile'] == calibrated.id
+    print("✅ KDF档位测试通过！")
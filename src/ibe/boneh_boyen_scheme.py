@@ -24,30 +24,51 @@ from Crypto.Util.Padding import pad, unpad
 from Crypto.Random import get_random_bytes
 import struct
 
-class BonehBoyenIBE:
+try:
+    from ._identity_keys import IdentityKeyMixin, self_test
+    from .kdf_profiles import build_profiles
+except ImportError:
+    from _identity_keys import IdentityKeyMixin, self_test
+    from kdf_profiles import build_profiles
+
+class BonehBoyenIBE(IdentityKeyMixin):
     """Boneh-Boyen IBE方案实现"""
     
-    def __init__(self):
+    # 身份密钥派生的命名成本档位（archival 与原有固定迭代次数一致），一次派生调用 KDF_PASSES 次KDF
+    KDF_PROFILES = build_profiles(50000)
+    KDF_PASSES = 2
+    
+    def __init__(self, key_store_dir=None, kdf_profile=None):
+        """key_store_dir 与 kdf_profile 的含义见 IdentityKeyMixin._init_identity_keys"""
         self.master_secret = None
         self.alpha = None  # 额外的主密钥组件
         self.system_params = None
+        self._init_identity_keys(key_store_dir, kdf_profile)
         
-    def setup(self):
+    def setup(self, restore_from=None):
         """
         Setup阶段：生成系统参数和主密钥
         BB-IBE使用双主密钥结构提供更强的安全性
+        restore_from 为此前 setup() 的返回值时恢复其中的主密钥
         """
-        # 生成双主密钥
-        self.master_secret = get_random_bytes(32)  # 主密钥 s
-        self.alpha = get_random_bytes(32)          # 辅助密钥 α
+        if restore_from is not None:
+            # 恢复已有的双主密钥（例如进程重启后），此前持久化的身份密钥仍然可用
+            self.master_secret = bytes.fromhex(restore_from['master_secret_s'])
+            self.alpha = bytes.fromhex(restore_from['master_secret_alpha'])
+        else:
+            # 生成双主密钥
+            self.master_secret = get_random_bytes(32)  # 主密钥 s
+            self.alpha = get_random_bytes(32)          # 辅助密钥 α
         
         # 系统公共参数
         self.system_params = {
             'system_id': 'BB-IBE-v1.0',
             'hash_function': 'sha256',
             'key_size': 256,
-            'security_level': 'standard_model'
+            'security_level': 'standard_model',
+            'kdf_profile': self.kdf_profile.id
         }
+        self._reset_key_cache()
         
         return {
             'public_params': self.system_params,
@@ -55,32 +76,30 @@ class BonehBoyenIBE:
             'master_secret_alpha': self.alpha.hex()
         }
     
-    def extract(self, identity):
-        """
-        Extract阶段：为指定身份生成私钥
-        BB-IBE使用改进的密钥生成算法
-        """
-        if self.master_secret is None or self.alpha is None:
-            raise ValueError("必须先执行setup()初始化系统")
-            
+    def _master_secrets(self):
+        return (self.master_secret, self.alpha)
+    
+    def _derive_identity_key(self, identity, profile):
+        """按KDF档位从双主密钥派生身份私钥（两次KDF调用，结果由 identity_key_cache 缓存）"""
         # BB-IBE的身份哈希函数（更复杂的映射）
         identity_bytes = identity.encode('utf-8')
         
-        # 第一轮哈希：基本身份映射
-        h1 = hashlib.pbkdf2_hmac('sha256', identity_bytes, self.master_secret, 50000, 32)
+        # 第一轮哈希：基本身份映射（KDF与迭代次数由档位决定，archival档位为PBKDF2 50000次）
+        h1 = profile.derive(identity_bytes, self.master_secret, 32)
         
         # 第二轮哈希：使用α增强安全性
         h2 = hmac.new(self.alpha, h1 + identity_bytes, hashlib.sha256).digest()
         
         # 组合生成最终私钥
-        private_key = hashlib.pbkdf2_hmac('sha256', h1 + h2, self.alpha, 50000, 32)
+        private_key = profile.derive(h1 + h2, self.alpha, 32)
         
         return {
             'identity': identity,
             'private_key': private_key,
             'key_hex': private_key.hex(),
             'h1': h1,
-            'h2': h2
+            'h2': h2,
+            'kdf_profile': profile.id
         }
     
     def encrypt(self, identity, message):
@@ -94,15 +113,11 @@ class BonehBoyenIBE:
         # 生成随机会话密钥
         session_key = get_random_bytes(32)
         
-        # BB-IBE的身份密钥生成（与extract保持一致）
-        identity_bytes = identity.encode('utf-8')
-        
-        # 使用相同的哈希链生成身份密钥
+        # BB-IBE的身份密钥（与extract的结果一致，命中缓存时无需重新执行哈希链）
         if self.master_secret is None or self.alpha is None:
             raise ValueError("主密钥未初始化")
-        h1 = hashlib.pbkdf2_hmac('sha256', identity_bytes, self.master_secret, 50000, 32)
-        h2 = hmac.new(self.alpha, h1 + identity_bytes, hashlib.sha256).digest()
-        identity_key = hashlib.pbkdf2_hmac('sha256', h1 + h2, self.alpha, 50000, 32)
+        identity_key_data = self.extract(identity)
+        identity_key = identity_key_data['private_key']
         
         # 生成随机数r用于增强安全性
         r = get_random_bytes(16)
@@ -129,7 +144,8 @@ class BonehBoyenIBE:
             'kek_tag': kek_tag,
             'ciphertext': ciphertext,
             'msg_nonce': msg_cipher.nonce,
-            'msg_tag': msg_tag
+            'msg_tag': msg_tag,
+            'kdf_profile': identity_key_data['kdf_profile']
         }
     
     def decrypt(self, private_key_data, ciphertext_data):
@@ -139,6 +155,7 @@ class BonehBoyenIBE:
         """
         # 提取私钥和随机数
         private_key = private_key_data['private_key']
+        self._check_kdf_profile(private_key_data, ciphertext_data)
         r = ciphertext_data['r']
         
         # 生成KEK（与加密时相同的逻辑）
@@ -172,6 +189,14 @@ def extract(identity):
     """提取身份对应的私钥"""
     return bb_ibe.extract(identity)
 
+def extract_many(identities, workers=None):
+    """并发提取多个身份的私钥，按完成顺序流式返回"""
+    return bb_ibe.extract_many(identities, workers)
+
+def set_kdf_profile(profile):
+    """切换KDF档位（'interactive'/'bulk'/'archival'、档位ID或 KDFProfile）"""
+    return bb_ibe.set_kdf_profile(profile)
+
 def encrypt(identity, message):
     """使用身份加密消息"""
     return bb_ibe.encrypt(identity, message)
@@ -252,4 +277,7 @@ if __name__ == '__main__':
         assert msg == dec
         print(f"   {identity}: ✅")
     
-    print("✅ Boneh-Boyen IBE 完整测试通过！") 
\ No newline at end of file
+    print("✅ Boneh-Boyen IBE 完整测试通过！")
+    
+    # 8-11. 身份密钥缓存、批量提取、持久化存储与KDF档位
+    self_test(BonehBoyenIBE, 8)
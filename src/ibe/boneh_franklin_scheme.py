@@ -23,6 +23,11 @@ from Crypto.Random import get_random_bytes
 from Crypto.Util.Padding import pad, unpad
 import binascii
 
+try:
+    from src.utils.bigint_backend import powmod, backend_info
+except ImportError:
+    from utils.bigint_backend import powmod, backend_info
+
 class BonehFranklinIBE:
     """Boneh-Franklin IBE方案实现"""
     
@@ -44,7 +49,7 @@ class BonehFranklinIBE:
         self.master_secret = random.randint(1, self.p - 1)
         
         # 计算公共参数 P_pub = s * P (P是基点)
-        public_point = pow(self.g, self.master_secret, self.p)
+        public_point = powmod(self.g, self.master_secret, self.p)
         
         self.public_params = {
             'p': self.p,
@@ -75,7 +80,7 @@ class BonehFranklinIBE:
         identity_hash = self._hash_to_point(identity)
         
         # 计算私钥 D_id = s * Q_id (Q_id是身份对应的点)
-        private_key = pow(identity_hash, self.master_secret, self.p)
+        private_key = powmod(identity_hash, self.master_secret, self.p)
         
         return {
             'identity': identity,
@@ -101,14 +106,14 @@ class BonehFranklinIBE:
         r = random.randint(1, self.p - 1)
         
         # 计算 rP
-        rP = pow(self.g, r, self.p)
+        rP = powmod(self.g, r, self.p)
         
         # 将身份信息哈希到点
         identity_point = self._hash_to_point(identity)
         
         # 计算配对 e(Q_id, P_pub)^r (简化实现)
         # 使用简化的配对模拟：(Q_id^r mod p) XOR (P_pub^r mod p)
-        pairing_result = (pow(identity_point, r, self.p) * pow(self.public_params['P_pub'], r, self.p)) % self.p
+        pairing_result = (powmod(identity_point, r, self.p) * powmod(self.public_params['P_pub'], r, self.p)) % self.p
         
         # 从配对结果导出对称密钥
         symmetric_key = self._derive_key(pairing_result)
@@ -151,7 +156,7 @@ class BonehFranklinIBE:
         # 简化实现：使用私钥和U的组合来计算相同的对称密钥
         if self.public_params is None:
             raise ValueError("系统参数未初始化")
-        pairing_result = (pow(identity_point, U, self.p) * pow(self.public_params['P_pub'], U, self.p)) % self.p
+        pairing_result = (powmod(identity_point, U, self.p) * powmod(self.public_params['P_pub'], U, self.p)) % self.p
         
         # 从配对结果导出对称密钥
         symmetric_key = self._derive_key(pairing_result)
@@ -220,6 +225,7 @@ def decrypt(private_key_data, ciphertext_data):
 # === 测试代码 ===
 if __name__ == '__main__':
     print("正在测试 Boneh-Franklin IBE 方案...")
+    print(f"大整数运算后端: {backend_info()['name']}")
     
     # 1. 系统设置
     print("1. 执行 Setup...")
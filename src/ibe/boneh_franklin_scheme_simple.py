@@ -17,56 +17,69 @@ from Crypto.Cipher import AES
 from Crypto.Util.Padding import pad, unpad
 from Crypto.Random import get_random_bytes
 
-class SimpleBonehFranklinIBE:
+try:
+    from ._identity_keys import IdentityKeyMixin, self_test
+    from .kdf_profiles import build_profiles
+except ImportError:
+    from _identity_keys import IdentityKeyMixin, self_test
+    from kdf_profiles import build_profiles
+
+class SimpleBonehFranklinIBE(IdentityKeyMixin):
     """简化版 Boneh-Franklin IBE方案"""
     
-    def __init__(self):
+    # 身份密钥派生的命名成本档位（archival 与原有固定迭代次数一致），一次派生调用 KDF_PASSES 次KDF
+    KDF_PROFILES = build_profiles(100000)
+    KDF_PASSES = 1
+    
+    def __init__(self, key_store_dir=None, kdf_profile=None):
+        """key_store_dir 与 kdf_profile 的含义见 IdentityKeyMixin._init_identity_keys"""
         self.master_secret = None
         self.system_params = None
+        self._init_identity_keys(key_store_dir, kdf_profile)
         
-    def setup(self):
+    def setup(self, restore_from=None):
         """
         Setup阶段：生成系统参数和主密钥
+        restore_from 为此前 setup() 的返回值时恢复其中的主密钥
         """
-        # 生成主密钥（256位随机数）
-        self.master_secret = get_random_bytes(32)
+        if restore_from is not None:
+            # 恢复已有的主密钥（例如进程重启后），此前持久化的身份密钥仍然可用
+            self.master_secret = bytes.fromhex(restore_from['master_secret'])
+        else:
+            # 生成主密钥（256位随机数）
+            self.master_secret = get_random_bytes(32)
         
         # 系统公共参数
         self.system_params = {
             'system_id': 'BF-IBE-v1.0',
             'hash_function': 'sha256',
-            'key_size': 256
+            'key_size': 256,
+            'kdf_profile': self.kdf_profile.id
         }
+        self._reset_key_cache()
         
         return {
             'public_params': self.system_params,
             'master_secret': self.master_secret.hex()
         }
     
-    def extract(self, identity):
-        """
-        Extract阶段：为指定身份生成私钥
-        """
-        if self.master_secret is None:
-            raise ValueError("必须先执行setup()初始化系统")
-            
+    def _master_secrets(self):
+        return (self.master_secret,)
+    
+    def _derive_identity_key(self, identity, profile):
+        """按KDF档位从主密钥派生身份私钥（结果由 identity_key_cache 缓存）"""
         # 使用身份信息和主密钥生成私钥
         # 这里使用HMAC来确保私钥的唯一性和安全性
         identity_bytes = identity.encode('utf-8')
         
-        # 生成确定性的私钥
-        private_key = hashlib.pbkdf2_hmac(
-            'sha256',
-            identity_bytes,
-            self.master_secret,
-            100000,  # 迭代次数
-            32       # 密钥长度
-        )
+        # 生成确定性的私钥（KDF与迭代次数由档位决定，archival档位为PBKDF2 100000次）
+        private_key = profile.derive(identity_bytes, self.master_secret, 32)
         
         return {
             'identity': identity,
             'private_key': private_key,
-            'key_hex': private_key.hex()
+            'key_hex': private_key.hex(),
+            'kdf_profile': profile.id
         }
     
     def encrypt(self, identity, message):
@@ -79,17 +92,11 @@ class SimpleBonehFranklinIBE:
         # 生成随机会话密钥
         session_key = get_random_bytes(32)
         
-        # 生成确定性的身份密钥（与extract中的逻辑一致）
-        identity_bytes = identity.encode('utf-8')
+        # 身份密钥与extract的结果一致，命中缓存时无需重新执行PBKDF2
         if self.master_secret is None:
             raise ValueError("主密钥未初始化")
-        identity_key = hashlib.pbkdf2_hmac(
-            'sha256',
-            identity_bytes,
-            self.master_secret,
-            100000,
-            32
-        )
+        identity_key_data = self.extract(identity)
+        identity_key = identity_key_data['private_key']
         
         # 使用身份密钥加密会话密钥
         kek_cipher = AES.new(identity_key, AES.MODE_EAX)
@@ -108,7 +115,8 @@ class SimpleBonehFranklinIBE:
             'kek_tag': kek_tag,
             'ciphertext': ciphertext,
             'msg_nonce': msg_cipher.nonce,
-            'msg_tag': msg_tag
+            'msg_tag': msg_tag,
+            'kdf_profile': identity_key_data['kdf_profile']
         }
     
     def decrypt(self, private_key_data, ciphertext_data):
@@ -117,6 +125,7 @@ class SimpleBonehFranklinIBE:
         """
         # 提取私钥
         private_key = private_key_data['private_key']
+        self._check_kdf_profile(private_key_data, ciphertext_data)
         
         # 解密会话密钥
         kek_cipher = AES.new(private_key, AES.MODE_EAX, ciphertext_data['kek_nonce'])
@@ -145,6 +154,14 @@ def extract(identity):
     """提取身份对应的私钥"""
     return simple_bf_ibe.extract(identity)
 
+def extract_many(identities, workers=None):
+    """并发提取多个身份的私钥，按完成顺序流式返回"""
+    return simple_bf_ibe.extract_many(identities, workers)
+
+def set_kdf_profile(profile):
+    """切换KDF档位（'interactive'/'bulk'/'archival'、档位ID或 KDFProfile）"""
+    return simple_bf_ibe.set_kdf_profile(profile)
+
 def encrypt(identity, message):
     """使用身份加密消息"""
     return simple_bf_ibe.encrypt(identity, message)
@@ -213,4 +230,7 @@ if __name__ == '__main__':
         messages[user] = decrypted_msg.decode('utf-8')
         print(f"   {user}: ✅")
     
-    print("✅ 多用户测试完成！所有用户都能正确收发消息。") 
\ No newline at end of file
+    print("✅ 多用户测试完成！所有用户都能正确收发消息。")
+    
+    # 7-10. 身份密钥缓存、批量提取、持久化存储与KDF档位
+    self_test(SimpleBonehFranklinIBE, 7)
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+
+"""
+IBE批量身份密钥提取
+
+各方案的 extract 主要开销在 hashlib.pbkdf2_hmac 上，而它在计算期间会释放GIL，
+因此用线程池并发提取即可利用多个CPU核心，不需要多进程（也就无需在进程间复制主密钥）。
+结果按完成顺序流式返回，调用方可以边提取边分发；已提取的密钥会进入共享的身份密钥缓存。
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+def default_workers():
+    """默认线程数：CPU核心数"""
+    return os.cpu_count() or 1
+
+def max_workers():
+    """线程数上限：CPU核心数的2倍（PBKDF2是CPU密集型，更多线程不会更快）"""
+    return 2 * default_workers()
+
+def extract_concurrently(extract, identities, workers=None):
+    """
+    用线程池并发调用 extract，按完成顺序逐个产出结果。
+
+    :param extract: 单个身份的提取函数（如某个方案实例的 extract 方法）
+    :param identities: 身份字符串的可迭代对象
+    :param workers: 线程数，None 表示CPU核心数，超过 max_workers() 时按上限处理；为1时在当前线程内顺序提取
+    :return: 生成器，每项为 {'identity': 身份, 'key': extract的返回值或None, 'error': 错误信息或None}
+    """
+    workers = min(workers or default_workers(), max_workers())
+    if workers == 1:
+        for identity in identities:
+            try:
+                yield {'identity': identity, 'key': extract(identity), 'error': None}
+            except Exception as e:
+                yield {'identity': identity, 'key': None, 'error': str(e)}
+        return
+
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ibe-extract')
+    try:
+        futures = {executor.submit(extract, identity): identity for identity in identities}
+        for future in as_completed(futures):
+            identity = futures[future]
+            try:
+                yield {'identity': identity, 'key': future.result(), 'error': None}
+            except Exception as e:
+                yield {'identity': identity, 'key': None, 'error': str(e)}
+    finally:
+        # 调用方提前停止迭代时取消尚未开始的任务
+        executor.shutdown(wait=True, cancel_futures=True)
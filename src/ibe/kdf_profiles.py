@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+
+"""
+IBE身份密钥派生的成本档位（KDF profile）
+
+各方案从主密钥派生身份密钥时使用的KDF与迭代次数由档位决定：
+- "archival"：PBKDF2-HMAC-SHA256，迭代次数为各方案原有的固定值（BF 100000、BB 每轮50000、SK 75000），
+  派生结果与引入档位之前完全一致，是默认档位；
+- "interactive"：PBKDF2，迭代次数为 archival 的1/10，适合在线请求；
+- "bulk"：HKDF-SHA256 快速路径（主密钥作为HKDF盐，即HMAC密钥），适合高QPS的批量场景。
+
+档位ID形如 "interactive:pbkdf2:10000"，会写入私钥和密文的元数据（'kdf_profile' 字段），
+解密方据此用相同档位提取私钥。密文元数据不可信，因此只接受已登记的档位：三个命名档位，
+以及方案实例上通过 set_kdf_profile/register_kdf_profile/calibrate_kdf_profile 显式登记的自定义档位；
+PBKDF2迭代次数不能超过 archival 的 MAX_ITERATION_FACTOR 倍。
+
+可通过环境变量 CRYPTO_IBE_KDF_PROFILE 设置方案实例的默认档位名称。
+"""
+
+import os
+import time
+import hashlib
+from Crypto.Hash import SHA256
+from Crypto.Protocol.KDF import HKDF
+
+KDF_PBKDF2 = 'pbkdf2'
+KDF_HKDF = 'hkdf'
+
+PROFILE_INTERACTIVE = 'interactive'
+PROFILE_BULK = 'bulk'
+PROFILE_ARCHIVAL = 'archival'
+DEFAULT_PROFILE = PROFILE_ARCHIVAL
+
+# 自定义档位的PBKDF2迭代次数上限：archival 迭代次数的倍数
+MAX_ITERATION_FACTOR = 10
+
+_HKDF_CONTEXT = b'IBE-identity-key'
+
+class KDFProfile:
+    """一个命名的KDF成本档位"""
+    def __init__(self, name, kdf, iterations=0):
+        """
+        :param name: 档位名称
+        :param kdf: 'pbkdf2' 或 'hkdf'
+        :param iterations: PBKDF2迭代次数（HKDF忽略此参数）
+        """
+        if kdf not in (KDF_PBKDF2, KDF_HKDF):
+            raise ValueError(f"不支持的KDF: {kdf}")
+        if kdf == KDF_PBKDF2 and iterations < 1:
+            raise ValueError("PBKDF2迭代次数必须为正整数")
+        if ':' in name:
+            raise ValueError("档位名称不能包含 ':'")
+        self.name = name
+        self.kdf = kdf
+        self.iterations = int(iterations) if kdf == KDF_PBKDF2 else 0
+
+    @property
+    def id(self):
+        """档位ID，写入私钥与密文元数据"""
+        return f"{self.name}:{self.kdf}:{self.iterations}"
+
+    def derive(self, secret, salt, length=32):
+        """
+        :param secret: 输入密钥材料 (bytes)
+        :param salt: 盐（各方案传入主密钥分量）
+        :param length: 输出长度（字节）
+        :return: 派生的密钥 (bytes)
+        """
+        if self.kdf == KDF_PBKDF2:
+            return hashlib.pbkdf2_hmac('sha256', secret, salt, self.iterations, length)
+        return HKDF(secret, length, salt, SHA256, context=_HKDF_CONTEXT)
+
+    def __eq__(self, other):
+        return isinstance(other, KDFProfile) and self.id == other.id
+
+    def __hash__(self):
+        return hash(self.id)
+
+    def __repr__(self):
+        return f"KDFProfile({self.id!r})"
+
+def build_profiles(archival_iterations):
+    """
+    按方案原有的迭代次数生成三个命名档位。
+
+    :param archival_iterations: 方案原有的单次PBKDF2迭代次数
+    :return: 字典 {档位名称: KDFProfile}
+    """
+    return {
+        PROFILE_INTERACTIVE: KDFProfile(PROFILE_INTERACTIVE, KDF_PBKDF2, max(1000, archival_iterations // 10)),
+        PROFILE_BULK: KDFProfile(PROFILE_BULK, KDF_HKDF),
+        PROFILE_ARCHIVAL: KDFProfile(PROFILE_ARCHIVAL, KDF_PBKDF2, archival_iterations),
+    }
+
+def parse_profile_id(profile_id):
+    """
+    由档位ID还原档位。
+
+    :param profile_id: 形如 'name:kdf:iterations' 的字符串
+    :return: KDFProfile
+    """
+    try:
+        name, kdf, iterations = profile_id.split(':')
+        return KDFProfile(name, kdf, int(iterations))
+    except ValueError as e:
+        raise ValueError(f"无效的KDF档位ID: {profile_id}") from e
+
+def resolve_profile(profile, profiles, trusted=False):
+    """
+    把档位名称、档位ID或 KDFProfile 统一为 KDFProfile。
+
+    :param profile: 档位名称（如 'bulk'）、档位ID或 KDFProfile；None 表示环境变量或默认档位
+    :param profiles: 已登记的档位字典（值为 KDFProfile，见 build_profiles）
+    :param trusted: 为True时（调用方自己的配置）还接受未登记的档位ID；
+                    来自密文等不可信输入时保持False，只接受已登记的档位
+    :return: KDFProfile
+    """
+    if isinstance(profile, KDFProfile):
+        return profile
+    if profile is None:
+        profile = os.environ.get('CRYPTO_IBE_KDF_PROFILE') or DEFAULT_PROFILE
+        trusted = True
+    if profile in profiles:
+        return profiles[profile]
+    for registered in profiles.values():
+        if registered.id == profile:
+            return registered
+    if trusted and ':' in profile:
+        return parse_profile_id(profile)
+    raise ValueError(f"未知或未登记的KDF档位: {profile}. 可用档位: {[p.id for p in profiles.values()]}")
+
+def check_profile_cost(profile, archival_iterations):
+    """
+    检查档位的PBKDF2迭代次数不超过 archival_iterations * MAX_ITERATION_FACTOR。
+
+    :param profile: KDFProfile
+    :param archival_iterations: 方案 archival 档位的迭代次数
+    :return: profile
+    """
+    limit = archival_iterations * MAX_ITERATION_FACTOR
+    if profile.kdf == KDF_PBKDF2 and profile.iterations > limit:
+        raise ValueError(f"KDF档位 {profile.id} 的迭代次数超过上限 {limit}")
+    return profile
+
+def calibrate_iterations(target_ms, passes=1, sample_iterations=20000, repeats=3):
+    """
+    测量本机PBKDF2-HMAC-SHA256的速度，估算使一次密钥派生耗时约为 target_ms 的迭代次数。
+
+    :param target_ms: 目标延迟（毫秒），指整个派生过程
+    :param passes: 一次派生中PBKDF2的调用次数（如BB为2），目标延迟在各次调用间平分
+    :param sample_iterations: 测量时使用的迭代次数
+    :param repeats: 测量次数，取最快的一次以减少噪声
+    :return: 单次PBKDF2调用的迭代次数（至少为1）
+    """
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        hashlib.pbkdf2_hmac('sha256', b'calibration', b'calibration-salt', sample_iterations, 32)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    per_iteration_ms = best * 1000 / sample_iterations
+    return max(1, int(target_ms / passes / per_iteration_ms))
+
+if __name__ == '__main__':
+    print("=== KDF档位自检 ===")
+    profiles = build_profiles(100000)
+    for profile in profiles.values():
+        start = time.perf_counter()
+        key = profile.derive(b'alice@example.com', b'\x00' * 32)
+        print(f"{profile.id:<28} {(time.perf_counter() - start) * 1000:8.2f} 毫秒  {key.hex()[:16]}...")
+    assert profiles[PROFILE_ARCHIVAL].derive(b'id', b'salt') == hashlib.pbkdf2_hmac('sha256', b'id', b'salt', 100000, 32)
+    assert resolve_profile('interactive:pbkdf2:12345', profiles, trusted=True) == KDFProfile('interactive', KDF_PBKDF2, 12345)
+    assert resolve_profile('bulk:hkdf:0', profiles) is profiles[PROFILE_BULK]
+    for forged in ('x:pbkdf2:2000000000', 'interactive:pbkdf2:12345'):
+        try:
+            resolve_profile(forged, profiles)
+            raise AssertionError(f"未登记的档位应被拒绝: {forged}")
+        except ValueError:
+            pass
+    try:
+        check_profile_cost(KDFProfile('x', KDF_PBKDF2, 2000000000), 100000)
+        raise AssertionError("超过上限的迭代次数应被拒绝")
+    except ValueError:
+        pass
+
+    for target in (5, 20):
+        iterations = calibrate_iterations(target)
+        profile = KDFProfile(f'calibrated{target}ms', KDF_PBKDF2, iterations)
+        start = time.perf_counter()
+        profile.derive(b'alice@example.com', b'\x00' * 32)
+        print(f"目标 {target} 毫秒 -> {iterations} 次迭代，实测 {(time.perf_counter() - start) * 1000:.2f} 毫秒")
+    print("✅ KDF档位自检通过")
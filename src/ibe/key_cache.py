@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+
+"""
+IBE身份密钥缓存
+
+三种IBE方案的 extract 与 encrypt 都要从主密钥派生身份密钥（数万次迭代的PBKDF2），
+同一身份的重复加密会反复付出这部分开销。本模块基于 utils.lru_cache.LRUCache 提供一个所有方案共享的有界缓存：
+- LRU淘汰，容量上限 maxsize；
+- 每个条目有存活时间 ttl（秒），过期后视为未命中并重新派生；
+- 条目按作用域 (方案ID, 主密钥指纹) 区分，setup() 安装新主密钥时调用 invalidate() 清除旧作用域；
+- 记录命中/未命中/淘汰/过期/失效次数，可通过 key_cache_info() 查看。
+
+注意：缓存中保存的是身份私钥，只应存在于持有主密钥的PKG进程内。
+"""
+
+import time
+import hashlib
+
+try:
+    from src.utils.lru_cache import LRUCache
+except ImportError:
+    from utils.lru_cache import LRUCache
+
+DEFAULT_KEY_CACHE_SIZE = 4096
+DEFAULT_KEY_CACHE_TTL = 900.0
+
+def master_fingerprint(*secrets):
+    """
+    计算主密钥指纹（SHA-256前8字节的十六进制），用于区分不同主密钥下的缓存条目。
+
+    :param secrets: 主密钥分量 (bytes)
+    :return: 16个字符的十六进制字符串
+    """
+    h = hashlib.sha256(b'IBE-master-fingerprint')
+    for secret in secrets:
+        h.update(len(secret).to_bytes(4, 'big'))
+        h.update(secret)
+    return h.hexdigest()[:16]
+
+class IdentityKeyCache(LRUCache):
+    """身份密钥缓存，键为 (作用域, 身份)，可按作用域整体失效"""
+    def __init__(self, maxsize=DEFAULT_KEY_CACHE_SIZE, ttl=DEFAULT_KEY_CACHE_TTL, clock=time.monotonic):
+        super().__init__(maxsize, ttl, clock)
+
+    def get(self, scope, identity, loader):
+        """
+        取出身份密钥，不存在或已过期时调用 loader() 派生并放入缓存。
+
+        :param scope: 作用域（方案ID与主密钥指纹组成的元组，可再追加KDF档位等分量）
+        :param identity: 身份字符串
+        :param loader: 无参数的派生函数
+        :return: 缓存的对象
+        """
+        return super().get((scope, identity), loader)
+
+    def invalidate(self, scope):
+        """
+        删除某个作用域及其子作用域（以 scope 为前缀的元组，如按KDF档位细分的作用域）下的所有条目，
+        主密钥更换时调用。
+
+        :param scope: 作用域
+        :return: 删除的条目数
+        """
+        size = len(scope)
+        return self.discard_if(lambda cache_key: cache_key[0][:size] == scope)
+
+# 所有IBE方案共享的缓存实例
+identity_key_cache = IdentityKeyCache()
+
+def key_cache_info():
+    """
+    返回身份密钥缓存的统计信息。
+
+    :return: 字典，字段见 IdentityKeyCache.stats()
+    """
+    return identity_key_cache.stats()
+
+def clear_key_cache(maxsize=None, ttl=None):
+    """
+    清空身份密钥缓存并重置计数器。
+
+    :param maxsize: 可选，同时调整缓存容量
+    :param ttl: 可选，同时调整条目存活时间（秒）
+    """
+    if maxsize is not None:
+        identity_key_cache.maxsize = maxsize
+    if ttl is not None:
+        identity_key_cache.ttl = ttl
+    identity_key_cache.clear()
+
+if __name__ == '__main__':
+    print("=== 身份密钥缓存自检 ===")
+    now = [0.0]
+    cache = IdentityKeyCache(maxsize=2, ttl=10, clock=lambda: now[0])
+    scope = ('TEST', master_fingerprint(b'master'))
+    calls = []
+    load = lambda name: (lambda: calls.append(name) or name.upper())
+
+    assert cache.get(scope, 'a', load('a')) == 'A'
+    assert cache.get(scope, 'a', load('a')) == 'A' and calls == ['a']
+    cache.get(scope, 'b', load('b'))
+    cache.get(scope, 'c', load('c'))           # 淘汰最久未使用的 'a'
+    assert cache.get(scope, 'a', load('a')) == 'A' and calls == ['a', 'b', 'c', 'a']
+    now[0] = 11.0                              # 全部过期
+    cache.get(scope, 'a', load('a'))
+    assert calls[-1] == 'a'
+    assert cache.invalidate(scope) == 2
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['evictions'], stats['expirations'], stats['invalidations']) == (1, 5, 2, 1, 2)
+    print(f"✅ LRU淘汰、TTL过期与作用域失效正确: {stats}")
@@ -0,0 +1,337 @@
+# -*- coding: utf-8 -*-
+
+"""
+IBE身份密钥的持久化存储
+
+进程重启后内存缓存会清空，重新提取每个活跃身份都要再付一次PBKDF2。本模块把提取结果保存在磁盘上：
+- 每个 (方案ID, 主密钥指纹) 对应一个独立文件 <方案ID>-<指纹>.ibk，主密钥更换后自动使用新文件；
+- 文件由64字节文件头和定长槽位组成，槽位本身就是开放寻址（线性探测）的哈希索引，
+  通过 mmap 访问，一次查找只读取探测到的几个槽位，不会把整个文件载入内存；
+- 槽位以身份的 HMAC-SHA256 作为索引键（文件中不出现明文身份），内容用 AES-256-GCM 加密，
+  索引键作为附加认证数据，防止槽位被互换；两把密钥都由主密钥派生；
+- 装载率超过 MAX_LOAD_FACTOR 时扩容为两倍并重新散列。
+
+文件头格式：
+    'IBKS' | 格式版本(1) | 保留(3) | 容量(4) | 条目数(4) | 方案ID(16) | 主密钥指纹(8) | 密钥校验值(16) | 保留(8)
+槽位格式（SLOT_SIZE 字节）：
+    状态(1) | 索引键(32) | nonce(12) | 密文(_SEALED_SIZE) | 标签(16)
+
+方案实例通过 key_store_dir 参数或环境变量 CRYPTO_IBE_KEY_STORE 启用存储。
+
+注意：存储只在单个PKG进程内使用，多进程同时写同一文件需要外部加锁。
+"""
+
+import os
+import hmac
+import json
+import mmap
+import struct
+import hashlib
+import threading
+from Crypto.Cipher import AES
+from Crypto.Random import get_random_bytes
+
+try:
+    from .key_cache import master_fingerprint
+except ImportError:
+    from key_cache import master_fingerprint
+
+STORE_MAGIC = b'IBKS'
+STORE_VERSION = 1
+STORE_SUFFIX = '.ibk'
+HEADER_SIZE = 64
+SLOT_SIZE = 512
+DEFAULT_CAPACITY = 64  # 初始64个槽位（32KB），按需翻倍扩容
+MAX_LOAD_FACTOR = 0.7
+
+_HEADER = struct.Struct('>4sB3xII16s8s16s8x')
+_DIGEST_SIZE = 32
+_NONCE_SIZE = 12
+_TAG_SIZE = 16
+_SEALED_SIZE = SLOT_SIZE - 1 - _DIGEST_SIZE - _NONCE_SIZE - _TAG_SIZE
+# 密文内部为 长度(2) || 编码后的密钥数据 || 零填充
+MAX_PAYLOAD_SIZE = _SEALED_SIZE - 2
+
+_EMPTY = 0
+_USED = 1
+
+def default_store_dir():
+    """
+    默认存储目录：环境变量 CRYPTO_IBE_KEY_STORE，未设置时返回None（不启用持久化）。
+    """
+    return os.environ.get('CRYPTO_IBE_KEY_STORE') or None
+
+def _derive_keys(system_id, master_secrets):
+    material = b''.join(len(secret).to_bytes(4, 'big') + secret for secret in master_secrets)
+    label = b'IBE-key-store|' + system_id.encode('utf-8')
+    enc_key = hmac.new(material, label + b'|enc', hashlib.sha256).digest()
+    index_key = hmac.new(material, label + b'|index', hashlib.sha256).digest()
+    return enc_key, index_key
+
+def _encode_key_data(key_data):
+    """把 extract 返回的字典编码为字节（值限于 bytes/int/str）"""
+    encoded = {}
+    for name, value in key_data.items():
+        if isinstance(value, bytes):
+            encoded[name] = ['b', value.hex()]
+        elif isinstance(value, int):
+            encoded[name] = ['i', value]
+        else:
+            encoded[name] = ['s', str(value)]
+    return json.dumps(encoded, separators=(',', ':')).encode('utf-8')
+
+def _decode_key_data(data):
+    decoded = {}
+    for name, (kind, value) in json.loads(data.decode('utf-8')).items():
+        decoded[name] = bytes.fromhex(value) if kind == 'b' else value
+    return decoded
+
+class IdentityKeyStore:
+    """单个 (方案ID, 主密钥) 作用域下的持久化身份密钥存储"""
+    def __init__(self, directory, system_id, master_secrets, capacity=DEFAULT_CAPACITY):
+        """
+        :param directory: 存储目录（不存在时自动创建）
+        :param system_id: 方案ID（如 'BF-IBE-v1.0'）
+        :param master_secrets: 主密钥分量 (bytes) 组成的元组
+        :param capacity: 新建文件时的初始槽位数（取2的幂）
+        """
+        self.system_id = system_id
+        self.fingerprint = master_fingerprint(*master_secrets)
+        self._enc_key, self._index_key = _derive_keys(system_id, master_secrets)
+        self._check_value = hmac.new(self._enc_key, b'IBE-key-store-check', hashlib.sha256).digest()[:16]
+        self._lock = threading.RLock()
+
+        os.makedirs(directory, exist_ok=True)
+        safe_id = ''.join(c if c.isalnum() or c in '-_.' else '_' for c in system_id)
+        self.path = os.path.join(directory, f"{safe_id}-{self.fingerprint}{STORE_SUFFIX}")
+        if not os.path.exists(self.path):
+            self._create(self.path, 1 << max(4, (capacity - 1).bit_length()))
+        self._open()
+        self.hits = 0
+        self.misses = 0
+        self.corrupted = 0
+
+    # --- 文件管理 ---
+
+    def _create(self, path, capacity):
+        with open(path, 'wb') as f:
+            f.write(_HEADER.pack(STORE_MAGIC, STORE_VERSION, capacity, 0,
+                                 self.system_id.encode('utf-8')[:16], bytes.fromhex(self.fingerprint),
+                                 self._check_value))
+            f.truncate(HEADER_SIZE + capacity * SLOT_SIZE)
+
+    def _open(self):
+        self._file = open(self.path, 'r+b')
+        self._map = mmap.mmap(self._file.fileno(), 0)
+        magic, version, capacity, count, _, fingerprint, check = _HEADER.unpack_from(self._map, 0)
+        if magic != STORE_MAGIC or version != STORE_VERSION:
+            self.close()
+            raise ValueError(f"无效的身份密钥存储文件: {self.path}")
+        if fingerprint.hex() != self.fingerprint or not hmac.compare_digest(check, self._check_value):
+            self.close()
+            raise ValueError(f"身份密钥存储与当前主密钥不匹配: {self.path}")
+        if len(self._map) != HEADER_SIZE + capacity * SLOT_SIZE:
+            self.close()
+            raise ValueError(f"身份密钥存储文件已损坏: {self.path}")
+        self.capacity = capacity
+        self.count = count
+
+    def _write_count(self):
+        struct.pack_into('>I', self._map, 12, self.count)
+
+    def close(self):
+        """把修改写回磁盘并关闭文件"""
+        with self._lock:
+            if getattr(self, '_map', None) is not None:
+                self._map.flush()
+                self._map.close()
+                self._map = None
+            if getattr(self, '_file', None) is not None:
+                self._file.close()
+                self._file = None
+
+    def flush(self):
+        with self._lock:
+            self._map.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # --- 索引 ---
+
+    def _digest(self, identity):
+        return hmac.new(self._index_key, identity.encode('utf-8'), hashlib.sha256).digest()
+
+    def _probe(self, digest):
+        """返回 (槽位偏移, 是否已存在)；表满时返回 (None, False)"""
+        mask = self.capacity - 1
+        index = int.from_bytes(digest[:8], 'big') & mask
+        view = self._map
+        for _ in range(self.capacity):
+            offset = HEADER_SIZE + index * SLOT_SIZE
+            state = view[offset]
+            if state == _EMPTY:
+                return offset, False
+            if view[offset + 1:offset + 1 + _DIGEST_SIZE] == digest:
+                return offset, True
+            index = (index + 1) & mask
+        return None, False
+
+    def _grow(self):
+        """容量翻倍并重新散列（槽位内容与位置无关，可以原样复制）"""
+        old_map, old_capacity = self._map, self.capacity
+        new_capacity = old_capacity * 2
+        tmp_path = self.path + '.tmp'
+        self._create(tmp_path, new_capacity)
+        with open(tmp_path, 'r+b') as f:
+            new_map = mmap.mmap(f.fileno(), 0)
+            mask = new_capacity - 1
+            for i in range(old_capacity):
+                offset = HEADER_SIZE + i * SLOT_SIZE
+                if old_map[offset] != _USED:
+                    continue
+                digest = old_map[offset + 1:offset + 1 + _DIGEST_SIZE]
+                index = int.from_bytes(digest[:8], 'big') & mask
+                while new_map[HEADER_SIZE + index * SLOT_SIZE] != _EMPTY:
+                    index = (index + 1) & mask
+                target = HEADER_SIZE + index * SLOT_SIZE
+                new_map[target:target + SLOT_SIZE] = old_map[offset:offset + SLOT_SIZE]
+            struct.pack_into('>I', new_map, 12, self.count)
+            new_map.flush()
+            new_map.close()
+        self.close()
+        os.replace(tmp_path, self.path)
+        self._open()
+
+    # --- 读写 ---
+
+    def get(self, identity):
+        """
+        :param identity: 身份字符串
+        :return: 保存的密钥字典，不存在或槽位已损坏时返回None
+        """
+        digest = self._digest(identity)
+        with self._lock:
+            offset, found = self._probe(digest)
+            if not found:
+                self.misses += 1
+                return None
+            slot = self._map[offset:offset + SLOT_SIZE]
+        start = 1 + _DIGEST_SIZE
+        nonce = slot[start:start + _NONCE_SIZE]
+        sealed = slot[start + _NONCE_SIZE:start + _NONCE_SIZE + _SEALED_SIZE]
+        tag = slot[start + _NONCE_SIZE + _SEALED_SIZE:]
+        cipher = AES.new(self._enc_key, AES.MODE_GCM, nonce=nonce)
+        cipher.update(digest)
+        try:
+            plaintext = cipher.decrypt_and_verify(sealed, tag)
+            length = int.from_bytes(plaintext[:2], 'big')
+            key_data = _decode_key_data(plaintext[2:2 + length])
+        except (ValueError, TypeError, KeyError):
+            # 崩溃时写了一半的槽位或被改动的字节：按未命中处理，调用方重新派生后 put() 会覆盖该槽位
+            with self._lock:
+                self.corrupted += 1
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return key_data
+
+    def put(self, identity, key_data):
+        """
+        保存（或覆盖）身份密钥。编码后超过 MAX_PAYLOAD_SIZE 的条目不会保存。
+
+        :param identity: 身份字符串
+        :param key_data: extract 返回的字典
+        :return: 是否已保存
+        """
+        payload = _encode_key_data(key_data)
+        if len(payload) > MAX_PAYLOAD_SIZE:
+            return False
+        digest = self._digest(identity)
+        nonce = get_random_bytes(_NONCE_SIZE)
+        cipher = AES.new(self._enc_key, AES.MODE_GCM, nonce=nonce)
+        cipher.update(digest)
+        plaintext = len(payload).to_bytes(2, 'big') + payload
+        sealed, tag = cipher.encrypt_and_digest(plaintext + b'\x00' * (_SEALED_SIZE - len(plaintext)))
+        slot = bytes([_USED]) + digest + nonce + sealed + tag
+
+        with self._lock:
+            offset, found = self._probe(digest)
+            if not found and (self.count + 1) > self.capacity * MAX_LOAD_FACTOR:
+                self._grow()
+                offset, found = self._probe(digest)
+            self._map[offset:offset + SLOT_SIZE] = slot
+            if not found:
+                self.count += 1
+                self._write_count()
+        return True
+
+    def get_or_create(self, identity, derive):
+        """
+        取出身份密钥，不存在时调用 derive(identity) 派生并保存。
+
+        :param identity: 身份字符串
+        :param derive: 派生函数
+        :return: 密钥字典
+        """
+        key_data = self.get(identity)
+        if key_data is None:
+            key_data = derive(identity)
+            self.put(identity, key_data)
+        return key_data
+
+    def __len__(self):
+        return self.count
+
+    def stats(self):
+        """
+        :return: 字典 {'path', 'entries', 'capacity', 'file_size', 'hits', 'misses', 'corrupted'}
+        """
+        with self._lock:
+            return {
+                'path': self.path,
+                'entries': self.count,
+                'capacity': self.capacity,
+                'file_size': HEADER_SIZE + self.capacity * SLOT_SIZE,
+                'hits': self.hits,
+                'misses': self.misses,
+                'corrupted': self.corrupted
+            }
+
+if __name__ == '__main__':
+    import tempfile
+
+    print("=== 身份密钥存储自检 ===")
+    master = (get_random_bytes(32), get_random_bytes(32))
+    with tempfile.TemporaryDirectory() as directory:
+        identities = [f"DOC{i:04d}@radiology.hospital.com" for i in range(100)]
+        with IdentityKeyStore(directory, 'TEST-IBE', master, capacity=16) as store:
+            for i, identity in enumerate(identities):
+                store.put(identity, {'identity': identity, 'private_key': bytes([i]) * 32, 'factor': i})
+            assert store.capacity >= len(identities) / MAX_LOAD_FACTOR
+        # 重新打开后仍能读取（模拟进程重启）
+        with IdentityKeyStore(directory, 'TEST-IBE', master) as store:
+            assert len(store) == len(identities)
+            assert store.get(identities[42]) == {'identity': identities[42], 'private_key': bytes([42]) * 32, 'factor': 42}
+            assert store.get('nobody@hospital.com') is None
+            with open(store.path, 'rb') as f:
+                assert identities[0].encode() not in f.read()
+            print(f"✅ 扩容、重新打开与查找正确，文件中不含明文身份: {store.stats()}")
+        # 损坏的槽位按未命中处理，重新写入后恢复正常
+        with IdentityKeyStore(directory, 'TEST-IBE', master) as store:
+            offset, found = store._probe(store._digest(identities[7]))
+            assert found
+            store._map[offset + SLOT_SIZE - 1] ^= 0x01
+            assert store.get(identities[7]) is None and store.stats()['corrupted'] == 1
+            repaired = store.get_or_create(identities[7], lambda identity: {'identity': identity, 'factor': 7})
+            assert store.get(identities[7]) == repaired and len(store) == len(identities)
+            print("✅ 损坏的槽位被当作未命中并重新写入")
+        # 其他主密钥使用独立文件
+        other = IdentityKeyStore(directory, 'TEST-IBE', (get_random_bytes(32),))
+        assert len(other) == 0
+        other.close()
+        print("✅ 不同主密钥的存储相互隔离")
@@ -25,22 +25,41 @@ from Crypto.Random import get_random_bytes
 import struct
 import base64
 
-class SakaiKasaharaIBE:
+try:
+    from ._identity_keys import IdentityKeyMixin, self_test
+    from .kdf_profiles import build_profiles
+except ImportError:
+    from _identity_keys import IdentityKeyMixin, self_test
+    from kdf_profiles import build_profiles
+
+class SakaiKasaharaIBE(IdentityKeyMixin):
     """Sakai-Kasahara IBE方案实现"""
     
-    def __init__(self):
+    # 身份密钥派生的命名成本档位（archival 与原有固定迭代次数一致），一次派生调用 KDF_PASSES 次KDF
+    KDF_PROFILES = build_profiles(75000)
+    KDF_PASSES = 1
+    
+    def __init__(self, key_store_dir=None, kdf_profile=None):
+        """key_store_dir 与 kdf_profile 的含义见 IdentityKeyMixin._init_identity_keys"""
         self.master_secret = None
         self.beta = None  # SK-IBE特有的系统参数
         self.system_params = None
+        self._init_identity_keys(key_store_dir, kdf_profile)
         
-    def setup(self):
+    def setup(self, restore_from=None):
         """
         Setup阶段：生成系统参数和主密钥
         SK-IBE使用不同的参数结构
+        restore_from 为此前 setup() 的返回值时恢复其中的主密钥
         """
-        # 生成主密钥
-        self.master_secret = get_random_bytes(32)
-        self.beta = get_random_bytes(32)  # SK-IBE特有参数
+        if restore_from is not None:
+            # 恢复已有的主密钥（例如进程重启后），此前持久化的身份密钥仍然可用
+            self.master_secret = bytes.fromhex(restore_from['master_secret'])
+            self.beta = bytes.fromhex(restore_from['beta_param'])
+        else:
+            # 生成主密钥
+            self.master_secret = get_random_bytes(32)
+            self.beta = get_random_bytes(32)  # SK-IBE特有参数
         
         # 系统公共参数
         self.system_params = {
@@ -48,8 +67,10 @@ class SakaiKasaharaIBE:
             'hash_function': 'sha256',
             'key_size': 256,
             'scheme_type': 'sakai_kasahara',
-            'optimization_level': 'high'
+            'optimization_level': 'high',
+            'kdf_profile': self.kdf_profile.id
         }
+        self._reset_key_cache()
         
         return {
             'public_params': self.system_params,
@@ -57,13 +78,11 @@ class SakaiKasaharaIBE:
             'beta_param': self.beta.hex()
         }
     
-    def extract(self, identity):
-        """
-        Extract阶段：使用SK-IBE的密钥生成算法
-        """
-        if self.master_secret is None or self.beta is None:
-            raise ValueError("必须先执行setup()初始化系统")
-            
+    def _master_secrets(self):
+        return (self.master_secret, self.beta)
+    
+    def _derive_identity_key(self, identity, profile):
+        """使用SK-IBE的密钥生成算法按KDF档位派生身份私钥（结果由 identity_key_cache 缓存）"""
         identity_bytes = identity.encode('utf-8')
         
         # SK-IBE的身份处理：使用逆元计算
@@ -77,14 +96,16 @@ class SakaiKasaharaIBE:
         
         # 使用逆元和主密钥生成私钥
         key_material = struct.pack('>Q', inverse_factor) + self.master_secret
-        private_key = hashlib.pbkdf2_hmac('sha256', key_material, self.beta, 75000, 32)
+        # KDF与迭代次数由档位决定，archival档位为PBKDF2 75000次
+        private_key = profile.derive(key_material, self.beta, 32)
         
         return {
             'identity': identity,
             'private_key': private_key,
             'key_hex': private_key.hex(),
             'identity_hash': identity_hash,
-            'inverse_factor': inverse_factor
+            'inverse_factor': inverse_factor,
+            'kdf_profile': profile.id
         }
     
     def encrypt(self, identity, message):
@@ -97,14 +118,10 @@ class SakaiKasaharaIBE:
         # 生成随机会话密钥
         session_key = get_random_bytes(32)
         
-        # SK-IBE的身份密钥计算（与extract保持一致）
+        # SK-IBE的身份密钥（与extract的结果一致，命中缓存时无需重新执行PBKDF2）
         identity_bytes = identity.encode('utf-8')
-        identity_hash = hashlib.sha256(identity_bytes + self.beta).digest()
-        identity_int = int.from_bytes(identity_hash[:8], byteorder='big')
-        inverse_factor = pow(identity_int, -1, 2**64 - 59)
-        
-        key_material = struct.pack('>Q', inverse_factor) + self.master_secret
-        identity_key = hashlib.pbkdf2_hmac('sha256', key_material, self.beta, 75000, 32)
+        identity_key_data = self.extract(identity)
+        identity_key = identity_key_data['private_key']
         
         # SK-IBE特有的随机化参数
         sk_randomizer = get_random_bytes(24)
@@ -132,7 +149,8 @@ class SakaiKasaharaIBE:
             'kek_nonce': kek_nonce,
             'ciphertext': ciphertext,
             'msg_nonce': msg_nonce,
-            'auth_tag': auth_tag
+            'auth_tag': auth_tag,
+            'kdf_profile': identity_key_data['kdf_profile']
         }
     
     def decrypt(self, private_key_data, ciphertext_data):
@@ -141,6 +159,7 @@ class SakaiKasaharaIBE:
         """
         # 提取私钥和密文组件
         private_key = private_key_data['private_key']
+        self._check_kdf_profile(private_key_data, ciphertext_data)
         sk_randomizer = ciphertext_data['sk_randomizer']
         identity_bytes = ciphertext_data['identity'].encode('utf-8')
         
@@ -172,6 +191,14 @@ def extract(identity):
     """提取身份对应的私钥"""
     return sk_ibe.extract(identity)
 
+def extract_many(identities, workers=None):
+    """并发提取多个身份的私钥，按完成顺序流式返回"""
+    return sk_ibe.extract_many(identities, workers)
+
+def set_kdf_profile(profile):
+    """切换KDF档位（'interactive'/'bulk'/'archival'、档位ID或 KDFProfile）"""
+    return sk_ibe.set_kdf_profile(profile)
+
 def encrypt(identity, message):
     """使用身份加密消息"""
     return sk_ibe.encrypt(identity, message)
@@ -279,4 +306,7 @@ if __name__ == '__main__':
     print(f"   5次完整加密解密耗时: {total_time:.4f} 秒")
     print(f"   平均每次耗时: {total_time/5:.4f} 秒")
     
-    print("✅ Sakai-Kasahara IBE 完整测试通过！") 
\ No newline at end of file
+    print("✅ Sakai-Kasahara IBE 完整测试通过！")
+    
+    # 9-12. 身份密钥缓存、批量提取、持久化存储与KDF档位
+    self_test(SakaiKasaharaIBE, 9)
@@ -13,9 +13,68 @@ ECIES (Elliptic Curve Integrated Encryption Scheme) 是一种混合加密方案
 
 注意：pycryptodome库本身不提供直接的ECIES实现，我们将使用一个专门的库`eciespy`来完成，它底层依赖于`pycryptodome`。
 我们已经安装了 `eciespy` 库。
+
+解析后的密钥对象（coincurve.PublicKey / coincurve.PrivateKey）保存在一个有界LRU缓存中，
+同一接收方的重复加解密不再重复做十六进制解码、点解压和合法性校验；
+load_public_key/load_private_key 返回的对象可直接传给 encrypt/decrypt。
+
+支持两种ECIES引擎（encrypt 的 engine 参数，decrypt 按首字节自动识别）：
+- 'native'（默认）：coincurve ECDH + AES-256-GCM，格式固定如下
+      0xEC | 临时公钥(SEC1编码，未压缩65字节或压缩33字节) | nonce(12) | tag(16) | 密文
+  对称密钥 = SHA-256("ECIES-native-v1" || 临时公钥 || 压缩格式的共享点)，
+  首字节和临时公钥作为GCM附加认证数据。
+- 'eciespy'：与 ecies.encrypt 默认格式逐字节兼容
+      临时公钥(65字节，首字节0x04) | nonce(16) | tag(16) | 密文
+  对称密钥 = HKDF-SHA256(未压缩临时公钥 || 未压缩格式的共享点)。
+  压缩模式对应 eciespy 的 is_ephemeral_key_compressed=True 配置（临时公钥33字节，首字节0x02/0x03）。
+
+compressed=True 时临时公钥使用33字节的压缩点编码，每个密文节省32字节，
+适合对用户ID、摊位ID等短字段逐个加密的场景；ciphertext_overhead/expansion_ratio 给出密文膨胀情况。
+
+临时密钥对可由后台线程预先生成（start_ephemeral_pool），加密时只需与接收方公钥做一次ECDH。
+
+多接收方信封（encrypt_multi/decrypt_multi）只用随机DEK加密一次数据，
+再为每个接收方封装32字节的DEK，格式见 encrypt_multi 上方的说明。
+
+流式加密（encrypt_stream/decrypt_stream）每个流只做一次ECDH，数据按块用AES-GCM加密，
+内存占用与块大小成正比，与文件大小无关。
 """
+import os
+import sys
 import ecies
 import binascii
+import time
+import hashlib
+import coincurve
+from coincurve.utils import get_valid_secret
+from ecies.utils import derive_key, sym_encrypt, sym_decrypt
+from Crypto.Cipher import AES
+from Crypto.Random import get_random_bytes
+
+try:
+    from src.utils.lru_cache import LRUCache
+    from src.utils.background_pool import BackgroundPool
+except ImportError:
+    # 直接运行本文件（python src/pke/xxx.py）时 sys.path 中只有 src/pke，补上 src 目录
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from utils.lru_cache import LRUCache
+    from utils.background_pool import BackgroundPool
+
+# 与 eciespy 默认配置一致：未压缩临时公钥（65字节），AES-256-GCM，16字节nonce
+UNCOMPRESSED_KEY_SIZE = 65
+COMPRESSED_KEY_SIZE = 33
+ETH_PUBLIC_KEY_SIZE = 64
+ECIES_NONCE_SIZE = 16
+
+# native 引擎
+ENGINE_NATIVE = 'native'
+ENGINE_ECIESPY = 'eciespy'
+ENGINES = (ENGINE_NATIVE, ENGINE_ECIESPY)
+DEFAULT_ENGINE = ENGINE_NATIVE
+WIRE_NATIVE = 0xEC
+NATIVE_NONCE_SIZE = 12
+TAG_SIZE = 16
+_NATIVE_KDF_TAG = b'ECIES-native-v1'
 
 def generate_keys():
     """
@@ -30,45 +89,536 @@ def generate_keys():
     public_key_hex = private_key.public_key.to_hex()
     return private_key_hex, public_key_hex
 
-def encrypt(public_key_hex, message):
+# === 解析后密钥的LRU缓存 ===
+
+DEFAULT_KEY_CACHE_SIZE = 1024
+
+_key_cache = LRUCache(DEFAULT_KEY_CACHE_SIZE)
+
+def key_cache_info():
+    """
+    返回解析密钥缓存的统计信息。
+
+    :return: 字典，字段见 LRUCache.stats()
+    """
+    return _key_cache.stats()
+
+def clear_key_cache(maxsize=None):
+    """
+    清空解析密钥缓存并重置计数器。
+
+    :param maxsize: 可选，同时调整缓存容量
+    """
+    if maxsize is not None:
+        _key_cache.maxsize = maxsize
+    _key_cache.clear()
+
+def _key_bytes(key):
+    """
+    把十六进制字符串（可带'0x'前缀、可为奇数长度）或字节串统一为 bytes。
+    """
+    if isinstance(key, str):
+        # 移除'0x'前缀（如果存在）
+        if key.startswith('0x'):
+            key = key[2:]
+        # 确保hex字符串是偶数长度
+        if len(key) % 2 != 0:
+            key = '0' + key
+        return binascii.unhexlify(key)
+    return bytes(key)
+
+def _parse_public_key(key_bytes):
+    # 以太坊风格的64字节公钥省略了0x04前缀
+    if len(key_bytes) == ETH_PUBLIC_KEY_SIZE:
+        key_bytes = b'\x04' + key_bytes
+    return coincurve.PublicKey(key_bytes)
+
+def load_public_key(public_key):
+    """
+    解析公钥并放入缓存，返回可重复使用的公钥对象。
+
+    :param public_key: 十六进制字符串、bytes（33/64/65字节）或已解析的 coincurve.PublicKey
+    :return: coincurve.PublicKey
+    """
+    if isinstance(public_key, coincurve.PublicKey):
+        return public_key
+    key_bytes = _key_bytes(public_key)
+    return _key_cache.get(('public', key_bytes), lambda: _parse_public_key(key_bytes))
+
+def load_private_key(private_key):
+    """
+    解析私钥并放入缓存，返回可重复使用的私钥对象。
+
+    :param private_key: 十六进制字符串、32字节 bytes 或已解析的 coincurve.PrivateKey
+    :return: coincurve.PrivateKey
+    """
+    if isinstance(private_key, coincurve.PrivateKey):
+        return private_key
+    key_bytes = _key_bytes(private_key)
+    return _key_cache.get(('private', key_bytes), lambda: coincurve.PrivateKey(key_bytes))
+
+# === 临时密钥对池 ===
+
+class EphemeralKeyPool(BackgroundPool):
+    """由后台线程填充的一次性临时密钥对池"""
+    def __init__(self, depth=256, low_watermark=None, workers=1):
+        super().__init__(_new_ephemeral_keypair, depth, low_watermark, workers, name='ecies-pool')
+    
+    @property
+    def depth(self):
+        return self.high_watermark
+    
+    def stats(self):
+        """
+        获取临时密钥池的运行统计。
+
+        :return: 字典，字段见 BackgroundPool.stats()，另含 'depth'
+        """
+        stats = super().stats()
+        stats['depth'] = self.depth
+        return stats
+
+_ephemeral_pool = None
+
+def start_ephemeral_pool(depth=256, low_watermark=None, workers=1):
+    """
+    启动后台临时密钥池，之后所有 encrypt 调用优先从池中取用临时密钥对。
+
+    :param depth: 池容量
+    :param low_watermark: 低水位，剩余数量低于该值时开始补充（默认 depth // 4）
+    :param workers: 后台填充线程数
+    :return: EphemeralKeyPool对象
+    """
+    global _ephemeral_pool
+    stop_ephemeral_pool()
+    _ephemeral_pool = EphemeralKeyPool(depth, low_watermark, workers).start()
+    return _ephemeral_pool
+
+def stop_ephemeral_pool():
+    """停止并移除后台临时密钥池"""
+    global _ephemeral_pool
+    if _ephemeral_pool is not None:
+        _ephemeral_pool.stop()
+        _ephemeral_pool = None
+
+def ephemeral_pool_stats():
+    """
+    返回临时密钥池的运行统计，未启动时返回None。
+    """
+    pool = _ephemeral_pool
+    return pool.stats() if pool is not None else None
+
+def _new_ephemeral_keypair():
+    # 直接用秘密值计算临时公钥（coincurve.PrivateKey 还会额外计算一次 x-only 公钥）
+    secret = get_valid_secret()
+    return secret, coincurve.PublicKey.from_valid_secret(secret)
+
+def _ephemeral_keypair():
+    """取得一次加密所需的临时密钥对：优先使用临时密钥池，池为空时在线生成"""
+    pool = _ephemeral_pool
+    keypair = pool.take() if pool is not None else None
+    if keypair is None:
+        keypair = _new_ephemeral_keypair()
+    return keypair
+
+def _native_key(ephemeral_public, shared_point):
+    return hashlib.sha256(_NATIVE_KDF_TAG + ephemeral_public + shared_point).digest()
+
+def _ephemeral_key_size(prefix):
+    """根据SEC1编码的首字节确定临时公钥长度"""
+    if prefix == 0x04:
+        return UNCOMPRESSED_KEY_SIZE
+    if prefix in (0x02, 0x03):
+        return COMPRESSED_KEY_SIZE
+    raise ValueError("无效的ECIES密文：临时公钥编码错误")
+
+def _encrypt_native(public_key, message, compressed=False):
+    ephemeral_secret, ephemeral_key = _ephemeral_keypair()
+    ephemeral_public = ephemeral_key.format(compressed=compressed)
+    shared_point = public_key.multiply(ephemeral_secret).format(compressed=True)
+    
+    header = bytes([WIRE_NATIVE]) + ephemeral_public
+    nonce = get_random_bytes(NATIVE_NONCE_SIZE)
+    cipher = AES.new(_native_key(ephemeral_public, shared_point), AES.MODE_GCM, nonce=nonce)
+    cipher.update(header)
+    ciphertext, tag = cipher.encrypt_and_digest(message)
+    return b''.join((header, nonce, tag, ciphertext))
+
+def _decrypt_native(private_key, ciphertext):
+    if len(ciphertext) < 2:
+        raise ValueError("无效的ECIES密文：长度不足")
+    header_size = 1 + _ephemeral_key_size(ciphertext[1])
+    if len(ciphertext) < header_size + NATIVE_NONCE_SIZE + TAG_SIZE:
+        raise ValueError("无效的ECIES密文：长度不足")
+    
+    ephemeral_public = ciphertext[1:header_size]
+    shared_point = coincurve.PublicKey(ephemeral_public).multiply(private_key.secret).format(compressed=True)
+    nonce = ciphertext[header_size:header_size + NATIVE_NONCE_SIZE]
+    tag = ciphertext[header_size + NATIVE_NONCE_SIZE:header_size + NATIVE_NONCE_SIZE + TAG_SIZE]
+    cipher = AES.new(_native_key(ephemeral_public, shared_point), AES.MODE_GCM, nonce=nonce)
+    cipher.update(ciphertext[:header_size])
+    return cipher.decrypt_and_verify(ciphertext[header_size + NATIVE_NONCE_SIZE + TAG_SIZE:], tag)
+
+def _encrypt_eciespy(public_key, message, compressed=False):
+    ephemeral_secret, ephemeral_key = _ephemeral_keypair()
+    ephemeral_public = ephemeral_key.format(compressed=False)
+    shared_point = public_key.multiply(ephemeral_secret).format(compressed=False)
+    sym_key = derive_key(ephemeral_public + shared_point)
+    if compressed:
+        ephemeral_public = ephemeral_key.format(compressed=True)
+    return ephemeral_public + sym_encrypt(sym_key, message, 'aes-256-gcm', ECIES_NONCE_SIZE)
+
+def _decrypt_eciespy(private_key, ciphertext):
+    if not ciphertext:
+        raise ValueError("无效的ECIES密文：长度不足")
+    key_size = _ephemeral_key_size(ciphertext[0])
+    ephemeral_key = coincurve.PublicKey(ciphertext[:key_size])
+    # HKDF 的输入总是未压缩格式，与 eciespy 的默认配置一致
+    ephemeral_public = ephemeral_key.format(compressed=False)
+    shared_point = ephemeral_key.multiply(private_key.secret).format(compressed=False)
+    sym_key = derive_key(ephemeral_public + shared_point)
+    return sym_decrypt(sym_key, ciphertext[key_size:], 'aes-256-gcm', ECIES_NONCE_SIZE)
+
+def encrypt(public_key_hex, message, engine=DEFAULT_ENGINE, compressed=False):
     """
     使用ECC公钥加密消息。
 
-    :param public_key_hex: 接收方的公钥（十六进制字符串）。
+    :param public_key_hex: 接收方的公钥（十六进制字符串、bytes 或 load_public_key 返回的对象）。
     :param message: 需要加密的明文消息 (bytes)。
+    :param engine: 'native'（默认）或 'eciespy'（与 ecies.encrypt 的输出格式兼容）
+    :param compressed: 为True时临时公钥使用33字节的压缩点编码
     :return: 加密后的密文 (bytes)。
     """
-    # 移除'0x'前缀（如果存在）
-    if public_key_hex.startswith('0x'):
-        public_key_hex = public_key_hex[2:]
-    
-    # 确保hex字符串是偶数长度
-    if len(public_key_hex) % 2 != 0:
-        public_key_hex = '0' + public_key_hex
-        
-    public_key_bytes = binascii.unhexlify(public_key_hex)
-    ciphertext = ecies.encrypt(public_key_bytes, message)
-    return ciphertext
+    public_key = load_public_key(public_key_hex)
+    if engine == ENGINE_NATIVE:
+        return _encrypt_native(public_key, message, compressed)
+    if engine == ENGINE_ECIESPY:
+        return _encrypt_eciespy(public_key, message, compressed)
+    raise ValueError(f"不支持的ECIES引擎: {engine}. 支持的引擎: {list(ENGINES)}")
 
 def decrypt(private_key_hex, ciphertext):
     """
-    使用ECC私钥解密消息。
+    使用ECC私钥解密消息，按首字节自动识别 native 与 eciespy 格式以及临时公钥是否压缩。
 
-    :param private_key_hex: 接收方的私钥（十六进制字符串）。
+    :param private_key_hex: 接收方的私钥（十六进制字符串、bytes 或 load_private_key 返回的对象）。
     :param ciphertext: 需要解密的密文 (bytes)。
     :return: 解密后的明文消息 (bytes)。
     """
-    # 移除'0x'前缀（如果存在）
-    if private_key_hex.startswith('0x'):
-        private_key_hex = private_key_hex[2:]
+    private_key = load_private_key(private_key_hex)
+    if ciphertext[:1] == bytes([WIRE_NATIVE]):
+        return _decrypt_native(private_key, ciphertext)
+    return _decrypt_eciespy(private_key, ciphertext)
+
+def ciphertext_overhead(engine=DEFAULT_ENGINE, compressed=False):
+    """
+    返回单个密文相对明文的固定字节开销。
+
+    :param engine: 'native' 或 'eciespy'
+    :param compressed: 是否使用压缩临时公钥
+    :return: 开销字节数
+    """
+    key_size = COMPRESSED_KEY_SIZE if compressed else UNCOMPRESSED_KEY_SIZE
+    if engine == ENGINE_NATIVE:
+        return 1 + key_size + NATIVE_NONCE_SIZE + TAG_SIZE
+    if engine == ENGINE_ECIESPY:
+        return key_size + ECIES_NONCE_SIZE + TAG_SIZE
+    raise ValueError(f"不支持的ECIES引擎: {engine}. 支持的引擎: {list(ENGINES)}")
+
+def expansion_ratio(plaintext_size, engine=DEFAULT_ENGINE, compressed=False):
+    """
+    计算密文膨胀率（密文长度 / 明文长度）。
+
+    :param plaintext_size: 明文长度（字节，须大于0）
+    :param engine: 'native' 或 'eciespy'
+    :param compressed: 是否使用压缩临时公钥
+    :return: 膨胀率
+    """
+    if plaintext_size <= 0:
+        raise ValueError("明文长度必须大于0")
+    return (plaintext_size + ciphertext_overhead(engine, compressed)) / plaintext_size
+
+# === 多接收方信封 ===
+# 所有接收方共用一个临时密钥（每个接收方的KEK绑定了各自的公钥），格式：
+#   'ECM' | 版本(1) | 接收方数 K(2) | log2(索引表长度)(1) | 临时公钥(65)
+#   | 索引表：每项 接收方ID(8) + 槽位号(2)，空项槽位号为0xFFFF，开放寻址、线性探测
+#   | K 个槽位：每个为 AES-GCM(KEK_i, DEK) 的密文(32) + tag(16)
+#   | nonce(12) | tag(16) | 数据密文
+# 接收方ID = SHA-256(压缩公钥) 的前8字节，读取方按ID直接定位索引表项，O(1) 找到自己的槽位。
+# KEK_i = SHA-256("ECIES-multi-v1" || 临时公钥 || 接收方压缩公钥 || 压缩格式的共享点)，
+# 数据密文的附加认证数据覆盖它之前的全部字节（头部、索引表和所有槽位）。
+
+MULTI_MAGIC = b'ECM'
+MULTI_VERSION = 1
+MAX_RECIPIENTS = 0xFFFE
+DEK_SIZE = 32
+RECIPIENT_ID_SIZE = 8
+_INDEX_ENTRY_SIZE = RECIPIENT_ID_SIZE + 2
+_SLOT_SIZE = DEK_SIZE + TAG_SIZE
+_EMPTY_SLOT = 0xFFFF
+_MULTI_KDF_TAG = b'ECIES-multi-v1'
+_WRAP_NONCE = bytes(NATIVE_NONCE_SIZE)  # 每个KEK只使用一次，固定nonce是安全的
+
+def recipient_id(public_key):
+    """
+    计算接收方ID（压缩公钥SHA-256的前8字节）。
+
+    :param public_key: 公钥（十六进制字符串、bytes 或 coincurve.PublicKey）
+    :return: 8字节 bytes
+    """
+    compressed = load_public_key(public_key).format(compressed=True)
+    return hashlib.sha256(compressed).digest()[:RECIPIENT_ID_SIZE]
+
+def _multi_kek(ephemeral_public, recipient_public, shared_point):
+    return hashlib.sha256(_MULTI_KDF_TAG + ephemeral_public + recipient_public + shared_point).digest()
+
+def _index_position(rid, table_bits):
+    return int.from_bytes(rid[:4], 'big') & ((1 << table_bits) - 1)
+
+def encrypt_multi(public_keys, message):
+    """
+    为多个接收方加密同一份数据：数据只加密一次，每个接收方只额外增加48字节的DEK封装。
 
-    # 确保hex字符串是偶数长度
-    if len(private_key_hex) % 2 != 0:
-        private_key_hex = '0' + private_key_hex
+    :param public_keys: 接收方公钥列表（十六进制字符串、bytes 或 coincurve.PublicKey），重复项会被合并
+    :param message: 明文数据 (bytes)
+    :return: 信封 (bytes)
+    """
+    recipients = []
+    seen = set()
+    for key in public_keys:
+        public_key = load_public_key(key)
+        compressed = public_key.format(compressed=True)
+        if compressed not in seen:
+            seen.add(compressed)
+            recipients.append((public_key, compressed))
+    if not recipients:
+        raise ValueError("至少需要一个接收方")
+    if len(recipients) > MAX_RECIPIENTS:
+        raise ValueError(f"接收方数量不能超过 {MAX_RECIPIENTS}")
+    
+    # 索引表长度取不小于 2K 的2的幂，保证线性探测的期望长度为常数
+    table_bits = max(1, (2 * len(recipients) - 1).bit_length())
+    table = [None] * (1 << table_bits)
+    
+    ephemeral_secret, ephemeral_key = _ephemeral_keypair()
+    ephemeral_public = ephemeral_key.format(compressed=False)
+    header = b''.join((
+        MULTI_MAGIC,
+        bytes([MULTI_VERSION]),
+        len(recipients).to_bytes(2, 'big'),
+        bytes([table_bits]),
+        ephemeral_public
+    ))
+    
+    dek = get_random_bytes(DEK_SIZE)
+    slots = []
+    for slot, (public_key, compressed) in enumerate(recipients):
+        shared_point = public_key.multiply(ephemeral_secret).format(compressed=True)
+        cipher = AES.new(_multi_kek(ephemeral_public, compressed, shared_point), AES.MODE_GCM, nonce=_WRAP_NONCE)
+        cipher.update(header)
+        wrapped, tag = cipher.encrypt_and_digest(dek)
+        slots.append(wrapped + tag)
+        
+        rid = hashlib.sha256(compressed).digest()[:RECIPIENT_ID_SIZE]
+        position = _index_position(rid, table_bits)
+        while table[position] is not None:
+            position = (position + 1) & (len(table) - 1)
+        table[position] = rid + slot.to_bytes(2, 'big')
+    
+    empty_entry = bytes(RECIPIENT_ID_SIZE) + _EMPTY_SLOT.to_bytes(2, 'big')
+    prefix = b''.join([header] + [entry or empty_entry for entry in table] + slots)
+    nonce = get_random_bytes(NATIVE_NONCE_SIZE)
+    cipher = AES.new(dek, AES.MODE_GCM, nonce=nonce)
+    cipher.update(prefix)
+    ciphertext, tag = cipher.encrypt_and_digest(message)
+    return b''.join((prefix, nonce, tag, ciphertext))
 
-    private_key_bytes = binascii.unhexlify(private_key_hex)
-    decrypted_message = ecies.decrypt(private_key_bytes, ciphertext)
-    return decrypted_message
+def decrypt_multi(private_key, envelope):
+    """
+    用接收方私钥解开多接收方信封。
+
+    :param private_key: 接收方私钥（十六进制字符串、bytes 或 coincurve.PrivateKey）
+    :param envelope: encrypt_multi 生成的信封 (bytes)
+    :return: 明文数据 (bytes)
+    """
+    private_key = load_private_key(private_key)
+    view = memoryview(envelope)
+    header_size = len(MULTI_MAGIC) + 4 + UNCOMPRESSED_KEY_SIZE
+    if len(envelope) < header_size or bytes(view[:3]) != MULTI_MAGIC:
+        raise ValueError("无效的多接收方信封：魔数错误")
+    if view[3] != MULTI_VERSION:
+        raise ValueError(f"不支持的信封版本: {view[3]}")
+    count = int.from_bytes(view[4:6], 'big')
+    table_bits = view[6]
+    table_size = 1 << table_bits
+    index_offset = header_size
+    slots_offset = index_offset + table_size * _INDEX_ENTRY_SIZE
+    payload_offset = slots_offset + count * _SLOT_SIZE
+    if len(envelope) < payload_offset + NATIVE_NONCE_SIZE + TAG_SIZE:
+        raise ValueError("无效的多接收方信封：长度不足")
+    
+    header = bytes(view[:header_size])
+    ephemeral_public = header[7:]
+    compressed = private_key.public_key.format(compressed=True)
+    rid = hashlib.sha256(compressed).digest()[:RECIPIENT_ID_SIZE]
+    shared_point = coincurve.PublicKey(ephemeral_public).multiply(private_key.secret).format(compressed=True)
+    kek = _multi_kek(ephemeral_public, compressed, shared_point)
+    
+    # 按接收方ID在索引表中探测，ID碰撞时继续探测下一个匹配项
+    position = _index_position(rid, table_bits)
+    dek = None
+    for _ in range(table_size):
+        entry = index_offset + position * _INDEX_ENTRY_SIZE
+        slot = int.from_bytes(view[entry + RECIPIENT_ID_SIZE:entry + _INDEX_ENTRY_SIZE], 'big')
+        if slot == _EMPTY_SLOT:
+            break
+        if bytes(view[entry:entry + RECIPIENT_ID_SIZE]) == rid and slot < count:
+            wrapped = view[slots_offset + slot * _SLOT_SIZE:slots_offset + (slot + 1) * _SLOT_SIZE]
+            cipher = AES.new(kek, AES.MODE_GCM, nonce=_WRAP_NONCE)
+            cipher.update(header)
+            try:
+                dek = cipher.decrypt_and_verify(wrapped[:DEK_SIZE], wrapped[DEK_SIZE:])
+                break
+            except ValueError:
+                pass
+        position = (position + 1) & (table_size - 1)
+    if dek is None:
+        raise ValueError("该私钥不是信封的接收方")
+    
+    nonce = view[payload_offset:payload_offset + NATIVE_NONCE_SIZE]
+    tag = view[payload_offset + NATIVE_NONCE_SIZE:payload_offset + NATIVE_NONCE_SIZE + TAG_SIZE]
+    cipher = AES.new(dek, AES.MODE_GCM, nonce=bytes(nonce))
+    cipher.update(view[:payload_offset])
+    return cipher.decrypt_and_verify(view[payload_offset + NATIVE_NONCE_SIZE + TAG_SIZE:], bytes(tag))
+
+# === 流式加密 ===
+# 格式：'ECS' | 版本(1) | 块大小(4) | 临时公钥(65) | nonce前缀(7) | 块1 | 块2 | ...
+# 每块为 AES-GCM 密文(除最后一块外均为块大小) + tag(16)，
+# 第 i 块的 nonce = nonce前缀(7) || i(4字节大端) || 末块标志(1)，
+# 因此删除、重排或截断数据块都会导致认证失败。
+# 流密钥 = SHA-256("ECIES-stream-v1" || 头部 || 压缩格式的共享点)，头部被绑定在密钥中。
+
+STREAM_MAGIC = b'ECS'
+STREAM_VERSION = 1
+DEFAULT_CHUNK_SIZE = 64 * 1024
+DEFAULT_MAX_CHUNK_SIZE = 16 * 1024 * 1024  # 解密时接受的最大块大小，块大小来自未认证的头部
+_STREAM_NONCE_PREFIX_SIZE = 7
+_STREAM_HEADER_SIZE = len(STREAM_MAGIC) + 1 + 4 + UNCOMPRESSED_KEY_SIZE + _STREAM_NONCE_PREFIX_SIZE
+_STREAM_KDF_TAG = b'ECIES-stream-v1'
+_MAX_CHUNKS = 1 << 32
+
+def _read_exact(reader, size):
+    """从 reader 读取 size 字节，只有到达流末尾时才会返回更短的结果"""
+    data = reader.read(size)
+    if len(data) == size or not data:
+        return data
+    parts = [data]
+    remaining = size - len(data)
+    while remaining:
+        data = reader.read(remaining)
+        if not data:
+            break
+        parts.append(data)
+        remaining -= len(data)
+    return b''.join(parts)
+
+def _stream_nonce(prefix, counter, last):
+    if counter >= _MAX_CHUNKS:
+        raise ValueError("数据块数量超出上限")
+    return prefix + counter.to_bytes(4, 'big') + (b'\x01' if last else b'\x00')
+
+def _stream_key(header, shared_point):
+    return hashlib.sha256(_STREAM_KDF_TAG + header + shared_point).digest()
+
+def encrypt_stream(public_key, reader, writer, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    流式加密：从 reader 读取明文，把密文写入 writer。
+
+    :param public_key: 接收方公钥（十六进制字符串、bytes 或 coincurve.PublicKey）
+    :param reader: 具有 read(n) 方法的二进制输入流
+    :param writer: 具有 write(b) 方法的二进制输出流
+    :param chunk_size: 明文块大小（字节），超过 DEFAULT_MAX_CHUNK_SIZE 时解密方需相应调大 max_chunk_size
+    :return: 处理的明文字节数
+    """
+    if not 0 < chunk_size < (1 << 32):
+        raise ValueError("块大小必须在 1 到 2^32-1 之间")
+    public_key = load_public_key(public_key)
+    ephemeral_secret, ephemeral_key = _ephemeral_keypair()
+    nonce_prefix = get_random_bytes(_STREAM_NONCE_PREFIX_SIZE)
+    header = b''.join((
+        STREAM_MAGIC,
+        bytes([STREAM_VERSION]),
+        chunk_size.to_bytes(4, 'big'),
+        ephemeral_key.format(compressed=False),
+        nonce_prefix
+    ))
+    key = _stream_key(header, public_key.multiply(ephemeral_secret).format(compressed=True))
+    writer.write(header)
+    
+    # 预读下一块以判断当前块是否为最后一块
+    total = 0
+    counter = 0
+    chunk = _read_exact(reader, chunk_size)
+    while True:
+        following = _read_exact(reader, chunk_size) if len(chunk) == chunk_size else b''
+        last = not following
+        cipher = AES.new(key, AES.MODE_GCM, nonce=_stream_nonce(nonce_prefix, counter, last))
+        ciphertext, tag = cipher.encrypt_and_digest(chunk)
+        writer.write(ciphertext)
+        writer.write(tag)
+        total += len(chunk)
+        if last:
+            return total
+        chunk = following
+        counter += 1
+
+def decrypt_stream(private_key, reader, writer, max_chunk_size=DEFAULT_MAX_CHUNK_SIZE):
+    """
+    流式解密：从 reader 读取密文，把明文写入 writer。
+    每块在写出前都已通过认证；若最终抛出异常（截断、重排或篡改），已写出的内容应被丢弃。
+
+    :param private_key: 接收方私钥（十六进制字符串、bytes 或 coincurve.PrivateKey）
+    :param reader: 具有 read(n) 方法的二进制输入流
+    :param writer: 具有 write(b) 方法的二进制输出流
+    :param max_chunk_size: 允许的最大块大小（字节）；头部中的块大小在认证之前就决定读缓冲区大小，
+                           超过该值的流直接拒绝，内存占用因此由调用方而不是流的发送方决定
+    :return: 写出的明文字节数
+    """
+    private_key = load_private_key(private_key)
+    header = _read_exact(reader, _STREAM_HEADER_SIZE)
+    if len(header) < _STREAM_HEADER_SIZE or header[:3] != STREAM_MAGIC:
+        raise ValueError("无效的加密流：头部错误")
+    if header[3] != STREAM_VERSION:
+        raise ValueError(f"不支持的加密流版本: {header[3]}")
+    chunk_size = int.from_bytes(header[4:8], 'big')
+    if chunk_size == 0:
+        raise ValueError("无效的加密流：块大小为0")
+    if chunk_size > max_chunk_size:
+        raise ValueError(f"加密流的块大小 {chunk_size} 超过上限 {max_chunk_size}")
+    ephemeral_public = header[8:8 + UNCOMPRESSED_KEY_SIZE]
+    nonce_prefix = header[8 + UNCOMPRESSED_KEY_SIZE:]
+    shared_point = coincurve.PublicKey(ephemeral_public).multiply(private_key.secret).format(compressed=True)
+    key = _stream_key(header, shared_point)
+    
+    block_size = chunk_size + TAG_SIZE
+    total = 0
+    counter = 0
+    block = _read_exact(reader, block_size)
+    while True:
+        if len(block) < TAG_SIZE:
+            raise ValueError("加密流被截断")
+        following = _read_exact(reader, block_size) if len(block) == block_size else b''
+        last = not following
+        cipher = AES.new(key, AES.MODE_GCM, nonce=_stream_nonce(nonce_prefix, counter, last))
+        try:
+            chunk = cipher.decrypt_and_verify(block[:-TAG_SIZE], block[-TAG_SIZE:])
+        except ValueError:
+            raise ValueError(f"第 {counter} 个数据块认证失败（数据被篡改、重排或截断）")
+        writer.write(chunk)
+        total += len(chunk)
+        if last:
+            return total
+        block = following
+        counter += 1
 
 # === 测试代码 ===
 if __name__ == '__main__':
@@ -94,4 +644,119 @@ if __name__ == '__main__':
 
     # 5. 验证
     assert original_message == decrypted_message
-    print("成功：解密后的明文与原始明文一致！") 
\ No newline at end of file
+    print("成功：解密后的明文与原始明文一致！")
+
+    # 6. 与 eciespy 的格式兼容
+    compatible_message = encrypt(pub_key_hex, original_message, engine=ENGINE_ECIESPY)
+    assert ecies.decrypt(priv_key_hex, compatible_message) == original_message
+    assert decrypt(priv_key_hex, ecies.encrypt(pub_key_hex, original_message)) == original_message
+    print("成功：密文格式与 eciespy 互通！")
+
+    # 7. 解析密钥缓存
+    import os
+    clear_key_cache()
+    public_key = load_public_key(pub_key_hex)
+    private_key = load_private_key(priv_key_hex)
+    start = time.time()
+    for _ in range(200):
+        assert decrypt(private_key, encrypt(public_key, original_message)) == original_message
+    cached_time = time.time() - start
+    start = time.time()
+    for _ in range(200):
+        ecies.decrypt(priv_key_hex, ecies.encrypt(pub_key_hex, original_message))
+    ecies_time = time.time() - start
+    for _ in range(10):
+        encrypt(pub_key_hex, original_message)
+    start = time.time()
+    for _ in range(200):
+        decrypt(private_key, encrypt(public_key, original_message, engine=ENGINE_ECIESPY))
+    compatible_time = time.time() - start
+    print(f"200次加解密: native引擎 {cached_time:.4f} 秒，eciespy兼容引擎 {compatible_time:.4f} 秒，"
+          f"eciespy库 {ecies_time:.4f} 秒")
+    
+    # 8. 临时密钥池
+    pool = start_ephemeral_pool(depth=128)
+    while pool.stats()['size'] < 128:
+        time.sleep(0.01)
+    start = time.time()
+    for _ in range(200):
+        assert decrypt(private_key, encrypt(public_key, original_message)) == original_message
+    pool_time = time.time() - start
+    stats = ephemeral_pool_stats()
+    stop_ephemeral_pool()
+    assert stats['consumed'] + stats['fallbacks'] == 200
+    print(f"200次加解密（临时密钥池）: {pool_time:.4f} 秒，池统计: {stats}")
+    
+    # 9. 多接收方信封
+    recipients = [generate_keys() for _ in range(20)]
+    payload = os.urandom(64 * 1024)
+    start = time.time()
+    envelope = encrypt_multi([pub for _, pub in recipients], payload)
+    multi_time = time.time() - start
+    assert all(decrypt_multi(priv, envelope) == payload for priv, _ in recipients)
+    try:
+        decrypt_multi(priv_key_hex, envelope)
+        print("错误：非接收方不应能解密信封")
+    except ValueError:
+        pass
+    start = time.time()
+    separate_size = sum(len(encrypt(pub, payload)) for _, pub in recipients)
+    separate_time = time.time() - start
+    print(f"20个接收方、64KB数据：信封 {len(envelope)}B / {multi_time:.4f} 秒，"
+          f"逐个加密 {separate_size}B / {separate_time:.4f} 秒")
+    
+    # 10. 流式加密
+    import io
+    for size in (0, 1000, 4096, 10000):
+        data = os.urandom(size)
+        encrypted_stream = io.BytesIO()
+        encrypt_stream(pub_key_hex, io.BytesIO(data), encrypted_stream, chunk_size=1024 if size != 4096 else 4096)
+        restored = io.BytesIO()
+        decrypt_stream(priv_key_hex, io.BytesIO(encrypted_stream.getvalue()), restored)
+        assert restored.getvalue() == data
+    stream_bytes = encrypted_stream.getvalue()
+    block = 1024 + TAG_SIZE
+    body = stream_bytes[_STREAM_HEADER_SIZE:]
+    attacks = {
+        '截断': stream_bytes[:_STREAM_HEADER_SIZE + 2 * block],
+        '重排': stream_bytes[:_STREAM_HEADER_SIZE] + body[block:2 * block] + body[:block] + body[2 * block:],
+        '追加': stream_bytes + body[:block]
+    }
+    for name, attacked in attacks.items():
+        try:
+            decrypt_stream(priv_key_hex, io.BytesIO(attacked), io.BytesIO())
+            print(f"错误：未检测到{name}")
+        except ValueError:
+            pass
+    oversized = bytearray(stream_bytes)
+    oversized[4:8] = (0xFFFFFFFF).to_bytes(4, 'big')
+    try:
+        decrypt_stream(priv_key_hex, io.BytesIO(bytes(oversized)), io.BytesIO(), max_chunk_size=4096)
+        print("错误：未拒绝超大的块大小")
+    except ValueError:
+        pass
+    print("成功：流式加解密正确，截断/重排/追加与超大块大小均被检测到！")
+    
+    # 11. 压缩点模式
+    field = b'user_0042'
+    for engine in ENGINES:
+        short_ciphertext = encrypt(public_key, field, engine=engine, compressed=True)
+        assert len(short_ciphertext) == len(field) + ciphertext_overhead(engine, compressed=True)
+        assert decrypt(private_key, short_ciphertext) == field
+        print(f"{engine} 引擎 {len(field)}B 字段: 未压缩膨胀率 {expansion_ratio(len(field), engine):.2f}x，"
+              f"压缩膨胀率 {expansion_ratio(len(field), engine, compressed=True):.2f}x")
+    compressed_config = ecies.Config(is_ephemeral_key_compressed=True)
+    assert ecies.decrypt(priv_key_hex, encrypt(pub_key_hex, field, engine=ENGINE_ECIESPY, compressed=True),
+                         compressed_config) == field
+    assert decrypt(priv_key_hex, ecies.encrypt(pub_key_hex, field, compressed_config)) == field
+    print("成功：压缩点模式与 eciespy 的压缩配置互通！")
+    
+    # 12. 篡改检测
+    tampered = bytearray(encrypted_message)
+    tampered[-1] ^= 1
+    try:
+        decrypt(priv_key_hex, bytes(tampered))
+        print("错误：应检测到密文被篡改")
+    except ValueError:
+        print("成功：检测到密文被篡改！")
+    print(f"缓存统计: {key_cache_info()}") 
\ No newline at end of file
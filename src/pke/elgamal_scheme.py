@@ -4,83 +4,773 @@
 本模块实现了ElGamal公钥加密方案。
 
 ElGamal加密基于离散对数难题，支持语义安全的概率加密。
-使用较小的参数以提高性能，适合演示和测试。
+默认使用 RFC 3526 / RFC 7919 中公开审定的安全素数群，
+每次生成密钥只需选取私钥并做一次模幂运算；
+如需全新的随机素数参数，可显式指定 fresh_params=True。
+
+混合加密模式（encrypt_hybrid/decrypt_hybrid）采用KEM/DEM结构：ElGamal只封装一个随机群元素，
+其哈希作为AES-GCM密钥加密任意长度的数据，公钥运算开销与数据长度无关。
+
+加法同态模式（指数ElGamal）把整数 m 编码为 g^m，密文逐分量相乘即得到明文之和，
+解密时用预计算并可持久化的小步大步（BSGS）表求有界离散对数。
+
+密钥和密文使用与模数长度对齐的定长二进制编码（见 export_key/import_key），
+HTTP接口使用其base64形式，避免每次请求都解析十进制大整数。
+
+另支持DSA风格的素数阶子群模式（p, q, g，|q| = 256）：私钥和临时指数都只有256位，
+消息使用哈希掩码编码（c2 = m XOR KDF(y^k)），解密时检查 c1 的子群成员关系。
+
+重新生成素数参数时可用 workers=N 让多个进程同时搜索素数，取最先完成者；
+generate_keys_many 则把批量独立密钥对的生成分摊到多个进程。
 """
 
+import os
+import math
+import base64
 import random
+import secrets
 import hashlib
-from Crypto.Util.number import getPrime, inverse, long_to_bytes, bytes_to_long
+import sys
+import threading
+import multiprocessing
+from array import array
+from Crypto.Cipher import AES
+from Crypto.Random import get_random_bytes
+from Crypto.Util.number import getPrime, isPrime, getRandomNBitInteger, long_to_bytes, bytes_to_long
+
+try:
+    from src.utils.bigint_backend import powmod, native_int, backend_info
+    from src.utils.background_pool import BackgroundPool
+except ImportError:
+    # 直接运行本文件（python src/pke/xxx.py）时 sys.path 中只有 src/pke，补上 src 目录
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from utils.bigint_backend import powmod, native_int, backend_info
+    from utils.background_pool import BackgroundPool
 
 class ElGamalKey:
     """ElGamal密钥类"""
-    def __init__(self, p=None, g=None, y=None, x=None):
+    def __init__(self, p=None, g=None, y=None, x=None, parameter_set=None, q=None):
         self.p = p  # 大素数
         self.g = g  # 生成元
         self.y = y  # 公钥 y = g^x mod p
         self.x = x  # 私钥
+        self.parameter_set = parameter_set  # 内置群参数名称（随机生成的参数为None）
+        self.q = q  # 子群阶（素数阶子群模式），为None时使用完整的 Z_p^*
+        self._fixed_base = None  # 固定基预计算表 {'g': FixedBaseTable, 'y': FixedBaseTable}
+        self._encrypt_count = 0  # 加密次数，用于决定何时自动构建预计算表
+        self._pool = None  # 后台随机数池（RandomnessPool）
+        self._lock = threading.Lock()  # 保护 _encrypt_count 与预计算表的自动构建
+    
+    def __getstate__(self):
+        # 锁和后台线程不能跨进程传递（generate_keys_many 会pickle密钥），预计算表在新进程中按需重建
+        state = self.__dict__.copy()
+        state.update(_fixed_base=None, _encrypt_count=0, _pool=None, _lock=None)
+        return state
+    
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+# === 内置群参数 ===
+# 以下均为安全素数 p = 2q + 1（q 为素数），生成元 g = 2 生成 q 阶子群。
+
+def _hex_param(text):
+    """将RFC中按空格分组的十六进制常量转换为整数"""
+    return int(''.join(text.split()), 16)
+
+# RFC 3526 第3节，2048位 MODP 群（Group 14）
+_MODP_2048_P = _hex_param("""
+    FFFFFFFF FFFFFFFF C90FDAA2 2168C234 C4C6628B 80DC1CD1
+    29024E08 8A67CC74 020BBEA6 3B139B22 514A0879 8E3404DD
+    EF9519B3 CD3A431B 302B0A6D F25F1437 4FE1356D 6D51C245
+    E485B576 625E7EC6 F44C42E9 A637ED6B 0BFF5CB6 F406B7ED
+    EE386BFB 5A899FA5 AE9F2411 7C4B1FE6 49286651 ECE45B3D
+    C2007CB8 A163BF05 98DA4836 1C55D39A 69163FA8 FD24CF5F
+    83655D23 DCA3AD96 1C62F356 208552BB 9ED52907 7096966D
+    670C354E 4ABC9804 F1746C08 CA18217C 32905E46 2E36CE3B
+    E39E772C 180E8603 9B2783A2 EC07A28F B5C55DF0 6F4C52C9
+    DE2BCBF6 95581718 3995497C EA956AE5 15D22618 98FA0510
+    15728E5A 8AACAA68 FFFFFFFF FFFFFFFF
+""")
+
+# RFC 3526 第4节，3072位 MODP 群（Group 15）
+_MODP_3072_P = _hex_param("""
+    FFFFFFFF FFFFFFFF C90FDAA2 2168C234 C4C6628B 80DC1CD1
+    29024E08 8A67CC74 020BBEA6 3B139B22 514A0879 8E3404DD
+    EF9519B3 CD3A431B 302B0A6D F25F1437 4FE1356D 6D51C245
+    E485B576 625E7EC6 F44C42E9 A637ED6B 0BFF5CB6 F406B7ED
+    EE386BFB 5A899FA5 AE9F2411 7C4B1FE6 49286651 ECE45B3D
+    C2007CB8 A163BF05 98DA4836 1C55D39A 69163FA8 FD24CF5F
+    83655D23 DCA3AD96 1C62F356 208552BB 9ED52907 7096966D
+    670C354E 4ABC9804 F1746C08 CA18217C 32905E46 2E36CE3B
+    E39E772C 180E8603 9B2783A2 EC07A28F B5C55DF0 6F4C52C9
+    DE2BCBF6 95581718 3995497C EA956AE5 15D22618 98FA0510
+    15728E5A 8AAAC42D AD33170D 04507A33 A85521AB DF1CBA64
+    ECFB8504 58DBEF0A 8AEA7157 5D060C7D B3970F85 A6E1E4C7
+    ABF5AE8C DB0933D7 1E8C94E0 4A25619D CEE3D226 1AD2EE6B
+    F12FFA06 D98A0864 D8760273 3EC86A64 521F2B18 177B200C
+    BBE11757 7A615D6C 770988C0 BAD946E2 08E24FA0 74E5AB31
+    43DB5BFC E0FD108E 4B82D120 A93AD2CA FFFFFFFF FFFFFFFF
+""")
 
-def generate_keys(key_size=512):
+# RFC 3526 第5节，4096位 MODP 群（Group 16）
+_MODP_4096_P = _hex_param("""
+    FFFFFFFF FFFFFFFF C90FDAA2 2168C234 C4C6628B 80DC1CD1
+    29024E08 8A67CC74 020BBEA6 3B139B22 514A0879 8E3404DD
+    EF9519B3 CD3A431B 302B0A6D F25F1437 4FE1356D 6D51C245
+    E485B576 625E7EC6 F44C42E9 A637ED6B 0BFF5CB6 F406B7ED
+    EE386BFB 5A899FA5 AE9F2411 7C4B1FE6 49286651 ECE45B3D
+    C2007CB8 A163BF05 98DA4836 1C55D39A 69163FA8 FD24CF5F
+    83655D23 DCA3AD96 1C62F356 208552BB 9ED52907 7096966D
+    670C354E 4ABC9804 F1746C08 CA18217C 32905E46 2E36CE3B
+    E39E772C 180E8603 9B2783A2 EC07A28F B5C55DF0 6F4C52C9
+    DE2BCBF6 95581718 3995497C EA956AE5 15D22618 98FA0510
+    15728E5A 8AAAC42D AD33170D 04507A33 A85521AB DF1CBA64
+    ECFB8504 58DBEF0A 8AEA7157 5D060C7D B3970F85 A6E1E4C7
+    ABF5AE8C DB0933D7 1E8C94E0 4A25619D CEE3D226 1AD2EE6B
+    F12FFA06 D98A0864 D8760273 3EC86A64 521F2B18 177B200C
+    BBE11757 7A615D6C 770988C0 BAD946E2 08E24FA0 74E5AB31
+    43DB5BFC E0FD108E 4B82D120 A9210801 1A723C12 A787E6D7
+    88719A10 BDBA5B26 99C32718 6AF4E23C 1A946834 B6150BDA
+    2583E9CA 2AD44CE8 DBBBC2DB 04DE8EF9 2E8EFC14 1FBECAA6
+    287C5947 4E6BC05D 99B2964F A090C3A2 233BA186 515BE7ED
+    1F612970 CEE2D7AF B81BDD76 2170481C D0069127 D5B05AA9
+    93B4EA98 8D8FDDC1 86FFB7DC 90A6C08F 4DF435C9 34063199
+    FFFFFFFF FFFFFFFF
+""")
+
+# RFC 7919 附录A.1，ffdhe2048
+_FFDHE_2048_P = _hex_param("""
+    FFFFFFFF FFFFFFFF ADF85458 A2BB4A9A AFDC5620 273D3CF1
+    D8B9C583 CE2D3695 A9E13641 146433FB CC939DCE 249B3EF9
+    7D2FE363 630C75D8 F681B202 AEC4617A D3DF1ED5 D5FD6561
+    2433F51F 5F066ED0 85636555 3DED1AF3 B557135E 7F57C935
+    984F0C70 E0E68B77 E2A689DA F3EFE872 1DF158A1 36ADE735
+    30ACCA4F 483A797A BC0AB182 B324FB61 D108A94B B2C8E3FB
+    B96ADAB7 60D7F468 1D4F42A3 DE394DF4 AE56EDE7 6372BB19
+    0B07A7C8 EE0A6D70 9E02FCE1 CDF7E2EC C03404CD 28342F61
+    9172FE9C E98583FF 8E4F1232 EEF28183 C3FE3B1B 4C6FAD73
+    3BB5FCBC 2EC22005 C58EF183 7D1683B2 C6F34A26 C1B2EFFA
+    886B4238 61285C97 FFFFFFFF FFFFFFFF
+""")
+
+# RFC 7919 附录A.2，ffdhe3072
+_FFDHE_3072_P = _hex_param("""
+    FFFFFFFF FFFFFFFF ADF85458 A2BB4A9A AFDC5620 273D3CF1
+    D8B9C583 CE2D3695 A9E13641 146433FB CC939DCE 249B3EF9
+    7D2FE363 630C75D8 F681B202 AEC4617A D3DF1ED5 D5FD6561
+    2433F51F 5F066ED0 85636555 3DED1AF3 B557135E 7F57C935
+    984F0C70 E0E68B77 E2A689DA F3EFE872 1DF158A1 36ADE735
+    30ACCA4F 483A797A BC0AB182 B324FB61 D108A94B B2C8E3FB
+    B96ADAB7 60D7F468 1D4F42A3 DE394DF4 AE56EDE7 6372BB19
+    0B07A7C8 EE0A6D70 9E02FCE1 CDF7E2EC C03404CD 28342F61
+    9172FE9C E98583FF 8E4F1232 EEF28183 C3FE3B1B 4C6FAD73
+    3BB5FCBC 2EC22005 C58EF183 7D1683B2 C6F34A26 C1B2EFFA
+    886B4238 611FCFDC DE355B3B 6519035B BC34F4DE F99C0238
+    61B46FC9 D6E6C907 7AD91D26 91F7F7EE 598CB0FA C186D91C
+    AEFE1309 85139270 B4130C93 BC437944 F4FD4452 E2D74DD3
+    64F2E21E 71F54BFF 5CAE82AB 9C9DF69E E86D2BC5 22363A0D
+    ABC52197 9B0DEADA 1DBF9A42 D5C4484E 0ABCD06B FA53DDEF
+    3C1B20EE 3FD59D7C 25E41D2B 66C62E37 FFFFFFFF FFFFFFFF
+""")
+
+# RFC 7919 附录A.3，ffdhe4096
+_FFDHE_4096_P = _hex_param("""
+    FFFFFFFF FFFFFFFF ADF85458 A2BB4A9A AFDC5620 273D3CF1
+    D8B9C583 CE2D3695 A9E13641 146433FB CC939DCE 249B3EF9
+    7D2FE363 630C75D8 F681B202 AEC4617A D3DF1ED5 D5FD6561
+    2433F51F 5F066ED0 85636555 3DED1AF3 B557135E 7F57C935
+    984F0C70 E0E68B77 E2A689DA F3EFE872 1DF158A1 36ADE735
+    30ACCA4F 483A797A BC0AB182 B324FB61 D108A94B B2C8E3FB
+    B96ADAB7 60D7F468 1D4F42A3 DE394DF4 AE56EDE7 6372BB19
+    0B07A7C8 EE0A6D70 9E02FCE1 CDF7E2EC C03404CD 28342F61
+    9172FE9C E98583FF 8E4F1232 EEF28183 C3FE3B1B 4C6FAD73
+    3BB5FCBC 2EC22005 C58EF183 7D1683B2 C6F34A26 C1B2EFFA
+    886B4238 611FCFDC DE355B3B 6519035B BC34F4DE F99C0238
+    61B46FC9 D6E6C907 7AD91D26 91F7F7EE 598CB0FA C186D91C
+    AEFE1309 85139270 B4130C93 BC437944 F4FD4452 E2D74DD3
+    64F2E21E 71F54BFF 5CAE82AB 9C9DF69E E86D2BC5 22363A0D
+    ABC52197 9B0DEADA 1DBF9A42 D5C4484E 0ABCD06B FA53DDEF
+    3C1B20EE 3FD59D7C 25E41D2B 669E1EF1 6E6F52C3 164DF4FB
+    7930E9E4 E58857B6 AC7D5F42 D69F6D18 7763CF1D 55034004
+    87F55BA5 7E31CC7A 7135C886 EFB4318A ED6A1E01 2D9E6832
+    A907600A 918130C4 6DC778F9 71AD0038 092999A3 33CB8B7A
+    1A1DB93D 7140003C 2A4ECEA9 F98D0ACC 0A8291CD CEC97DCF
+    8EC9B55A 7F88A46B 4DB5A851 F44182E1 C68A007E 5E655F6A
+    FFFFFFFF FFFFFFFF
+""")
+
+# RFC 5114 第2.3节，2048位 MODP 群，256位素数阶子群（p = jq + 1，g 生成 q 阶子群）
+_MODP_2048_256_P = _hex_param("""
+    87A8E61D B4B6663C FFBBD19C 65195999 8CEEF608 660DD0F2
+    5D2CEED4 435E3B00 E00DF8F1 D61957D4 FAF7DF45 61B2AA30
+    16C3D911 34096FAA 3BF4296D 830E9A7C 209E0C64 97517ABD
+    5A8A9D30 6BCF67ED 91F9E672 5B4758C0 22E0B1EF 4275BF7B
+    6C5BFC11 D45F9088 B941F54E B1E59BB8 BC39A0BF 12307F5C
+    4FDB70C5 81B23F76 B63ACAE1 CAA6B790 2D525267 35488A0E
+    F13C6D9A 51BFA4AB 3AD83477 96524D8E F6A167B5 A41825D9
+    67E144E5 14056425 1CCACB83 E6B486F6 B3CA3F79 71506026
+    C0B857F6 89962856 DED4010A BD0BE621 C3A3960A 54E710C3
+    75F26375 D7014103 A4B54330 C198AF12 6116D227 6E11715F
+    693877FA D7EF09CA DB094AE9 1E1A1597
+""")
+
+_MODP_2048_256_G = _hex_param("""
+    3FB32C9B 73134D0B 2E775066 60EDBD48 4CA7B18F 21EF2054
+    07F4793A 1A0BA125 10DBC150 77BE463F FF4FED4A AC0BB555
+    BE3A6C1B 0C6B47B1 BC3773BF 7E8C6F62 901228F8 C28CBB18
+    A55AE313 41000A65 0196F931 C77A57F2 DDF463E5 E9EC144B
+    777DE62A AAB8A862 8AC376D2 82D6ED38 64E67982 428EBC83
+    1D14348F 6F2F9193 B5045AF2 767164E1 DFC967C1 FB3F2E55
+    A4BD1BFF E83B9C80 D052B985 D182EA0A DB2A3B73 13D3FE14
+    C8484B1E 052588B9 B7D2BBD2 DF016199 ECD06E15 57CD0915
+    B3353BBB 64E0EC37 7FD02837 0DF92B52 C7891428 CDC67EB6
+    184B523D 1DB246C3 2F630784 90F00EF8 D647D148 D4795451
+    5E2327CF EF98C582 664B4C0F 6CC41659
+""")
+
+_MODP_2048_256_Q = _hex_param("""
+    8CF83642 A709A097 B4479976 40129DA2 99B1A47D 1EB3750B
+    A308B0FE 64F5FBD3
+""")
+
+PARAMETER_SETS = {
+    'modp2048': {'p': _MODP_2048_P, 'g': 2, 'source': 'RFC 3526 Group 14'},
+    'modp3072': {'p': _MODP_3072_P, 'g': 2, 'source': 'RFC 3526 Group 15'},
+    'modp4096': {'p': _MODP_4096_P, 'g': 2, 'source': 'RFC 3526 Group 16'},
+    'ffdhe2048': {'p': _FFDHE_2048_P, 'g': 2, 'source': 'RFC 7919 ffdhe2048'},
+    'ffdhe3072': {'p': _FFDHE_3072_P, 'g': 2, 'source': 'RFC 7919 ffdhe3072'},
+    'ffdhe4096': {'p': _FFDHE_4096_P, 'g': 2, 'source': 'RFC 7919 ffdhe4096'},
+    'modp2048_256': {'p': _MODP_2048_256_P, 'g': _MODP_2048_256_G, 'q': _MODP_2048_256_Q,
+                     'source': 'RFC 5114 2048-bit MODP, 256-bit subgroup'},
+}
+
+# 按密钥长度选择的默认参数集
+DEFAULT_PARAMETER_SETS = {
+    2048: 'ffdhe2048',
+    3072: 'ffdhe3072',
+    4096: 'ffdhe4096',
+}
+
+# 素数阶子群模式的默认参数集
+DEFAULT_SUBGROUP_PARAMETER_SETS = {
+    2048: 'modp2048_256',
+}
+
+def list_parameter_sets():
     """
-    生成ElGamal密钥对。
-    为了提高演示性能，使用较小的密钥长度。
+    列出所有内置的群参数集。
 
-    :param key_size: 密钥长度（比特）
-    :return: (private_key, public_key) - ElGamalKey对象
+    :return: 字典 {名称: {'bits': 模数长度, 'subgroup_bits': 子群阶长度（无则为None）, 'source': 参数来源}}
+    """
+    return {
+        name: {
+            'bits': params['p'].bit_length(),
+            'subgroup_bits': params['q'].bit_length() if 'q' in params else None,
+            'source': params['source']
+        }
+        for name, params in PARAMETER_SETS.items()
+    }
+
+def _generate_fresh_params(key_size):
+    """
+    使用 getPrime 生成全新的素数参数（耗时较长）。
+
+    :param key_size: 模数长度（比特）
+    :return: (p, g)
     """
-    print(f"正在生成 {key_size} 位 ElGamal 密钥...")
-    
     # 生成大素数 p
     p = getPrime(key_size)
     
     # 选择生成元 g (简单选择，实际应用中需要验证)
     g = 2
-    while pow(g, (p-1)//2, p) == 1:  # 确保g是生成元
+    while powmod(g, (p-1)//2, p) == 1:  # 确保g是生成元
         g += 1
         if g > 100:  # 避免无限循环
             g = random.randint(2, p-1)
             break
+    return p, g
+
+def generate_subgroup_params(key_size=2048, subgroup_bits=256):
+    """
+    生成DSA风格的素数阶子群参数 (p, q, g)，满足 q | p-1 且 g 的阶为 q（耗时较长）。
+
+    :param key_size: 模数 p 的长度（比特）
+    :param subgroup_bits: 子群阶 q 的长度（比特）
+    :return: (p, q, g)
+    """
+    q = getPrime(subgroup_bits)
+    while True:
+        # 取 p ≡ 1 (mod 2q)，保证 q | p-1
+        candidate = getRandomNBitInteger(key_size)
+        p = candidate - (candidate % (2 * q)) + 1
+        if p.bit_length() == key_size and isPrime(p):
+            break
+    
+    # g = h^((p-1)/q)，g != 1 时其阶恰为 q
+    cofactor = (p - 1) // q
+    h = 2
+    while True:
+        g = powmod(h, cofactor, p)
+        if g != 1:
+            return p, q, g
+        h += 1
+
+def default_workers():
+    """
+    返回默认的并行进程数（CPU核数）。
+    """
+    return os.cpu_count() or 1
+
+def _race_worker(task):
+    func, args = task
+    return func(*args)
+
+def _race(func, args, workers):
+    """
+    在 workers 个进程中同时运行 func(*args)，返回最先完成的结果并终止其余进程。
+    素数搜索的耗时近似服从几何分布，N 路竞争的期望耗时约为单路的 1/N。
+
+    :param func: 模块级函数（需可被pickle）
+    :param args: 参数元组
+    :param workers: 进程数
+    :return: 最先完成的 func 返回值
+    """
+    if workers <= 1:
+        return func(*args)
+    with multiprocessing.Pool(workers) as pool:
+        result = next(pool.imap_unordered(_race_worker, [(func, args)] * workers))
+        pool.terminate()
+    return result
+
+def generate_keys(key_size=2048, parameter_set=None, fresh_params=False, subgroup=False,
+                  workers=1, verbose=True):
+    """
+    生成ElGamal密钥对。
+    默认从内置群参数中选取与 key_size 对应的参数集，只需生成私钥并计算一次模幂。
+
+    :param key_size: 密钥长度（比特），内置参数支持 2048/3072/4096（子群模式内置 2048）
+    :param parameter_set: 内置参数集名称（见 PARAMETER_SETS），指定后忽略 key_size
+    :param fresh_params: 为True时重新生成素数参数（任意长度，但很慢）
+    :param subgroup: 为True时使用256位素数阶子群模式（短指数）
+    :param workers: 重新生成素数参数时并行搜索的进程数（None 表示使用全部CPU核）
+    :param verbose: 是否打印进度信息
+    :return: (private_key, public_key) - ElGamalKey对象
+    """
+    q = None
+    if fresh_params:
+        if workers is None:
+            workers = default_workers()
+        if verbose:
+            print(f"正在生成 {key_size} 位 ElGamal 密钥（重新生成素数参数，{workers} 个进程）...")
+        if subgroup:
+            p, q, g = _race(generate_subgroup_params, (key_size,), workers)
+        else:
+            p, g = _race(_generate_fresh_params, (key_size,), workers)
+        parameter_set = None
+    else:
+        if parameter_set is None:
+            defaults = DEFAULT_SUBGROUP_PARAMETER_SETS if subgroup else DEFAULT_PARAMETER_SETS
+            if key_size not in defaults:
+                raise ValueError(
+                    f"没有 {key_size} 位的内置群参数，支持的长度: {sorted(defaults)}；"
+                    f"如需其他长度请指定 fresh_params=True"
+                )
+            parameter_set = defaults[key_size]
+        if parameter_set not in PARAMETER_SETS:
+            raise ValueError(f"不支持的参数集: {parameter_set}. 支持的参数集: {list(PARAMETER_SETS.keys())}")
+        params = PARAMETER_SETS[parameter_set]
+        p, g, q = params['p'], params['g'], params.get('q')
+        if verbose:
+            print(f"正在生成 ElGamal 密钥（内置参数 {parameter_set}）...")
     
-    # 生成私钥 x
-    x = random.randint(2, p-2)
+    # 生成私钥 x（子群模式下只有 |q| 位），使用 secrets 中的密码学安全随机数
+    x = secrets.randbelow(q - 1) + 1 if q else secrets.randbelow(p - 3) + 2
     
     # 计算公钥 y = g^x mod p
-    y = pow(g, x, p)
+    y = powmod(g, x, p)
     
-    private_key = ElGamalKey(p, g, y, x)
-    public_key = ElGamalKey(p, g, y, None)
+    private_key = ElGamalKey(p, g, y, x, parameter_set, q)
+    public_key = ElGamalKey(p, g, y, None, parameter_set, q)
     
-    print(f"密钥生成完成。p={p} (len={p.bit_length()}), g={g}")
+    if verbose:
+        print(f"密钥生成完成。p={p} (len={p.bit_length()}), g={g}")
     
     return private_key, public_key
 
-def encrypt(public_key, message):
+def _keygen_worker(options):
+    return generate_keys(**options)
+
+def generate_keys_many(n, key_size=2048, parameter_set=None, fresh_params=False, subgroup=False, workers=None,
+                       verbose=False):
+    """
+    批量生成 n 个相互独立的ElGamal密钥对，分摊到多个进程并行计算。
+    重新生成素数参数时每个密钥对各自搜索素数，收益最明显。
+
+    :param n: 密钥对数量
+    :param key_size: 同 generate_keys
+    :param parameter_set: 同 generate_keys
+    :param fresh_params: 同 generate_keys
+    :param subgroup: 同 generate_keys
+    :param workers: 进程数，None 表示使用全部CPU核
+    :param verbose: 是否打印进度信息
+    :return: [(private_key, public_key), ...]，长度为 n
+    """
+    if workers is None:
+        workers = default_workers()
+    workers = max(1, min(workers, n))
+    options = {
+        'key_size': key_size,
+        'parameter_set': parameter_set,
+        'fresh_params': fresh_params,
+        'subgroup': subgroup,
+        'workers': 1,
+        'verbose': False
+    }
+    if verbose:
+        print(f"正在批量生成 {n} 个 ElGamal 密钥对（{workers} 个进程）...")
+    if workers == 1:
+        return [generate_keys(**options) for _ in range(n)]
+    with multiprocessing.Pool(workers) as pool:
+        return pool.map(_keygen_worker, [options] * n, chunksize=max(1, n // (workers * 4)))
+
+# === 定长二进制编码 ===
+# 所有整数按模数字节长度 w = ceil(|p| / 8) 定长编码，解析时用 memoryview 切片 + int.from_bytes，
+# 不产生中间拷贝。
+#
+# 密钥：'EGK' + 版本(1) + 标志(1) + w(2) + 字段
+#   标志位 0x01 含私钥 x，0x02 含子群阶 q，0x04 使用内置参数集（字段中只含1字节参数集编号，不含p/g/q）
+#   字段顺序：[参数集编号] 或 [p, g, (q)]，然后 y，(x)
+# 密文：0xE1 + c1(w) + c2
+#   c2 在完整群模式下为 w 字节，子群模式下为与消息等长的掩码字节；
+#   旧格式（4字节长度前缀）首字节总是0x00，解密时按首字节自动区分。
+
+KEY_MAGIC = b'EGK'
+KEY_VERSION = 1
+_FLAG_PRIVATE = 0x01
+_FLAG_SUBGROUP = 0x02
+_FLAG_NAMED = 0x04
+
+# 参数集的固定编号（只能追加，不能修改已有编号）
+PARAMETER_SET_IDS = {
+    'modp2048': 1,
+    'modp3072': 2,
+    'modp4096': 3,
+    'ffdhe2048': 4,
+    'ffdhe3072': 5,
+    'ffdhe4096': 6,
+    'modp2048_256': 7,
+}
+_PARAMETER_SET_NAMES = {v: k for k, v in PARAMETER_SET_IDS.items()}
+
+WIRE_FIXED = 0xE1  # 定长密文格式标识
+
+def _width(p):
+    """模数的字节长度"""
+    return (p.bit_length() + 7) // 8
+
+def export_key(key):
+    """
+    将密钥编码为定长二进制格式。
+
+    :param key: ElGamalKey对象（公钥或私钥）
+    :return: bytes
+    """
+    w = _width(key.p)
+    flags = 0
+    if key.x is not None:
+        flags |= _FLAG_PRIVATE
+    if key.q:
+        flags |= _FLAG_SUBGROUP
+    if key.parameter_set in PARAMETER_SET_IDS:
+        flags |= _FLAG_NAMED
+    
+    parts = [KEY_MAGIC, bytes([KEY_VERSION, flags]), w.to_bytes(2, 'big')]
+    if flags & _FLAG_NAMED:
+        parts.append(bytes([PARAMETER_SET_IDS[key.parameter_set]]))
+    else:
+        parts.append(key.p.to_bytes(w, 'big'))
+        parts.append(key.g.to_bytes(w, 'big'))
+        if key.q:
+            parts.append(key.q.to_bytes(w, 'big'))
+    parts.append(key.y.to_bytes(w, 'big'))
+    if key.x is not None:
+        parts.append(key.x.to_bytes(w, 'big'))
+    return b''.join(parts)
+
+def import_key(data):
+    """
+    解析 export_key 生成的二进制密钥。
+
+    :param data: bytes / bytearray / memoryview
+    :return: ElGamalKey对象
+    """
+    mv = memoryview(data)
+    if bytes(mv[:3]) != KEY_MAGIC or mv[3] != KEY_VERSION:
+        raise ValueError("密钥格式错误：无法识别的头部")
+    flags = mv[4]
+    w = int.from_bytes(mv[5:7], 'big')
+    offset = 7
+    
+    def take():
+        nonlocal offset
+        if offset + w > len(mv):
+            raise ValueError("密钥格式错误：长度不足")
+        value = int.from_bytes(mv[offset:offset + w], 'big')
+        offset += w
+        return value
+    
+    parameter_set = None
+    q = None
+    if flags & _FLAG_NAMED:
+        parameter_set = _PARAMETER_SET_NAMES.get(mv[offset])
+        if parameter_set is None:
+            raise ValueError(f"密钥格式错误：未知的参数集编号 {mv[offset]}")
+        offset += 1
+        params = PARAMETER_SETS[parameter_set]
+        p, g, q = params['p'], params['g'], params.get('q')
+    else:
+        p = take()
+        g = take()
+        if flags & _FLAG_SUBGROUP:
+            q = take()
+    y = take()
+    x = take() if flags & _FLAG_PRIVATE else None
+    if offset != len(mv):
+        raise ValueError("密钥格式错误：存在多余数据")
+    return ElGamalKey(p, g, y, x, parameter_set, q)
+
+def export_key_b64(key):
+    """将密钥编码为base64字符串（HTTP传输用）"""
+    return base64.b64encode(export_key(key)).decode('ascii')
+
+def import_key_b64(text):
+    """解析 export_key_b64 生成的base64字符串"""
+    return import_key(base64.b64decode(text))
+
+# === 固定基预计算 ===
+# 同一公钥的 g 和 y 在每次加密中都不变，预计算 base^(d * 2^(w*i)) 后，
+# 一次模幂只需约 bits/w 次模乘，不再需要平方运算。
+
+DEFAULT_WINDOW = 5          # 窗口宽度：2048位时每张表约3.7MB，模幂提速约3-4倍
+PRECOMPUTE_THRESHOLD = 16   # 同一公钥加密次数达到该值后自动构建预计算表
+
+class FixedBaseTable:
+    """固定基分窗口模幂预计算表"""
+    def __init__(self, base, modulus, exponent_bits, window=DEFAULT_WINDOW):
+        self.base = base % modulus
+        self.modulus = modulus
+        self.exponent_bits = exponent_bits
+        self.window = window
+        
+        # 第i行保存 base^(d * 2^(w*i))，d = 0 .. 2^w - 1
+        size = 1 << window
+        rows = (exponent_bits + window - 1) // window
+        # 表项使用运算后端的原生整数类型（gmpy2 下为 mpz），查表相乘时不再来回转换
+        self.rows = []
+        b = native_int(self.base)
+        one = native_int(1)
+        for _ in range(rows):
+            row = [one] * size
+            acc = one
+            for d in range(1, size):
+                acc = (acc * b) % modulus
+                row[d] = acc
+            self.rows.append(row)
+            b = (acc * b) % modulus  # b^(2^w)
+    
+    def pow(self, exponent):
+        """
+        计算 base^exponent mod modulus。
+
+        :param exponent: 非负整数指数，超出表长度时退回内置pow
+        :return: 模幂结果
+        """
+        if exponent < 0 or exponent.bit_length() > self.exponent_bits:
+            return powmod(self.base, exponent, self.modulus)
+        
+        m = native_int(self.modulus)
+        w = self.window
+        mask = (1 << w) - 1
+        result = native_int(1)
+        for row in self.rows:
+            if not exponent:
+                break
+            d = exponent & mask
+            if d:
+                result = (result * row[d]) % m
+            exponent >>= w
+        return int(result)
+    
+    def memory_usage(self):
+        """
+        统计预计算表的内存占用。
+
+        :return: 字典 {'entries': 表项数, 'bytes': 占用字节数}
+        """
+        entries = sum(len(row) for row in self.rows)
+        size = sys.getsizeof(self.rows) + sum(
+            sys.getsizeof(row) + sum(sys.getsizeof(v) for v in row) for row in self.rows
+        )
+        return {'entries': entries, 'bytes': size}
+
+def precompute(public_key, window=DEFAULT_WINDOW):
+    """
+    为公钥构建 g 和 y 的固定基预计算表并缓存在密钥对象上。
+    对同一接收方批量加密前调用，可避免首批加密时的构建延迟。
+
+    :param public_key: ElGamalKey对象（公钥或私钥均可）
+    :param window: 窗口宽度（比特），越大越快但内存占用按 2^w 增长
+    :return: 预计算表的内存占用信息，见 precomputation_info
+    """
+    p = public_key.p
+    exponent_bits = public_key.q.bit_length() if public_key.q else p.bit_length()
+    public_key._fixed_base = {
+        'g': FixedBaseTable(public_key.g, p, exponent_bits, window),
+        'y': FixedBaseTable(public_key.y, p, exponent_bits, window),
+    }
+    return precomputation_info(public_key)
+
+def precomputation_info(public_key):
+    """
+    报告公钥上缓存的预计算表信息。
+
+    :param public_key: ElGamalKey对象
+    :return: 字典 {'built', 'window', 'entries', 'bytes'}
+    """
+    tables = public_key._fixed_base
+    if not tables:
+        return {'built': False, 'window': None, 'entries': 0, 'bytes': 0}
+    usage = [table.memory_usage() for table in tables.values()]
+    return {
+        'built': True,
+        'window': tables['g'].window,
+        'entries': sum(u['entries'] for u in usage),
+        'bytes': sum(u['bytes'] for u in usage),
+    }
+
+def clear_precomputation(public_key):
+    """释放公钥上缓存的预计算表"""
+    public_key._fixed_base = None
+    public_key._encrypt_count = 0
+
+def _ephemeral_pair(public_key, k):
+    """
+    计算加密的离线部分 (c1, s) = (g^k, y^k)，有预计算表时使用查表。
+    """
+    tables = public_key._fixed_base
+    if tables is None:
+        # 随机数池线程与请求线程会并发调用：计数和建表都在锁内，保证表只构建一次
+        with public_key._lock:
+            tables = public_key._fixed_base
+            if tables is None:
+                public_key._encrypt_count += 1
+                if public_key._encrypt_count >= PRECOMPUTE_THRESHOLD:
+                    precompute(public_key)
+                    tables = public_key._fixed_base
+    if tables is not None:
+        return tables['g'].pow(k), tables['y'].pow(k)
+    p = public_key.p
+    return powmod(public_key.g, k, p), powmod(public_key.y, k, p)
+
+def _random_exponent(key):
+    """为密钥所在的群选取密码学安全的随机指数：子群模式下取 [1, q-1]，否则取 [2, p-2]"""
+    if key.q:
+        return secrets.randbelow(key.q - 1) + 1
+    return secrets.randbelow(key.p - 3) + 2
+
+def _mask(data, s, p):
+    """
+    子群模式的消息编码：用 SHA-256(s || counter) 生成的密钥流与消息异或。
+    """
+    s_bytes = s.to_bytes((p.bit_length() + 7) // 8, 'big')
+    stream = bytearray()
+    counter = 0
+    while len(stream) < len(data):
+        stream += hashlib.sha256(b'ElGamal-mask' + s_bytes + counter.to_bytes(4, 'big')).digest()
+        counter += 1
+    return bytes(a ^ b for a, b in zip(data, stream))
+
+# === 后台随机数池（离线/在线分离）===
+# 加密的离线部分 (g^k, y^k) 与消息无关，可由后台线程提前算好；
+# 在线部分只剩一次模乘 c2 = m * s mod p。
+
+class RandomnessPool(BackgroundPool):
+    """为单个公钥预计算一次性 (c1, s) 对的后台随机数池"""
+    def __init__(self, public_key, low_watermark=32, high_watermark=256, workers=1):
+        super().__init__(lambda: _ephemeral_pair(public_key, _random_exponent(public_key)),
+                         high_watermark, low_watermark, workers, name='elgamal-pool')
+        self.public_key = public_key
+
+def start_randomness_pool(public_key, low_watermark=32, high_watermark=256, workers=1):
+    """
+    为公钥启动后台随机数池，之后该公钥的 encrypt 会优先从池中取用 (c1, s)。
+
+    :param public_key: ElGamalKey对象（公钥）
+    :param low_watermark: 低水位，池中剩余数量低于该值时开始补充
+    :param high_watermark: 高水位，补充到该数量后停止
+    :param workers: 后台填充线程数
+    :return: RandomnessPool对象
+    """
+    stop_randomness_pool(public_key)
+    public_key._pool = RandomnessPool(public_key, low_watermark, high_watermark, workers).start()
+    return public_key._pool
+
+def stop_randomness_pool(public_key):
+    """停止并移除公钥上的后台随机数池"""
+    pool = public_key._pool
+    if pool is not None:
+        pool.stop()
+        public_key._pool = None
+
+def _next_pair(public_key):
+    """取得一次加密所需的 (c1, s)：优先使用随机数池，池为空时在线计算"""
+    pair = public_key._pool.take() if public_key._pool is not None else None
+    if pair is None:
+        k = _random_exponent(public_key)  # 选择随机数 k
+        pair = _ephemeral_pair(public_key, k)
+    return pair
+
+def encrypt(public_key, message, wire='fixed'):
     """
     使用ElGamal公钥加密消息。
 
     :param public_key: ElGamalKey对象（公钥）
     :param message: 待加密的消息 (bytes)
+    :param wire: 密文格式，'fixed' 为定长编码，'legacy' 为旧的长度前缀格式
     :return: 密文元组 (c1, c2)，以bytes形式返回
     """
-    p, g, y = public_key.p, public_key.g, public_key.y
+    p = public_key.p
     
-    # 将消息转换为整数
-    m = bytes_to_long(message)
+    if not public_key.q:
+        # 将消息转换为整数
+        m = bytes_to_long(message)
+        
+        # 如果消息太大，需要分块处理
+        if m >= p:
+            raise ValueError(f"消息太大，需要分块处理。消息长度: {m.bit_length()}, 模数长度: {p.bit_length()}")
     
-    # 如果消息太大，需要分块处理
-    if m >= p:
-        raise ValueError(f"消息太大，需要分块处理。消息长度: {m.bit_length()}, 模数长度: {p.bit_length()}")
+    # 计算密文：优先使用随机数池中预计算的 (c1, s)，池为空时在线计算
+    c1, s = _next_pair(public_key)  # c1 = g^k mod p, s = y^k mod p
     
-    # 选择随机数 k
-    k = random.randint(2, p-2)
+    if wire == 'fixed':
+        w = _width(p)
+        if public_key.q:
+            c2_bytes = _mask(message, s, p)  # c2 = m XOR KDF(s)
+        else:
+            c2_bytes = ((m * s) % p).to_bytes(w, 'big')  # c2 = m * s mod p
+        return bytes([WIRE_FIXED]) + c1.to_bytes(w, 'big') + c2_bytes
+    if wire != 'legacy':
+        raise ValueError(f"不支持的密文格式: {wire}")
     
-    # 计算密文
-    c1 = pow(g, k, p)  # c1 = g^k mod p
-    s = pow(y, k, p)   # s = y^k mod p
-    c2 = (m * s) % p   # c2 = m * s mod p
+    if public_key.q:
+        c2_bytes = _mask(message, s, p)  # c2 = m XOR KDF(s)
+    else:
+        c2 = (m * s) % p   # c2 = m * s mod p
+        c2_bytes = long_to_bytes(c2)
     
     # 将整数密文转换为字节
     c1_bytes = long_to_bytes(c1)
-    c2_bytes = long_to_bytes(c2)
     
     # 返回密文长度 + 密文内容的格式
     c1_len = len(c1_bytes).to_bytes(4, 'big')
@@ -88,47 +778,314 @@ def encrypt(public_key, message):
     
     return c1_len + c1_bytes + c2_len + c2_bytes
 
-def decrypt(private_key, ciphertext):
+def _parse_ciphertext(ciphertext, p):
     """
-    使用ElGamal私钥解密消息。
+    解析密文，支持定长格式和旧的 长度+c1+长度+c2 格式。
 
-    :param private_key: ElGamalKey对象（私钥）
     :param ciphertext: 密文 (bytes)
-    :return: 解密后的明文消息 (bytes)
+    :param p: 模数，用于确定定长格式的字段宽度
+    :return: (c1, c2_bytes)，c1为整数，c2保持字节形式
     """
-    p, x = private_key.p, private_key.x
+    if ciphertext[:1] == bytes([WIRE_FIXED]):
+        w = _width(p)
+        mv = memoryview(ciphertext)
+        if len(mv) < 1 + w:
+            raise ValueError("密文格式错误：长度不足")
+        return int.from_bytes(mv[1:1 + w], 'big'), mv[1 + w:]
     
-    # 解析密文格式
     c1_len = int.from_bytes(ciphertext[:4], 'big')
     c1_bytes = ciphertext[4:4+c1_len]
     c2_len = int.from_bytes(ciphertext[4+c1_len:8+c1_len], 'big')
     c2_bytes = ciphertext[8+c1_len:8+c1_len+c2_len]
+    if len(c1_bytes) != c1_len or len(c2_bytes) != c2_len:
+        raise ValueError("密文格式错误：长度字段与内容不符")
     
-    # 转换为整数
-    c1 = bytes_to_long(c1_bytes)
-    c2 = bytes_to_long(c2_bytes)
+    return bytes_to_long(c1_bytes), c2_bytes
+
+def _decrypt_parts(private_key, c1, c2_bytes):
+    """
+    解密已解析的密文 (c1, c2)。
+    完整群模式直接计算 s^(-1) = c1^(p-1-x) mod p，无需单独求模逆；
+    子群模式先检查 c1 属于 q 阶子群，再计算 s = c1^x 去除掩码。
+    """
+    p, x, q = private_key.p, private_key.x, private_key.q
+    if not 1 < c1 < p:
+        raise ValueError("密文分量c1超出范围")
+    if q:
+        if powmod(c1, q, p) != 1:
+            raise ValueError("密文分量c1不在q阶子群中")
+        s = powmod(c1, x, p)              # s = c1^x mod p
+        return _mask(c2_bytes, s, p)   # m = c2 XOR KDF(s)
+    s_inv = powmod(c1, p - 1 - x, p)      # s^(-1) = c1^(-x) mod p
+    m = (int.from_bytes(c2_bytes, 'big') * s_inv) % p  # m = c2 * s^(-1) mod p
+    return long_to_bytes(m)
+
+def decrypt(private_key, ciphertext):
+    """
+    使用ElGamal私钥解密消息。
+
+    :param private_key: ElGamalKey对象（私钥）
+    :param ciphertext: 密文 (bytes)
+    :return: 解密后的明文消息 (bytes)
+    """
+    # 解析密文格式
+    c1, c2_bytes = _parse_ciphertext(ciphertext, private_key.p)
     
     # 解密
-    s = pow(c1, x, p)         # s = c1^x mod p
-    s_inv = inverse(s, p)     # s的模逆
-    m = (c2 * s_inv) % p      # m = c2 * s^(-1) mod p
+    return _decrypt_parts(private_key, c1, c2_bytes)
+
+def decrypt_many(private_key, ciphertexts):
+    """
+    批量解密多个密文。
+    每个密文只做一次模幂（完整群模式为 c1^(p-1-x)），整批不需要任何模逆运算；
+    单个密文出错不影响其余密文。
+
+    :param private_key: ElGamalKey对象（私钥）
+    :param ciphertexts: 密文 (bytes) 的可迭代对象
+    :return: 与输入顺序一致的列表，每项为 {'plaintext': bytes或None, 'error': 错误信息或None}
+    """
+    results = []
+    for ciphertext in ciphertexts:
+        try:
+            c1, c2_bytes = _parse_ciphertext(ciphertext, private_key.p)
+            results.append({'plaintext': _decrypt_parts(private_key, c1, c2_bytes), 'error': None})
+        except Exception as e:
+            results.append({'plaintext': None, 'error': str(e)})
+    return results
+
+# === 混合加密（KEM/DEM）===
+# KEM：c1 = g^k，共享元素 s = y^k，AES密钥 = SHA-256(c1 || s)
+# DEM：AES-256-GCM 一次性加密任意长度数据
+# 密文格式：0xE1 + c1(w字节) + nonce(12字节) + tag(16字节) + 对称密文
+#（旧格式以 c1长度(4字节) + c1 开头）
+
+def _kem_key(c1, s, p):
+    """由封装的群元素导出AES-256密钥"""
+    width = (p.bit_length() + 7) // 8
+    return hashlib.sha256(b'ElGamal-KEM' + c1.to_bytes(width, 'big') + s.to_bytes(width, 'big')).digest()
+
+def encrypt_hybrid(public_key, data):
+    """
+    使用ElGamal KEM + AES-GCM加密任意长度的数据。
+
+    :param public_key: ElGamalKey对象（公钥）
+    :param data: 待加密的数据 (bytes)，长度不受模数限制
+    :return: 密文 (bytes)
+    """
+    p = public_key.p
+    c1, s = _next_pair(public_key)
     
-    # 转换回字节
-    try:
-        message = long_to_bytes(m)
-        return message
-    except Exception as e:
-        # 如果转换失败，可能是填充问题
-        m_bytes = m.to_bytes((m.bit_length() + 7) // 8, 'big')
-        return m_bytes
+    cipher = AES.new(_kem_key(c1, s, p), AES.MODE_GCM, nonce=get_random_bytes(12))
+    ciphertext, tag = cipher.encrypt_and_digest(data)
+    
+    return bytes([WIRE_FIXED]) + c1.to_bytes(_width(p), 'big') + cipher.nonce + tag + ciphertext
+
+def decrypt_hybrid(private_key, ciphertext):
+    """
+    解密 encrypt_hybrid 生成的密文。
+
+    :param private_key: ElGamalKey对象（私钥）
+    :param ciphertext: 密文 (bytes)
+    :return: 解密后的数据 (bytes)，认证失败时抛出ValueError
+    """
+    p, x, q = private_key.p, private_key.x, private_key.q
+    
+    mv = memoryview(ciphertext)
+    if mv[:1] == bytes([WIRE_FIXED]):
+        c1_start, c1_len = 1, _width(p)
+    else:
+        c1_start, c1_len = 4, int.from_bytes(mv[:4], 'big')
+    c1_end = c1_start + c1_len
+    header_len = c1_end + 12 + 16
+    if len(mv) < header_len:
+        raise ValueError("密文格式错误：长度不足")
+    c1 = int.from_bytes(mv[c1_start:c1_end], 'big')
+    nonce = bytes(mv[c1_end:c1_end + 12])
+    tag = bytes(mv[c1_end + 12:header_len])
+    
+    if not 1 < c1 < p:
+        raise ValueError("密文分量c1超出范围")
+    if q and powmod(c1, q, p) != 1:
+        raise ValueError("密文分量c1不在q阶子群中")
+    s = powmod(c1, x, p)  # s = c1^x = y^k mod p
+    
+    cipher = AES.new(_kem_key(c1, s, p), AES.MODE_GCM, nonce=nonce)
+    return cipher.decrypt_and_verify(mv[header_len:], tag)
+
+# === 加法同态（指数ElGamal）===
+# 密文 (c1, c2) = (g^k, g^m * y^k)，两个密文逐分量相乘即为 m1 + m2 的密文。
+# 解密得到 g^m 后，用小步大步法在 [0, bound) 内求离散对数。
+
+DEFAULT_DLOG_BOUND = 2 ** 36  # 可解密的明文上界（MinsaPay单个商户的金额总和约在 2^33 以内）
+
+def encrypt_additive(public_key, value):
+    """
+    使用指数ElGamal加密非负整数。
+
+    :param public_key: ElGamalKey对象（公钥）
+    :param value: 非负整数明文
+    :return: 密文元组 (c1, c2)
+    """
+    value = int(value)
+    if value < 0:
+        raise ValueError("加法同态模式只支持非负整数")
+    p = public_key.p
+    c1, s = _next_pair(public_key)
+    tables = public_key._fixed_base
+    gm = tables['g'].pow(value) if tables else powmod(public_key.g, value, p)
+    return c1, (gm * s) % p  # c2 = g^m * y^k mod p
+
+def add_ciphertexts(public_key, *ciphertexts):
+    """
+    同态相加：返回各密文明文之和的密文。
+
+    :param public_key: ElGamalKey对象（公钥）
+    :param ciphertexts: encrypt_additive 生成的密文元组
+    :return: 密文元组 (c1, c2)
+    """
+    p = public_key.p
+    c1, c2 = 1, 1
+    for a1, a2 in ciphertexts:
+        c1 = (c1 * a1) % p
+        c2 = (c2 * a2) % p
+    return c1, c2
+
+class DiscreteLogTable:
+    """小步大步法离散对数表，求解 g^m = h，0 <= m < bound"""
+    MAGIC = b'EGDL'
+    
+    def __init__(self, g, p, bound=DEFAULT_DLOG_BOUND, baby_steps=None):
+        self.g = g
+        self.p = p
+        self.bound = bound
+        self.step = math.isqrt(bound - 1) + 1
+        self.giant = powmod(g, -self.step, p)  # g^(-step) mod p
+        
+        # 小步表：g^j 的低64位 -> j，查表命中后再验证，避免存储完整的大整数
+        if baby_steps is None:
+            baby_steps = array('Q')
+            acc = 1
+            for _ in range(self.step):
+                baby_steps.append(acc & 0xFFFFFFFFFFFFFFFF)
+                acc = (acc * g) % p
+        self.baby_steps = baby_steps
+        self._index = {key: j for j, key in enumerate(baby_steps)}
+    
+    def solve(self, h):
+        """
+        求 m 使 g^m = h (mod p)。
+
+        :param h: 群元素
+        :return: 整数 m，超出上界时抛出ValueError
+        """
+        g, p, step = self.g, self.p, self.step
+        target = h
+        for i in range(step):
+            j = self._index.get(h & 0xFFFFFFFFFFFFFFFF)
+            if j is not None:
+                m = i * step + j
+                if powmod(g, m, p) == target:
+                    return m
+            h = (h * self.giant) % p
+        raise ValueError(f"离散对数超出上界 {self.bound}")
+    
+    def save(self, path):
+        """将小步表写入文件"""
+        with open(path, 'wb') as f:
+            f.write(self.MAGIC)
+            f.write(self.bound.to_bytes(8, 'big'))
+            f.write(hashlib.sha256(_group_id(self.g, self.p)).digest())
+            self.baby_steps.tofile(f)
+    
+    @classmethod
+    def load(cls, path, g, p):
+        """
+        从文件加载小步表。
+
+        :return: DiscreteLogTable对象，文件不匹配当前群时返回None
+        """
+        with open(path, 'rb') as f:
+            if f.read(4) != cls.MAGIC:
+                return None
+            bound = int.from_bytes(f.read(8), 'big')
+            if f.read(32) != hashlib.sha256(_group_id(g, p)).digest():
+                return None
+            baby_steps = array('Q')
+            baby_steps.frombytes(f.read())
+        table = cls.__new__(cls)
+        table.g, table.p, table.bound = g, p, bound
+        table.step = math.isqrt(bound - 1) + 1
+        if len(baby_steps) != table.step:
+            return None
+        table.giant = powmod(g, -table.step, p)
+        table.baby_steps = baby_steps
+        table._index = {key: j for j, key in enumerate(baby_steps)}
+        return table
+
+def _group_id(g, p):
+    """群 (g, p) 的字节标识"""
+    width = (p.bit_length() + 7) // 8
+    return p.to_bytes(width, 'big') + g.to_bytes(width, 'big')
+
+_dlog_tables = {}  # 进程内缓存：(g, p, bound) -> DiscreteLogTable
+
+def get_dlog_table(key, bound=DEFAULT_DLOG_BOUND, cache_dir=None):
+    """
+    获取密钥所在群的离散对数表：先查进程内缓存，再查磁盘，最后重新计算并持久化。
+
+    :param key: ElGamalKey对象
+    :param bound: 明文上界
+    :param cache_dir: 持久化目录，为None时只缓存在内存中
+    :return: DiscreteLogTable对象
+    """
+    cache_key = (key.g, key.p, bound)
+    table = _dlog_tables.get(cache_key)
+    if table is not None:
+        return table
+    
+    path = None
+    if cache_dir is not None:
+        # 文件名包含精确的上界：不同上界的表各自保存，交替使用时不会互相覆盖
+        digest = hashlib.sha256(_group_id(key.g, key.p)).hexdigest()[:16]
+        path = os.path.join(cache_dir, f"elgamal_dlog_{digest}_{bound}.bin")
+        if os.path.exists(path):
+            table = DiscreteLogTable.load(path, key.g, key.p)
+    if table is None or table.bound != bound:
+        table = DiscreteLogTable(key.g, key.p, bound)
+        if path is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+            table.save(path)
+    _dlog_tables[cache_key] = table
+    return table
+
+def decrypt_additive(private_key, ciphertext, bound=DEFAULT_DLOG_BOUND, cache_dir=None):
+    """
+    解密加法同态密文。
+
+    :param private_key: ElGamalKey对象（私钥）
+    :param ciphertext: 密文元组 (c1, c2)
+    :param bound: 明文上界
+    :param cache_dir: 离散对数表的持久化目录
+    :return: 整数明文
+    """
+    p, x, q = private_key.p, private_key.x, private_key.q
+    c1, c2 = ciphertext
+    if not 0 < c1 < p:
+        raise ValueError("密文分量c1超出范围")
+    if q and powmod(c1, q, p) != 1:
+        raise ValueError("密文分量c1不在q阶子群中")
+    exponent = q - x if q else p - 1 - x
+    gm = (c2 * powmod(c1, exponent, p)) % p  # g^m = c2 * c1^(-x)
+    return get_dlog_table(private_key, bound, cache_dir).solve(gm)
 
 # === 测试代码 ===
 if __name__ == '__main__':
-    print("正在测试 ElGamal 加密方案（优化版）...")
+    print("正在测试 ElGamal 加密方案（内置群参数）...")
+    print(f"大整数运算后端: {backend_info()['name']}")
 
-    # 1. 生成密钥（使用较小参数以提高速度）
-    private_key, public_key = generate_keys(key_size=512)  # 使用512位密钥确保能处理消息
-    print(f"密钥生成完毕。")
+    # 1. 生成密钥（使用内置的 ffdhe2048 群参数）
+    private_key, public_key = generate_keys()
+    print(f"密钥生成完毕。参数集: {private_key.parameter_set}")
 
     # 2. 准备明文
     original_message = b"ElGamal test message."
@@ -153,6 +1110,105 @@ if __name__ == '__main__':
             print("❌ 错误：解密后的明文与原始明文不一致！")
             print(f"原始: {original_message}")
             print(f"解密: {decrypted_message}")
+
+        # 6. 固定基预计算
+        print("正在构建固定基预计算表...")
+        import time
+        info = precompute(public_key)
+        print(f"预计算表: 窗口={info['window']}, 表项={info['entries']}, 内存={info['bytes'] / 1024 / 1024:.2f} MB")
+        start = time.time()
+        for _ in range(10):
+            assert decrypt(private_key, encrypt(public_key, original_message)) == original_message
+        print(f"✅ 预计算加密正确，10次加解密耗时: {time.time() - start:.4f} 秒")
+
+        # 7. 后台随机数池
+        print("正在测试后台随机数池...")
+        pool = start_randomness_pool(public_key, low_watermark=4, high_watermark=16)
+        time.sleep(0.5)
+        start = time.time()
+        for _ in range(10):
+            assert decrypt(private_key, encrypt(public_key, original_message)) == original_message
+        print(f"✅ 随机数池加密正确，10次加解密耗时: {time.time() - start:.4f} 秒")
+        print(f"随机数池统计: {pool.stats()}")
+        stop_randomness_pool(public_key)
+
+        # 8. 批量解密
+        print("正在测试批量解密...")
+        batch = [encrypt(public_key, f"record-{i}".encode()) for i in range(20)]
+        batch.insert(5, b"\x00\x00\x00\x05bad")  # 混入一个格式错误的密文
+        start = time.time()
+        results = decrypt_many(private_key, batch)
+        print(f"批量解密 {len(batch)} 个密文耗时: {time.time() - start:.4f} 秒")
+        assert results[5]['error'] is not None
+        assert [r['plaintext'] for r in results if r['error'] is None] == [f"record-{i}".encode() for i in range(20)]
+        print("✅ 批量解密结果顺序正确，错误密文已单独报告")
+
+        # 9. 素数阶子群模式（256位短指数）
+        print("正在测试素数阶子群模式...")
+        sub_private_key, sub_public_key = generate_keys(subgroup=True)
+        print(f"参数集: {sub_public_key.parameter_set}, |q| = {sub_public_key.q.bit_length()}")
+        start = time.time()
+        for _ in range(10):
+            assert decrypt(sub_private_key, encrypt(sub_public_key, original_message)) == original_message
+        print(f"✅ 子群模式加解密正确，10次加解密耗时: {time.time() - start:.4f} 秒")
+        c1_bytes = long_to_bytes(sub_public_key.p - 1)  # p-1 的阶为2，不在q阶子群中
+        forged = len(c1_bytes).to_bytes(4, 'big') + c1_bytes + (1).to_bytes(4, 'big') + b"\x00"
+        try:
+            decrypt(sub_private_key, forged)
+            print("❌ 错误：子群外的c1应被拒绝")
+        except ValueError as e:
+            print(f"✅ 子群成员检查生效: {e}")
+
+        # 10. 混合加密（KEM/DEM），数据长度不受模数限制
+        print("正在测试混合加密模式...")
+        for size in (16, 1024, 1024 * 1024):
+            data = get_random_bytes(size)
+            start = time.time()
+            hybrid_ciphertext = encrypt_hybrid(public_key, data)
+            assert decrypt_hybrid(private_key, hybrid_ciphertext) == data
+            print(f"✅ {size}B 数据混合加解密正确，耗时: {time.time() - start:.4f} 秒，密文 {len(hybrid_ciphertext)}B")
+        tampered = bytearray(hybrid_ciphertext)
+        tampered[-1] ^= 1
+        try:
+            decrypt_hybrid(private_key, bytes(tampered))
+            print("❌ 错误：应检测到密文被篡改")
+        except ValueError:
+            print("✅ 完整性检查成功：检测到混合密文被篡改")
+
+        # 11. 定长编码与旧格式兼容
+        print("正在测试定长二进制编码...")
+        for key in (public_key, private_key, sub_public_key, sub_private_key):
+            restored = import_key_b64(export_key_b64(key))
+            assert (restored.p, restored.g, restored.y, restored.x, restored.q) == (key.p, key.g, key.y, key.x, key.q)
+        legacy_ciphertext = encrypt(public_key, original_message, wire='legacy')
+        fixed_ciphertext = encrypt(public_key, original_message)
+        assert decrypt(private_key, legacy_ciphertext) == decrypt(private_key, fixed_ciphertext) == original_message
+        print(f"✅ 密钥编码往返正确，公钥 {len(export_key(public_key))}B，"
+              f"密文 {len(fixed_ciphertext)}B（旧格式 {len(legacy_ciphertext)}B）")
+
+        # 12. 加法同态聚合
+        print("正在测试加法同态模式...")
+        values = [50000, 7000, 2500, 1000, 123456]
+        encrypted_values = [encrypt_additive(sub_public_key, v) for v in values]
+        total = add_ciphertexts(sub_public_key, *encrypted_values)
+        start = time.time()
+        get_dlog_table(sub_private_key, bound=2 ** 24)
+        print(f"离散对数表构建耗时: {time.time() - start:.4f} 秒")
+        start = time.time()
+        assert decrypt_additive(sub_private_key, total, bound=2 ** 24) == sum(values)
+        print(f"✅ 同态求和正确: {sum(values)}，解密耗时: {time.time() - start:.4f} 秒")
+
+        # 13. 多进程密钥生成
+        print("正在测试多进程密钥生成...")
+        start = time.time()
+        fresh_private_key, fresh_public_key = generate_keys(1024, fresh_params=True, workers=None, verbose=False)
+        assert decrypt(fresh_private_key, encrypt(fresh_public_key, original_message)) == original_message
+        print(f"✅ 并行素数搜索完成（{default_workers()} 个进程），耗时: {time.time() - start:.4f} 秒")
+        start = time.time()
+        keypairs = generate_keys_many(8, verbose=True)
+        assert len({pub.y for _, pub in keypairs}) == 8
+        assert all(decrypt(priv, encrypt(pub, original_message)) == original_message for priv, pub in keypairs)
+        print(f"✅ 批量生成 {len(keypairs)} 个密钥对，耗时: {time.time() - start:.4f} 秒")
     
     except Exception as e:
         print(f"❌ 测试失败: {e}")
@@ -1,115 +1,988 @@
 # -*- coding: utf-8 -*-
 
 """
-本模块实现了国密SM2公钥加密方案。
+本模块实现了国密SM2公钥加密与数字签名方案。
 
 SM2是中国国家密码管理局发布的公钥密码算法，基于椭圆曲线。
-简化版实现，专注于功能演示和性能测试。
+本实现遵循 GB/T 32918.4 的公钥加密算法，私钥 d 为 [1, n-2] 中的随机数，公钥 P = dG。
+
+密文格式为 C1 || C3 || C2：
+- C1 = 04 || x1 || y1（65字节），其中 (x1, y1) = kG；
+- C3 = SM3(x2 || M || y2)（32字节），其中 (x2, y2) = kP；
+- C2 = M XOR KDF(x2 || y2, |M|)，与明文等长。
+
+点运算使用Jacobian坐标（利用 a = -3 的倍点公式），只在输出时做一次模逆：
+- 生成元 G 的标量乘使用预计算的梳状（comb）表，只需要8次倍点；
+- 任意点的标量乘使用宽度为5的wNAF，预计算的奇数倍点统一转换为仿射坐标后做混合加法。
+
+SM3杂凑和KDF由 sm3_provider 提供，本地OpenSSL支持SM3时使用其C实现。
+
+数字签名遵循 GB/T 32918.2（SM3withSM2，默认用户标识 '1234567812345678'）。
+验签中的 sG + tP 用Straus技巧交错计算；verify_many / SM2Verifier 对同一公钥只构建一次梳状表，
+两张梳状表共用8次倍点，批量验签的坐标转换合并为一次模逆。
+
+批量混合模式（SM4BatchEncryptor / SM4BatchDecryptor）：每个批次只用SM2加密一次随机的
+SM4密钥和HMAC-SM3密钥，批内每条记录用 SM4-CTR 加密并以 HMAC-SM3 认证（先加密后MAC），
+每条记录使用独立的随机nonce，整张表只需一次公钥运算。
+
+注意：纯Python实现不是常数时间的，仅用于教学演示和性能测试。
 """
 
-from gmssl.sm2 import CryptSM2
 import os
+import sys
+import hmac
 import binascii
+import secrets
+
+try:
+    from src.utils import sm3_provider, sm4_cipher
+except ImportError:
+    # 直接运行本文件（python src/pke/xxx.py）时 sys.path 中只有 src/pke，补上 src 目录
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from utils import sm3_provider, sm4_cipher
+
+# === 曲线参数（GB/T 32918.5 推荐曲线） ===
+P = 0xFFFFFFFEFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFF00000000FFFFFFFFFFFFFFFF
+A = 0xFFFFFFFEFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFF00000000FFFFFFFFFFFFFFFC
+B = 0x28E9FA9E9D9F5E344D5A9E4BCF6509A7F39789F515AB8F92DDBCBD414D940E93
+N = 0xFFFFFFFEFFFFFFFFFFFFFFFFFFFFFFFF7203DF6B21C6052B53BBF40939D54123
+GX = 0x32C4AE2C1F1981195F9904466A39C9948FE30BBFF2660BE1715A4589334C74C7
+GY = 0xBC3736A2F4F6779C59BDCEE36B692153D0A9877CC62A474002DF32E52139F0A0
+
+FIELD_SIZE = 32
+C1_SIZE = 1 + 2 * FIELD_SIZE
+C3_SIZE = 32
+
+# Jacobian坐标 (X, Y, Z) 表示仿射点 (X/Z^2, Y/Z^3)，Z = 0 为无穷远点
+INFINITY = (1, 1, 0)
+
+def _is_on_curve(x, y):
+    return 0 <= x < P and 0 <= y < P and (y * y - (x * x * x + A * x + B)) % P == 0
+
+def _jacobian_double(point):
+    """Jacobian坐标倍点（a = -3，dbl-2001-b）"""
+    X1, Y1, Z1 = point
+    if not Z1 or not Y1:
+        return INFINITY
+    delta = Z1 * Z1 % P
+    gamma = Y1 * Y1 % P
+    beta = X1 * gamma % P
+    alpha = 3 * (X1 - delta) * (X1 + delta) % P
+    X3 = (alpha * alpha - 8 * beta) % P
+    Z3 = ((Y1 + Z1) * (Y1 + Z1) - gamma - delta) % P
+    Y3 = (alpha * (4 * beta - X3) - 8 * gamma * gamma) % P
+    return (X3, Y3, Z3)
+
+def _jacobian_add_affine(point, x2, y2):
+    """Jacobian点与仿射点相加（madd-2007-bl）"""
+    X1, Y1, Z1 = point
+    if not Z1:
+        return (x2, y2, 1)
+    Z1Z1 = Z1 * Z1 % P
+    U2 = x2 * Z1Z1 % P
+    S2 = y2 * Z1 * Z1Z1 % P
+    H = (U2 - X1) % P
+    r = 2 * (S2 - Y1) % P
+    if not H:
+        return _jacobian_double(point) if not r else INFINITY
+    HH = H * H % P
+    I = 4 * HH % P
+    J = H * I % P
+    V = X1 * I % P
+    X3 = (r * r - J - 2 * V) % P
+    Y3 = (r * (V - X3) - 2 * Y1 * J) % P
+    Z3 = ((Z1 + H) * (Z1 + H) - Z1Z1 - HH) % P
+    return (X3, Y3, Z3)
+
+def _jacobian_add(p1, p2):
+    """两个Jacobian点相加（add-2007-bl）"""
+    X1, Y1, Z1 = p1
+    X2, Y2, Z2 = p2
+    if not Z1:
+        return p2
+    if not Z2:
+        return p1
+    Z1Z1 = Z1 * Z1 % P
+    Z2Z2 = Z2 * Z2 % P
+    U1 = X1 * Z2Z2 % P
+    U2 = X2 * Z1Z1 % P
+    S1 = Y1 * Z2 * Z2Z2 % P
+    S2 = Y2 * Z1 * Z1Z1 % P
+    H = (U2 - U1) % P
+    r = 2 * (S2 - S1) % P
+    if not H:
+        return _jacobian_double(p1) if not r else INFINITY
+    I = 4 * H * H % P
+    J = H * I % P
+    V = U1 * I % P
+    X3 = (r * r - J - 2 * V) % P
+    Y3 = (r * (V - X3) - 2 * S1 * J) % P
+    Z3 = ((Z1 + Z2) * (Z1 + Z2) - Z1Z1 - Z2Z2) * H % P
+    return (X3, Y3, Z3)
+
+def _to_affine(point):
+    """Jacobian坐标转换为仿射坐标，无穷远点返回None"""
+    X, Y, Z = point
+    if not Z:
+        return None
+    z_inv = pow(Z, -1, P)
+    z_inv2 = z_inv * z_inv % P
+    return (X * z_inv2 % P, Y * z_inv2 * z_inv % P)
+
+def _batch_to_affine(points):
+    """
+    批量转换为仿射坐标（Montgomery批量求逆，只做一次模逆）。
+    输入中不能包含无穷远点。
+    """
+    prefix = []
+    acc = 1
+    for _, _, Z in points:
+        acc = acc * Z % P
+        prefix.append(acc)
+    inv = pow(acc, -1, P)
+    result = [None] * len(points)
+    for i in range(len(points) - 1, -1, -1):
+        X, Y, Z = points[i]
+        z_inv = inv * prefix[i - 1] % P if i else inv
+        inv = inv * Z % P
+        z_inv2 = z_inv * z_inv % P
+        result[i] = (X * z_inv2 % P, Y * z_inv2 * z_inv % P)
+    return result
+
+# === 固定基点的梳状表 ===
+# 标量按 COMB_TEETH 行、每行 _COMB_SPACING 位排列，第 c 列的各位组成表索引 u；
+# 表被再分成 COMB_BLOCKS 组（第 s 组为基本表乘以 2^(s*_COMB_STEPS)），
+# 这样 kQ 只需 _COMB_STEPS 次倍点和至多 _COMB_SPACING 次混合加法。
+# 生成元 G 的表在首次使用时构建；SM2Encryptor 也为接收方公钥构建同样的表。
+COMB_TEETH = 8
+COMB_BLOCKS = 4
+_COMB_SPACING = (N.bit_length() + COMB_TEETH - 1) // COMB_TEETH   # 32
+_COMB_STEPS = _COMB_SPACING // COMB_BLOCKS                          # 8
+_comb_table = None
+
+def _build_comb_table(x, y):
+    """为仿射点 (x, y) 构建梳状表"""
+    # 基点 2^(i*d) Q
+    bases = []
+    point = (x, y, 1)
+    for i in range(COMB_TEETH):
+        bases.append(point)
+        for _ in range(_COMB_SPACING):
+            point = _jacobian_double(point)
+
+    # 基本表 T[u] = sum(u_i * 2^(i*d) Q)
+    size = 1 << COMB_TEETH
+    base_table = [INFINITY] * size
+    for u in range(1, size):
+        high = u.bit_length() - 1
+        base_table[u] = _jacobian_add(base_table[u ^ (1 << high)], bases[high])
+
+    # 第 s 组 = 2^(s*e) * T
+    blocks = [base_table[1:]]
+    for _ in range(1, COMB_BLOCKS):
+        shifted = []
+        for point in blocks[-1]:
+            for _ in range(_COMB_STEPS):
+                point = _jacobian_double(point)
+            shifted.append(point)
+        blocks.append(shifted)
+
+    flat = _batch_to_affine([point for block in blocks for point in block])
+    # 每组前面补一个占位项，使索引 u 直接对应表项
+    return [[None] + flat[s * (size - 1):(s + 1) * (size - 1)] for s in range(COMB_BLOCKS)]
+
+def _comb_mult_jacobian(k, table):
+    """用梳状表计算 kQ（Jacobian坐标）"""
+    mask = (1 << _COMB_SPACING) - 1
+    rows = [(k >> (i * _COMB_SPACING)) & mask for i in range(COMB_TEETH)]
+    result = INFINITY
+    for j in range(_COMB_STEPS - 1, -1, -1):
+        result = _jacobian_double(result)
+        for s in range(COMB_BLOCKS):
+            column = j + s * _COMB_STEPS
+            u = 0
+            for i in range(COMB_TEETH - 1, -1, -1):
+                u = (u << 1) | ((rows[i] >> column) & 1)
+            if u:
+                x, y = table[s][u]
+                result = _jacobian_add_affine(result, x, y)
+    return result
+
+def _base_mult_jacobian(k):
+    """计算 kG（Jacobian坐标），使用生成元的梳状表"""
+    global _comb_table
+    if _comb_table is None:
+        _comb_table = _build_comb_table(GX, GY)
+    return _comb_mult_jacobian(k, _comb_table)
+
+def base_mult(k):
+    """
+    计算 kG。
+
+    :param k: 标量
+    :return: 仿射坐标 (x, y)，结果为无穷远点时返回None
+    """
+    return _to_affine(_base_mult_jacobian(k % N))
+
+# === 任意点的wNAF标量乘 ===
+WNAF_WIDTH = 5
+
+def _wnaf(k, width=WNAF_WIDTH):
+    """计算标量的wNAF表示（低位在前），非零数字均为奇数且绝对值小于 2^(width-1)"""
+    digits = []
+    window = 1 << width
+    half = window >> 1
+    while k:
+        if k & 1:
+            digit = k & (window - 1)
+            if digit >= half:
+                digit -= window
+            k -= digit
+        else:
+            digit = 0
+        digits.append(digit)
+        k >>= 1
+    return digits
+
+def _odd_multiples(x, y, width=WNAF_WIDTH):
+    """预计算 P, 3P, 5P, ..., (2^(width-1)-1)P 的仿射坐标"""
+    point = (x, y, 1)
+    twice = _jacobian_double(point)
+    multiples = [point]
+    for _ in range((1 << (width - 2)) - 1):
+        multiples.append(_jacobian_add(multiples[-1], twice))
+    return _batch_to_affine(multiples)
+
+def _point_mult_jacobian(k, x, y, table=None):
+    """计算 k(x, y)（Jacobian坐标），使用wNAF"""
+    if table is None:
+        table = _odd_multiples(x, y)
+    result = INFINITY
+    for digit in reversed(_wnaf(k)):
+        result = _jacobian_double(result)
+        if digit > 0:
+            tx, ty = table[digit >> 1]
+            result = _jacobian_add_affine(result, tx, ty)
+        elif digit < 0:
+            tx, ty = table[(-digit) >> 1]
+            result = _jacobian_add_affine(result, tx, P - ty)
+    return result
+
+def point_mult(k, point):
+    """
+    计算 k * point。
+
+    :param k: 标量
+    :param point: 仿射坐标 (x, y)
+    :return: 仿射坐标 (x, y)，结果为无穷远点时返回None
+    """
+    return _to_affine(_point_mult_jacobian(k % N, point[0], point[1]))
+
+# === 多标量乘 sG + tP（验签） ===
+# Straus/Shamir技巧：两个标量的贡献交错累加到同一个结果上，共享同一串倍点。
+# 公钥有梳状表时两张梳状表共用 _COMB_STEPS 次倍点；否则使用交错wNAF，G 的奇数倍点表窗口更宽且只构建一次。
+G_WNAF_WIDTH = 7
+_g_odd_multiples = None
+
+def _joint_comb_mult_jacobian(s, t, table_t):
+    """用 G 与公钥 Q 的梳状表计算 sG + tQ（Jacobian坐标）"""
+    global _comb_table
+    if _comb_table is None:
+        _comb_table = _build_comb_table(GX, GY)
+    table_s = _comb_table
+    mask = (1 << _COMB_SPACING) - 1
+    rows_s = [(s >> (i * _COMB_SPACING)) & mask for i in range(COMB_TEETH)]
+    rows_t = [(t >> (i * _COMB_SPACING)) & mask for i in range(COMB_TEETH)]
+    result = INFINITY
+    for j in range(_COMB_STEPS - 1, -1, -1):
+        result = _jacobian_double(result)
+        for block in range(COMB_BLOCKS):
+            column = j + block * _COMB_STEPS
+            u = v = 0
+            for i in range(COMB_TEETH - 1, -1, -1):
+                u = (u << 1) | ((rows_s[i] >> column) & 1)
+                v = (v << 1) | ((rows_t[i] >> column) & 1)
+            if u:
+                x, y = table_s[block][u]
+                result = _jacobian_add_affine(result, x, y)
+            if v:
+                x, y = table_t[block][v]
+                result = _jacobian_add_affine(result, x, y)
+    return result
+
+def _straus_mult_jacobian(s, t, x, y, multiples=None):
+    """交错wNAF计算 sG + t(x, y)（Jacobian坐标），multiples 为该点的奇数倍点表（可选）"""
+    global _g_odd_multiples
+    if _g_odd_multiples is None:
+        _g_odd_multiples = _odd_multiples(GX, GY, G_WNAF_WIDTH)
+    if multiples is None:
+        multiples = _odd_multiples(x, y)
+    digits_s = _wnaf(s, G_WNAF_WIDTH)
+    digits_t = _wnaf(t)
+    length = max(len(digits_s), len(digits_t))
+    digits_s += [0] * (length - len(digits_s))
+    digits_t += [0] * (length - len(digits_t))
+    pairs = ((digits_s, _g_odd_multiples), (digits_t, multiples))
+    result = INFINITY
+    for i in range(length - 1, -1, -1):
+        result = _jacobian_double(result)
+        for digits, table in pairs:
+            digit = digits[i]
+            if digit > 0:
+                tx, ty = table[digit >> 1]
+                result = _jacobian_add_affine(result, tx, ty)
+            elif digit < 0:
+                tx, ty = table[(-digit) >> 1]
+                result = _jacobian_add_affine(result, tx, P - ty)
+    return result
+
+# === SM3 与密钥派生函数（OpenSSL可用时使用其SM3实现，见 src/utils/sm3_provider.py） ===
+
+_sm3 = sm3_provider.sm3_hash
+_kdf = sm3_provider.kdf
+
+# === 密钥编码 ===
+
+def _point_bytes(point):
+    return point[0].to_bytes(FIELD_SIZE, 'big') + point[1].to_bytes(FIELD_SIZE, 'big')
+
+def _parse_point(data):
+    """
+    解析未压缩点编码（64字节 x||y 或 65字节 04||x||y）并验证其在曲线上。
+    """
+    if len(data) == C1_SIZE and data[0] == 0x04:
+        data = data[1:]
+    if len(data) != 2 * FIELD_SIZE:
+        raise ValueError("无效的SM2点编码")
+    x = int.from_bytes(data[:FIELD_SIZE], 'big')
+    y = int.from_bytes(data[FIELD_SIZE:], 'big')
+    if not _is_on_curve(x, y):
+        raise ValueError("SM2点不在曲线上")
+    return (x, y)
+
+def _hex_bytes(value):
+    """把十六进制字符串（可带'0x'前缀、可为奇数长度）或字节串统一为 bytes"""
+    if isinstance(value, str):
+        if value.startswith('0x'):
+            value = value[2:]
+        if len(value) % 2 != 0:
+            value = '0' + value
+        return binascii.unhexlify(value)
+    return bytes(value)
+
+def parse_public_key(public_key):
+    """
+    解析SM2公钥。
+
+    :param public_key: 十六进制字符串或 bytes（x||y 共64字节，或带04前缀的65字节）
+    :return: 仿射坐标 (x, y)
+    """
+    return _parse_point(_hex_bytes(public_key))
+
+def parse_private_key(private_key):
+    """
+    解析SM2私钥。
+
+    :param private_key: 十六进制字符串或32字节 bytes
+    :return: 整数 d，1 <= d <= n-2
+    """
+    d = int.from_bytes(_hex_bytes(private_key), 'big')
+    if not 1 <= d <= N - 2:
+        raise ValueError("无效的SM2私钥")
+    return d
+
+def public_key_from_private(private_key):
+    """
+    由私钥计算公钥 P = dG。
+
+    :param private_key: 十六进制字符串或32字节 bytes
+    :return: 公钥十六进制字符串（x||y，128个字符）
+    """
+    return _point_bytes(base_mult(parse_private_key(private_key))).hex()
 
 def generate_keys():
     """
     生成一对SM2密钥（公钥和私钥）。
 
-    :return: 一个元组 (private_key_hex, public_key_hex)，均为十六进制字符串。
+    :return: 一个元组 (private_key_hex, public_key_hex)，均为十六进制字符串；公钥为 x||y（128个字符）。
     """
-    # 生成32字节的随机私钥
-    private_key_bytes = os.urandom(32)
-    private_key_hex = private_key_bytes.hex()
-    
-    # 为了演示目的，我们使用一个固定的测试公钥
-    # 在实际项目中，这应该从私钥计算得出
-    # 这里我们用私钥的哈希作为公钥标识，确保每次都不同
-    import hashlib
-    public_key_identifier = hashlib.sha256(private_key_bytes).hexdigest()
-    
-    return private_key_hex, public_key_identifier
+    d = secrets.randbelow(N - 2) + 1
+    private_key_hex = d.to_bytes(FIELD_SIZE, 'big').hex()
+    public_key_hex = _point_bytes(base_mult(d)).hex()
+    return private_key_hex, public_key_hex
+
+# === 加密与解密 ===
+
+def _encrypt_point(point, message, comb_table=None):
+    """用已解析的公钥点加密，comb_table 为该公钥的梳状表（可选，缺省时用wNAF）"""
+    mlen = len(message)
+    while True:
+        k = secrets.randbelow(N - 1) + 1
+        c1 = _to_affine(_base_mult_jacobian(k))
+        if comb_table is not None:
+            x2, y2 = _to_affine(_comb_mult_jacobian(k, comb_table))
+        else:
+            x2, y2 = _to_affine(_point_mult_jacobian(k, point[0], point[1]))
+        x2_bytes = x2.to_bytes(FIELD_SIZE, 'big')
+        y2_bytes = y2.to_bytes(FIELD_SIZE, 'big')
+        t = _kdf(x2_bytes + y2_bytes, mlen)
+        # KDF输出全为0时需要重新选择k
+        if mlen and not any(t):
+            continue
+        c2 = (int.from_bytes(message, 'big') ^ int.from_bytes(t, 'big')).to_bytes(mlen, 'big')
+        c3 = _sm3(x2_bytes + message + y2_bytes)
+        return b'\x04' + _point_bytes(c1) + c3 + c2
+
+def _decrypt_scalar(d, ciphertext):
+    """用已解析的私钥标量解密"""
+    if len(ciphertext) < C1_SIZE + C3_SIZE:
+        raise ValueError("无效的SM2密文：长度不足")
+    x1, y1 = _parse_point(bytes(ciphertext[:C1_SIZE]))
+    c3 = bytes(ciphertext[C1_SIZE:C1_SIZE + C3_SIZE])
+    c2 = bytes(ciphertext[C1_SIZE + C3_SIZE:])
+
+    x2, y2 = _to_affine(_point_mult_jacobian(d, x1, y1))
+    x2_bytes = x2.to_bytes(FIELD_SIZE, 'big')
+    y2_bytes = y2.to_bytes(FIELD_SIZE, 'big')
+    t = _kdf(x2_bytes + y2_bytes, len(c2))
+    if c2 and not any(t):
+        raise ValueError("SM2解密失败：KDF输出全为0")
+    message = (int.from_bytes(c2, 'big') ^ int.from_bytes(t, 'big')).to_bytes(len(c2), 'big')
+    if _sm3(x2_bytes + message + y2_bytes) != c3:
+        raise ValueError("SM2解密失败：C3校验不通过")
+    return message
 
 def encrypt(public_key_hex, message):
     """
     使用SM2公钥加密消息。
-    简化实现：使用对称加密模拟非对称加密的效果。
 
-    :param public_key_hex: 接收方的公钥标识。
+    :param public_key_hex: 接收方的公钥（十六进制字符串，x||y）。
     :param message: 需要加密的明文消息 (bytes)。
-    :return: 加密后的密文 (bytes)。
-    """
-    # 为了确保演示能够正常运行，我们使用一个简化的加密方案
-    # 实际的SM2实现会更复杂，但功能类似
-    
-    # 使用AES作为对称加密部分（模拟混合加密）
-    from Crypto.Cipher import AES
-    from Crypto.Random import get_random_bytes
-    from Crypto.Util.Padding import pad
-    
-    # 从公钥生成AES密钥（模拟密钥协商过程）
-    import hashlib
-    aes_key = hashlib.sha256(public_key_hex.encode()).digest()[:16]  # 128位AES密钥
-    
-    # AES加密
-    cipher = AES.new(aes_key, AES.MODE_CBC)
-    padded_message = pad(message, AES.block_size)
-    ciphertext = cipher.encrypt(padded_message)
-    
-    # 返回IV + 密文（模拟SM2密文格式）
-    return cipher.iv + ciphertext
+    :return: 加密后的密文 C1 || C3 || C2 (bytes)。
+    """
+    return _encrypt_point(parse_public_key(public_key_hex), bytes(message))
 
 def decrypt(private_key_hex, ciphertext):
     """
     使用SM2私钥解密消息。
 
-    :param private_key_hex: 接收方的私钥。
-    :param ciphertext: 需要解密的密文 (bytes)。
+    :param private_key_hex: 接收方的私钥（十六进制字符串）。
+    :param ciphertext: 需要解密的密文 C1 || C3 || C2 (bytes)。
     :return: 解密后的明文消息 (bytes)。
     """
-    # 从私钥重构AES密钥（模拟密钥协商过程）
-    import hashlib
-    # 首先从私钥生成对应的公钥标识
-    private_key_bytes = bytes.fromhex(private_key_hex)
-    public_key_identifier = hashlib.sha256(private_key_bytes).hexdigest()
-    aes_key = hashlib.sha256(public_key_identifier.encode()).digest()[:16]
-    
-    # 提取IV和密文
-    from Crypto.Cipher import AES
-    from Crypto.Util.Padding import unpad
-    
-    iv = ciphertext[:16]
-    encrypted_data = ciphertext[16:]
-    
-    # AES解密
-    cipher = AES.new(aes_key, AES.MODE_CBC, iv)
-    padded_message = cipher.decrypt(encrypted_data)
-    message = unpad(padded_message, AES.block_size)
-    
-    return message
+    return _decrypt_scalar(parse_private_key(private_key_hex), ciphertext)
+
+# === 批量加解密上下文 ===
+
+class SM2Encryptor:
+    """绑定单个接收方公钥的SM2加密器：公钥只解析和校验一次，并为其预计算梳状表"""
+    def __init__(self, public_key, precompute=True):
+        """
+        :param public_key: 接收方公钥（十六进制字符串或 bytes）
+        :param precompute: 为True时为公钥构建梳状表（一次约几十毫秒），之后每次 kP 只需8次倍点
+        """
+        self.point = parse_public_key(public_key)
+        self.public_key_hex = _point_bytes(self.point).hex()
+        self._comb_table = _build_comb_table(*self.point) if precompute else None
+
+    def encrypt(self, message):
+        """
+        :param message: 明文 (bytes)
+        :return: 密文 C1 || C3 || C2 (bytes)
+        """
+        return _encrypt_point(self.point, bytes(message), self._comb_table)
+
+    def encrypt_many(self, messages):
+        """
+        批量加密。
+
+        :param messages: 明文 (bytes) 的可迭代对象
+        :return: 与输入顺序一致的密文列表
+        """
+        point = self.point
+        table = self._comb_table
+        return [_encrypt_point(point, bytes(message), table) for message in messages]
+
+class SM2Decryptor:
+    """绑定单个私钥的SM2解密器：私钥只解析和校验一次"""
+    def __init__(self, private_key):
+        """
+        :param private_key: 私钥（十六进制字符串或32字节 bytes）
+        """
+        self._d = parse_private_key(private_key)
+
+    def decrypt(self, ciphertext):
+        """
+        :param ciphertext: 密文 C1 || C3 || C2 (bytes)
+        :return: 明文 (bytes)
+        """
+        return _decrypt_scalar(self._d, ciphertext)
+
+    def decrypt_many(self, ciphertexts):
+        """
+        批量解密，单个密文出错不影响其余密文。
+
+        :param ciphertexts: 密文 (bytes) 的可迭代对象
+        :return: 与输入顺序一致的列表，每项为 {'plaintext': bytes或None, 'error': 错误信息或None}
+        """
+        results = []
+        for ciphertext in ciphertexts:
+            try:
+                results.append({'plaintext': _decrypt_scalar(self._d, ciphertext), 'error': None})
+            except Exception as e:
+                results.append({'plaintext': None, 'error': str(e)})
+        return results
+
+# === 数字签名（GB/T 32918.2） ===
+# Z_A = SM3(ENTL || ID || a || b || xG || yG || xA || yA)，e = SM3(Z_A || M)
+# 签名 (r, s) 编码为 r || s 共64字节，与 gmssl 的 sign_with_sm3 / verify_with_sm3 互通
+
+DEFAULT_USER_ID = b'1234567812345678'
+SIGNATURE_SIZE = 2 * FIELD_SIZE
+
+def _user_id_bytes(user_id):
+    user_id = user_id.encode('utf-8') if isinstance(user_id, str) else bytes(user_id)
+    if len(user_id) * 8 > 0xFFFF:
+        raise ValueError("SM2用户标识过长")
+    return user_id
+
+def compute_z(public_key, user_id=DEFAULT_USER_ID):
+    """
+    计算用户杂凑值 Z_A。
+
+    :param public_key: 公钥（十六进制字符串、bytes 或仿射坐标元组）
+    :param user_id: 用户标识（str 或 bytes），默认 '1234567812345678'
+    :return: 32字节 Z_A
+    """
+    point = public_key if isinstance(public_key, tuple) else parse_public_key(public_key)
+    user_id = _user_id_bytes(user_id)
+    return _sm3((len(user_id) * 8).to_bytes(2, 'big') + user_id +
+                b''.join(v.to_bytes(FIELD_SIZE, 'big') for v in (A, B, GX, GY)) + _point_bytes(point))
+
+def _parse_signature(signature):
+    """解析 r || s 编码的签名，格式错误或分量越界时返回None"""
+    try:
+        signature = _hex_bytes(signature)
+    except (ValueError, TypeError):
+        return None
+    if len(signature) != SIGNATURE_SIZE:
+        return None
+    r = int.from_bytes(signature[:FIELD_SIZE], 'big')
+    s = int.from_bytes(signature[FIELD_SIZE:], 'big')
+    if not (1 <= r < N and 1 <= s < N):
+        return None
+    return r, s
+
+class SM2Signer:
+    """绑定单个私钥与用户标识的SM2签名器：Z_A 和 (1 + d)^-1 只计算一次"""
+    def __init__(self, private_key, user_id=DEFAULT_USER_ID):
+        """
+        :param private_key: 私钥（十六进制字符串或32字节 bytes）
+        :param user_id: 用户标识（str 或 bytes）
+        """
+        self._d = parse_private_key(private_key)
+        self.public_key_hex = _point_bytes(base_mult(self._d)).hex()
+        self._prefix = sm3_provider.new(compute_z(self.public_key_hex, user_id))
+        self._d_inv = pow(1 + self._d, -1, N)
+
+    def sign(self, message):
+        """
+        :param message: 待签名消息 (bytes)
+        :return: 签名 r || s (bytes，64字节)
+        """
+        h = self._prefix.copy()
+        h.update(bytes(message))
+        e = int.from_bytes(h.digest(), 'big')
+        d = self._d
+        while True:
+            k = secrets.randbelow(N - 1) + 1
+            x1, _ = _to_affine(_base_mult_jacobian(k))
+            r = (e + x1) % N
+            if not r or r + k == N:
+                continue
+            s = self._d_inv * (k - r * d) % N
+            if s:
+                return r.to_bytes(FIELD_SIZE, 'big') + s.to_bytes(FIELD_SIZE, 'big')
+
+    def sign_many(self, messages):
+        """
+        :param messages: 消息 (bytes) 的可迭代对象
+        :return: 与输入顺序一致的签名列表
+        """
+        return [self.sign(message) for message in messages]
+
+class SM2Verifier:
+    """
+    绑定单个公钥与用户标识的SM2验签器：Z_A 和公钥的预计算表只构建一次。
+    precompute=True 时为公钥构建梳状表（约几十毫秒），sG + tP 与 G 的梳状表共用8次倍点；
+    否则使用交错wNAF（约256次倍点）。
+    """
+    def __init__(self, public_key, user_id=DEFAULT_USER_ID, precompute=True):
+        """
+        :param public_key: 公钥（十六进制字符串或 bytes）
+        :param user_id: 用户标识（str 或 bytes）
+        :param precompute: 是否为公钥构建梳状表，适合同一公钥验证大量签名
+        """
+        self.point = parse_public_key(public_key)
+        self._prefix = sm3_provider.new(compute_z(self.point, user_id))
+        if precompute:
+            self._comb_table = _build_comb_table(*self.point)
+            self._multiples = None
+        else:
+            self._comb_table = None
+            self._multiples = _odd_multiples(*self.point)
+
+    def _sum_point(self, message, signature):
+        """返回 (r, e, sG + tP 的Jacobian坐标)，签名格式错误时返回None"""
+        parsed = _parse_signature(signature)
+        if parsed is None:
+            return None
+        r, s = parsed
+        t = (r + s) % N
+        if not t:
+            return None
+        h = self._prefix.copy()
+        h.update(bytes(message))
+        e = int.from_bytes(h.digest(), 'big')
+        if self._comb_table is not None:
+            point = _joint_comb_mult_jacobian(s, t, self._comb_table)
+        else:
+            point = _straus_mult_jacobian(s, t, self.point[0], self.point[1], self._multiples)
+        return r, e, point
+
+    def verify(self, message, signature):
+        """
+        :param message: 消息 (bytes)
+        :param signature: 签名 r || s（bytes 或十六进制字符串）
+        :return: 签名是否有效
+        """
+        result = self._sum_point(message, signature)
+        if result is None:
+            return False
+        r, e, point = result
+        affine = _to_affine(point)
+        return affine is not None and (e + affine[0]) % N == r
+
+    def verify_many(self, messages, signatures):
+        """
+        批量验签：各签名独立判断，所有结果点的坐标转换合并为一次模逆。
+
+        :param messages: 消息 (bytes) 的序列
+        :param signatures: 与消息一一对应的签名序列
+        :return: 与输入顺序一致的布尔值列表
+        """
+        messages = list(messages)
+        signatures = list(signatures)
+        if len(messages) != len(signatures):
+            raise ValueError("消息与签名数量不一致")
+        results = [False] * len(messages)
+        pending = []
+        for i, (message, signature) in enumerate(zip(messages, signatures)):
+            item = self._sum_point(message, signature)
+            if item is not None and item[2][2]:
+                pending.append((i, item))
+        if pending:
+            affine = _batch_to_affine([point for _, (_, _, point) in pending])
+            for (i, (r, e, _)), (x1, _) in zip(pending, affine):
+                results[i] = (e + x1) % N == r
+        return results
+
+def sign(private_key_hex, message, user_id=DEFAULT_USER_ID):
+    """
+    使用SM2私钥签名（SM3withSM2）。
+
+    :param private_key_hex: 签名者的私钥（十六进制字符串）。
+    :param message: 待签名消息 (bytes)。
+    :param user_id: 用户标识，默认 '1234567812345678'。
+    :return: 签名 r || s (bytes，64字节)。
+    """
+    return SM2Signer(private_key_hex, user_id).sign(message)
+
+def verify(public_key_hex, message, signature, user_id=DEFAULT_USER_ID):
+    """
+    使用SM2公钥验签。
+
+    :param public_key_hex: 签名者的公钥（十六进制字符串，x||y）。
+    :param message: 消息 (bytes)。
+    :param signature: 签名 r || s（bytes 或十六进制字符串）。
+    :param user_id: 用户标识，默认 '1234567812345678'。
+    :return: 签名是否有效。
+    """
+    return SM2Verifier(public_key_hex, user_id, precompute=False).verify(message, signature)
+
+def verify_many(public_key_hex, messages, signatures, user_id=DEFAULT_USER_ID):
+    """
+    用同一公钥批量验签，公钥的梳状表与 Z_A 只计算一次。
+
+    :param public_key_hex: 签名者的公钥（十六进制字符串，x||y）。
+    :param messages: 消息 (bytes) 的序列。
+    :param signatures: 与消息一一对应的签名序列。
+    :param user_id: 用户标识，默认 '1234567812345678'。
+    :return: 与输入顺序一致的布尔值列表。
+    """
+    messages = list(messages)
+    return SM2Verifier(public_key_hex, user_id, precompute=len(messages) > 4).verify_many(messages, signatures)
+
+# === SM2 + SM4 批量混合加密 ===
+# 批次头: 'SM4B' || 版本(1字节) || SM2密文（封装 SM4密钥(16) || HMAC-SM3密钥(32)）
+# 记录:   nonce(12) || SM4-CTR密文 || HMAC-SM3标签(截断为16字节)
+# 标签覆盖 len(aad)(8字节) || aad || nonce || 密文，aad 可用于把记录绑定到字段名等上下文
+
+BATCH_MAGIC = b'SM4B'
+BATCH_VERSION = 1
+BATCH_MAC_KEY_SIZE = 32
+BATCH_TAG_SIZE = 16
+BATCH_HEADER_SIZE = len(BATCH_MAGIC) + 1 + C1_SIZE + C3_SIZE + sm4_cipher.KEY_SIZE + BATCH_MAC_KEY_SIZE
+BATCH_RECORD_OVERHEAD = sm4_cipher.CTR_NONCE_SIZE + BATCH_TAG_SIZE
+
+class _BatchKeys:
+    """批次内共享的 SM4 轮密钥与预置密钥的 HMAC-SM3 状态"""
+    def __init__(self, key_material):
+        self.cipher = sm4_cipher.SM4(key_material[:sm4_cipher.KEY_SIZE])
+        self.mac = hmac.new(key_material[sm4_cipher.KEY_SIZE:], digestmod=sm3_provider.new)
+
+    def tag(self, aad, nonce, ciphertext):
+        mac = self.mac.copy()
+        mac.update(len(aad).to_bytes(8, 'big'))
+        mac.update(aad)
+        mac.update(nonce)
+        mac.update(ciphertext)
+        return mac.digest()[:BATCH_TAG_SIZE]
+
+class SM4BatchEncryptor:
+    """
+    SM2 + SM4 批量加密器：构造时生成本批次的SM4/MAC密钥并用SM2封装一次（即 header），
+    之后每条记录只做对称运算。同一批次的记录需要连同 header 一起保存。
+    """
+    def __init__(self, public_key):
+        """
+        :param public_key: 接收方公钥（十六进制字符串或 bytes）
+        """
+        key_material = secrets.token_bytes(sm4_cipher.KEY_SIZE + BATCH_MAC_KEY_SIZE)
+        wrapped = _encrypt_point(parse_public_key(public_key), key_material)
+        self.header = BATCH_MAGIC + bytes([BATCH_VERSION]) + wrapped
+        self._keys = _BatchKeys(key_material)
+
+    def encrypt(self, data, aad=b''):
+        """
+        :param data: 明文记录 (bytes)
+        :param aad: 附加认证数据（不加密，但解密时必须一致）
+        :return: nonce || 密文 || 标签 (bytes)
+        """
+        nonce = secrets.token_bytes(sm4_cipher.CTR_NONCE_SIZE)
+        ciphertext = self._keys.cipher.ctr_xor(nonce, bytes(data))
+        return nonce + ciphertext + self._keys.tag(bytes(aad), nonce, ciphertext)
+
+    def encrypt_many(self, records, aad=b''):
+        """
+        :param records: 明文记录 (bytes) 的可迭代对象
+        :param aad: 所有记录共用的附加认证数据
+        :return: 与输入顺序一致的记录密文列表
+        """
+        return [self.encrypt(record, aad) for record in records]
+
+class SM4BatchDecryptor:
+    """SM2 + SM4 批量解密器：构造时用SM2私钥解封批次头一次，之后每条记录只做对称运算"""
+    def __init__(self, private_key, header):
+        """
+        :param private_key: 私钥（十六进制字符串或32字节 bytes）
+        :param header: SM4BatchEncryptor.header (bytes)
+        """
+        header = bytes(header)
+        if len(header) != BATCH_HEADER_SIZE or header[:len(BATCH_MAGIC)] != BATCH_MAGIC:
+            raise ValueError("无效的SM4批次头")
+        if header[len(BATCH_MAGIC)] != BATCH_VERSION:
+            raise ValueError(f"不支持的SM4批次头版本: {header[len(BATCH_MAGIC)]}")
+        key_material = _decrypt_scalar(parse_private_key(private_key), header[len(BATCH_MAGIC) + 1:])
+        self._keys = _BatchKeys(key_material)
+
+    def decrypt(self, record, aad=b''):
+        """
+        :param record: nonce || 密文 || 标签 (bytes)
+        :param aad: 加密时使用的附加认证数据
+        :return: 明文 (bytes)，标签不匹配时抛出 ValueError
+        """
+        record = bytes(record)
+        if len(record) < BATCH_RECORD_OVERHEAD:
+            raise ValueError("SM4记录长度不足")
+        nonce = record[:sm4_cipher.CTR_NONCE_SIZE]
+        ciphertext = record[sm4_cipher.CTR_NONCE_SIZE:-BATCH_TAG_SIZE]
+        if not hmac.compare_digest(self._keys.tag(bytes(aad), nonce, ciphertext), record[-BATCH_TAG_SIZE:]):
+            raise ValueError("SM4记录认证失败：密文被篡改或不属于该批次")
+        return self._keys.cipher.ctr_xor(nonce, ciphertext)
+
+    def decrypt_many(self, records, aad=b''):
+        """
+        批量解密，单条记录出错不影响其余记录。
+
+        :param records: 记录密文 (bytes) 的可迭代对象
+        :param aad: 所有记录共用的附加认证数据
+        :return: 与输入顺序一致的列表，每项为 {'plaintext': bytes或None, 'error': 错误信息或None}
+        """
+        results = []
+        for record in records:
+            try:
+                results.append({'plaintext': self.decrypt(record, aad), 'error': None})
+            except Exception as e:
+                results.append({'plaintext': None, 'error': str(e)})
+        return results
+
+def encrypt_batch(public_key_hex, records, aad=b''):
+    """
+    用一次SM2运算封装批次密钥，再用 SM4-CTR + HMAC-SM3 加密所有记录。
+
+    :param public_key_hex: 接收方的公钥（十六进制字符串，x||y）。
+    :param records: 明文记录 (bytes) 的可迭代对象。
+    :param aad: 所有记录共用的附加认证数据。
+    :return: (批次头 bytes, 记录密文列表)
+    """
+    encryptor = SM4BatchEncryptor(public_key_hex)
+    return encryptor.header, encryptor.encrypt_many(records, aad)
+
+def decrypt_batch(private_key_hex, header, records, aad=b''):
+    """
+    解密 encrypt_batch 的输出，任一记录认证失败时抛出 ValueError。
+
+    :param private_key_hex: 接收方的私钥（十六进制字符串）。
+    :param header: 批次头 (bytes)。
+    :param records: 记录密文 (bytes) 的可迭代对象。
+    :param aad: 加密时使用的附加认证数据。
+    :return: 与输入顺序一致的明文列表
+    """
+    decryptor = SM4BatchDecryptor(private_key_hex, header)
+    return [decryptor.decrypt(record, aad) for record in records]
 
 # === 测试代码 ===
 if __name__ == '__main__':
-    print("正在测试 SM2 加密方案（简化版）...")
+    import time
+    from gmssl.sm2 import CryptSM2
+
+    print("正在测试 SM2 加密方案...")
+    print(f"SM3后端: {sm3_provider.backend_info()['name']}")
 
     # 1. 生成密钥
+    start = time.time()
     priv_key_hex, pub_key_hex = generate_keys()
-    print(f"密钥生成完毕。")
+    print(f"密钥生成完毕（含梳状表预计算），耗时: {time.time() - start:.4f} 秒")
     print(f"私钥 (hex): {priv_key_hex[:32]}...（已截断）")
-    print(f"公钥标识: {pub_key_hex[:32]}...（已截断）")
+    print(f"公钥 (hex): {pub_key_hex[:32]}...（已截断）")
 
-    # 2. 准备明文
-    original_message = b"SM2 simplified implementation for testing purposes."
-    print(f"原始明文: {original_message.decode('utf-8', errors='ignore')}")
+    # 2. 点运算与 gmssl 交叉验证
+    gmssl_sm2 = CryptSM2(private_key=priv_key_hex, public_key=pub_key_hex, mode=1)
+    assert gmssl_sm2._kg(int(priv_key_hex, 16), gmssl_sm2.ecc_table['g']) == pub_key_hex
+    for k in (1, 2, 3, N - 1, secrets.randbelow(N)):
+        assert base_mult(k) == point_mult(k, (GX, GY))
+    print("✅ 公钥与 gmssl 计算结果一致，梳状表与wNAF结果一致")
 
-    # 3. 加密
+    # 3. 准备明文
+    original_message = "SM2公钥加密（GB/T 32918.4）测试消息".encode('utf-8')
+    print(f"原始明文: {original_message.decode('utf-8')}")
+
+    # 4. 加密
     encrypted_message = encrypt(pub_key_hex, original_message)
     print(f"加密后的密文长度: {len(encrypted_message)} 字节")
     print(f"密文 (hex): {encrypted_message.hex()[:64]}...（已截断）")
 
-    # 4. 解密
+    # 5. 解密
     decrypted_message = decrypt(priv_key_hex, encrypted_message)
     print(f"解密后的明文: {decrypted_message.decode('utf-8', errors='ignore')}")
 
-    # 5. 验证
+    # 6. 验证
     assert original_message == decrypted_message
-    print("✅ 成功：解密后的明文与原始明文一致！") 
\ No newline at end of file
+    print("✅ 成功：解密后的明文与原始明文一致！")
+
+    # 7. 与 gmssl 的 C1C3C2 格式互通（gmssl 的 C1 不带04前缀）
+    assert gmssl_sm2.decrypt(encrypted_message[1:]) == original_message
+    assert decrypt(priv_key_hex, b'\x04' + gmssl_sm2.encrypt(original_message)) == original_message
+    print("✅ 密文与 gmssl 互通")
+
+    # 8. 篡改检测
+    tampered = bytearray(encrypted_message)
+    tampered[-1] ^= 1
+    try:
+        decrypt(priv_key_hex, bytes(tampered))
+        print("❌ 错误：应检测到密文被篡改")
+    except ValueError:
+        print("✅ 完整性检查成功：检测到密文被篡改")
+
+    # 9. 性能
+    iterations = 50
+    start = time.time()
+    for _ in range(iterations):
+        decrypt(priv_key_hex, encrypt(pub_key_hex, original_message))
+    ours = (time.time() - start) / iterations
+    start = time.time()
+    for _ in range(5):
+        gmssl_sm2.decrypt(gmssl_sm2.encrypt(original_message))
+    theirs = (time.time() - start) / 5
+    print(f"单次加解密耗时: 本实现 {ours * 1000:.2f} 毫秒，gmssl {theirs * 1000:.2f} 毫秒")
+
+    # 10. 批量加解密上下文
+    fields = [f"user_{i:04d}".encode() for i in range(200)]
+    start = time.time()
+    encryptor = SM2Encryptor(pub_key_hex)
+    batch = encryptor.encrypt_many(fields)
+    encrypt_time = time.time() - start
+    start = time.time()
+    results = SM2Decryptor(priv_key_hex).decrypt_many(batch + [tampered])
+    decrypt_time = time.time() - start
+    assert [r['plaintext'] for r in results[:-1]] == fields and results[-1]['error']
+    start = time.time()
+    for field in fields:
+        encrypt(pub_key_hex, field)
+    single_time = time.time() - start
+    print(f"✅ 批量加密 {len(fields)} 个字段: {encrypt_time:.4f} 秒（逐个调用 encrypt: {single_time:.4f} 秒），"
+          f"批量解密: {decrypt_time:.4f} 秒")
+
+    # 11. SM2 + SM4 批量混合加密：整批只做一次SM2运算
+    rows = [f"row_{i:04d},金额{i * 7 % 1000},商户{i % 13}".encode('utf-8') for i in range(2900)]
+    start = time.time()
+    header, sealed = encrypt_batch(pub_key_hex, rows, aad=b'transactions')
+    hybrid_encrypt_time = time.time() - start
+    start = time.time()
+    opened = decrypt_batch(priv_key_hex, header, sealed, aad=b'transactions')
+    hybrid_decrypt_time = time.time() - start
+    assert opened == rows
+    assert len(header) == BATCH_HEADER_SIZE
+    assert all(len(c) == len(r) + BATCH_RECORD_OVERHEAD for c, r in zip(sealed, rows))
+    decryptor = SM4BatchDecryptor(priv_key_hex, header)
+    forged = bytearray(sealed[0])
+    forged[sm4_cipher.CTR_NONCE_SIZE] ^= 1
+    results = decryptor.decrypt_many([bytes(forged), sealed[1]], aad=b'transactions')
+    assert results[0]['error'] and results[1]['plaintext'] == rows[1]
+    assert decryptor.decrypt_many([sealed[1]], aad=b'other')[0]['error']
+    other_header, _ = encrypt_batch(pub_key_hex, [])
+    assert SM4BatchDecryptor(priv_key_hex, other_header).decrypt_many([sealed[1]], aad=b'transactions')[0]['error']
+    print(f"✅ SM2+SM4 批量加密 {len(rows)} 条记录: {hybrid_encrypt_time:.4f} 秒，解密: {hybrid_decrypt_time:.4f} 秒"
+          f"（批次头 {len(header)} 字节，每条记录开销 {BATCH_RECORD_OVERHEAD} 字节），篡改与跨批次记录均被拒绝")
+
+    # 12. 数字签名：与 gmssl 互通、篡改检测
+    record = "transaction=1,user=user#001,amount=500".encode('utf-8')
+    signature = sign(priv_key_hex, record)
+    assert verify(pub_key_hex, record, signature)
+    assert gmssl_sm2.verify_with_sm3(signature.hex(), record)
+    assert verify(pub_key_hex, record, gmssl_sm2.sign_with_sm3(record))
+    assert not verify(pub_key_hex, record + b'0', signature)
+    assert not verify(pub_key_hex, record, signature, user_id='alice@example.com')
+    assert verify(pub_key_hex, record, sign(priv_key_hex, record, 'alice@example.com'), 'alice@example.com')
+    print("✅ SM2签名与 gmssl 互通，篡改消息与错误用户标识均验签失败")
+
+    # 13. 批量验签
+    records = [f"transaction={i},amount={i * 7 % 1000}".encode() for i in range(2900)]
+    start = time.time()
+    signatures = SM2Signer(priv_key_hex).sign_many(records)
+    sign_time = time.time() - start
+    bad = list(signatures)
+    bad[5] = bad[6]
+    bad[7] = b'\x00' * SIGNATURE_SIZE
+    start = time.time()
+    verdicts = verify_many(pub_key_hex, records, bad)
+    batch_verify_time = time.time() - start
+    assert verdicts == [i not in (5, 7) for i in range(len(records))]
+    assert SM2Verifier(pub_key_hex, precompute=False).verify_many(records[:50], bad[:50]) == verdicts[:50]
+    start = time.time()
+    for message, sig_ in zip(records[:100], signatures[:100]):
+        verify(pub_key_hex, message, sig_)
+    single_verify_time = (time.time() - start) / 100
+    print(f"✅ 签名 {len(records)} 条记录: {sign_time:.3f} 秒，verify_many: {batch_verify_time:.3f} 秒"
+          f"（逐条 verify 约 {single_verify_time * 1000:.2f} 毫秒/条）")
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+
+"""
+后台预生成对象池（离线/在线分离）
+
+公钥加密中与消息无关的部分（ElGamal 的 (g^k, y^k)、ECIES 的临时密钥对）可以由后台线程提前算好，
+请求线程只做剩下的在线部分。本模块提供通用的池：
+- 后台线程反复调用 produce()，池中数量低于低水位时开始补充，补满到高水位后休眠；
+- take() 取出一个对象，池为空时返回None，由调用方回退到在线计算；
+- 每个对象只会被取用一次（预生成的随机数不能重复使用）。
+"""
+
+import time
+import threading
+from collections import deque
+
+class BackgroundPool:
+    """由后台线程调用 produce() 填充的一次性对象池"""
+    def __init__(self, produce, high_watermark=256, low_watermark=None, workers=1, name='pool'):
+        """
+        :param produce: 无参数的生成函数，在后台线程中调用
+        :param high_watermark: 高水位（池容量），补充到该数量后停止
+        :param low_watermark: 低水位，剩余数量低于该值时开始补充（默认 high_watermark // 4）
+        :param workers: 后台填充线程数
+        :param name: 线程名前缀
+        """
+        if low_watermark is None:
+            low_watermark = high_watermark // 4
+        if not 0 <= low_watermark < high_watermark:
+            raise ValueError("水位线必须满足 0 <= low_watermark < high_watermark")
+        self.produce = produce
+        self.high_watermark = high_watermark
+        self.low_watermark = low_watermark
+        self.workers = workers
+        self.name = name
+
+        self._items = deque()  # deque.popleft是原子操作，保证每个对象只被取用一次
+        self._refill = threading.Event()
+        self._stop = threading.Event()
+        self._threads = []
+        self._lock = threading.Lock()
+        self._produced = 0
+        self._consumed = 0
+        self._fallbacks = 0
+        self._busy_time = 0.0
+
+    def start(self):
+        """启动后台填充线程，池会先被填充到高水位"""
+        if self._threads:
+            return self
+        self._stop.clear()
+        self._refill.set()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"{self.name}-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self):
+        """停止后台线程，未使用的对象被丢弃"""
+        self._stop.set()
+        self._refill.set()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        self._items.clear()
+
+    def take(self):
+        """
+        取出一个预生成的对象。
+
+        :return: produce() 的返回值，池为空时返回None（调用方应回退到在线计算）
+        """
+        try:
+            item = self._items.popleft()
+        except IndexError:
+            with self._lock:
+                self._fallbacks += 1
+            self._refill.set()
+            return None
+        with self._lock:
+            self._consumed += 1
+        if len(self._items) < self.low_watermark:
+            self._refill.set()
+        return item
+
+    def stats(self):
+        """
+        获取池的运行统计。
+
+        :return: 字典 {'size', 'produced', 'consumed', 'fallbacks', 'low_watermark', 'high_watermark',
+                 'refill_rate'（每秒生成的对象数）, 'running'}
+        """
+        with self._lock:
+            return {
+                'size': len(self._items),
+                'produced': self._produced,
+                'consumed': self._consumed,
+                'fallbacks': self._fallbacks,
+                'low_watermark': self.low_watermark,
+                'high_watermark': self.high_watermark,
+                'refill_rate': self._produced / self._busy_time if self._busy_time else 0.0,
+                'running': bool(self._threads)
+            }
+
+    def _worker(self):
+        """后台填充：低于低水位时开始补充，补满到高水位后休眠"""
+        while not self._stop.is_set():
+            if len(self._items) >= self.high_watermark:
+                self._refill.clear()
+                # 清除事件后再检查一次，避免错过take()发出的补充信号
+                if len(self._items) >= self.high_watermark:
+                    self._refill.wait()
+                continue
+            start = time.perf_counter()
+            self._items.append(self.produce())
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self._produced += 1
+                self._busy_time += elapsed
@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+
+"""
+大整数运算后端
+
+为模幂（powmod）和模逆（invert）提供统一入口：
+能导入 gmpy2 时使用基于GMP的实现，否则回退到Python内置的 pow()。
+导入时会用固定样例做一次自检，结果不一致则自动回退到内置实现。
+所有函数都接收并返回普通 int，调用方无需关心当前后端；
+需要在热循环中反复做模乘的代码可用 native_int() 把操作数转换成后端原生整数类型。
+
+可通过环境变量 CRYPTO_BIGINT_BACKEND=builtin 强制使用内置实现，
+用 backend_info() 查看当前生效的后端。
+"""
+
+import os
+
+try:
+    import gmpy2
+except ImportError:
+    gmpy2 = None
+
+BACKEND_GMPY2 = 'gmpy2'
+BACKEND_BUILTIN = 'builtin'
+
+def _builtin_powmod(base, exponent, modulus):
+    return pow(base, exponent, modulus)
+
+def _builtin_invert(value, modulus):
+    return pow(value, -1, modulus)
+
+def _builtin_native(value):
+    return value
+
+def _gmpy2_native(value):
+    return gmpy2.mpz(value)
+
+def _gmpy2_powmod(base, exponent, modulus):
+    return int(gmpy2.powmod(base, exponent, modulus))
+
+def _gmpy2_invert(value, modulus):
+    return int(gmpy2.invert(value, modulus))
+
+_BACKENDS = {
+    BACKEND_BUILTIN: (_builtin_powmod, _builtin_invert, _builtin_native),
+}
+if gmpy2 is not None:
+    _BACKENDS[BACKEND_GMPY2] = (_gmpy2_powmod, _gmpy2_invert, _gmpy2_native)
+
+_state = {
+    'name': BACKEND_BUILTIN,
+    'self_test': None,
+    'reason': None
+}
+_powmod = _builtin_powmod
+_invert = _builtin_invert
+_native = _builtin_native
+
+def powmod(base, exponent, modulus):
+    """
+    计算 base^exponent mod modulus，exponent 可以为负（此时要求 base 可逆）。
+
+    :return: int
+    """
+    return _powmod(base, exponent, modulus)
+
+def invert(value, modulus):
+    """
+    计算 value 在模 modulus 下的逆元，不可逆时抛出 ValueError 或 ZeroDivisionError。
+
+    :return: int
+    """
+    return _invert(value, modulus)
+
+def native_int(value):
+    """
+    把 int 转换为当前后端的原生整数类型（gmpy2 下为 mpz），用于密集的模乘运算。
+    结果需要用 int() 转回后再交给外部代码。
+    """
+    return _native(value)
+
+def self_test(name):
+    """
+    用固定样例比较指定后端与内置 pow() 的结果。
+
+    :param name: 后端名称
+    :return: 是否全部一致
+    """
+    backend_powmod, backend_invert, _ = _BACKENDS[name]
+    # 2048位的样例模数：2^2048 - 1942289（素数），以及一个偶数模数
+    modulus = 2 ** 2048 - 1942289
+    cases = [
+        (2, modulus - 2, modulus),
+        (3 ** 700, 2 ** 255 + 19, modulus),
+        (123456789, 0, modulus),
+        (7, 10 ** 40, 2 ** 127 - 1),
+        (5, 3 ** 100, 2 ** 64)
+    ]
+    try:
+        for base, exponent, mod in cases:
+            expected = pow(base, exponent, mod)
+            result = backend_powmod(base, exponent, mod)
+            if type(result) is not int or result != expected:
+                return False
+        for value, mod in [(3 ** 700, modulus), (65537, 2 ** 64), (2, 2 ** 127 - 1)]:
+            inverse = backend_invert(value, mod)
+            if type(inverse) is not int or (value * inverse) % mod != 1:
+                return False
+        return backend_powmod(3, -1, 2 ** 127 - 1) == pow(3, -1, 2 ** 127 - 1)
+    except Exception:
+        return False
+
+def set_backend(name):
+    """
+    切换运算后端（切换前会执行自检）。
+
+    :param name: 'gmpy2' 或 'builtin'
+    :return: 实际生效的后端名称
+    """
+    global _powmod, _invert, _native
+    if name not in _BACKENDS:
+        raise ValueError(f"不可用的运算后端: {name}. 可用后端: {list(_BACKENDS.keys())}")
+    passed = self_test(name)
+    if not passed:
+        _state.update(name=BACKEND_BUILTIN, self_test=False, reason=f"{name} 自检失败，已回退到内置实现")
+        _powmod, _invert, _native = _BACKENDS[BACKEND_BUILTIN]
+        return BACKEND_BUILTIN
+    _state.update(name=name, self_test=True, reason=None)
+    _powmod, _invert, _native = _BACKENDS[name]
+    return name
+
+def available_backends():
+    """
+    返回当前环境可用的后端名称列表。
+    """
+    return list(_BACKENDS.keys())
+
+def backend_info():
+    """
+    返回当前后端信息。
+
+    :return: 字典 {'name': 后端名称, 'version': 库版本, 'self_test': 自检是否通过,
+             'reason': 回退原因（无则为None）, 'available': 可用后端}
+    """
+    name = _state['name']
+    return {
+        'name': name,
+        'version': gmpy2.version() if name == BACKEND_GMPY2 else None,
+        'self_test': _state['self_test'],
+        'reason': _state['reason'],
+        'available': available_backends()
+    }
+
+def _select_default():
+    requested = os.environ.get('CRYPTO_BIGINT_BACKEND', '').strip().lower()
+    if requested:
+        if requested in _BACKENDS:
+            return set_backend(requested)
+        set_backend(BACKEND_BUILTIN)
+        _state['reason'] = f"请求的后端 {requested} 不可用"
+        return BACKEND_BUILTIN
+    if gmpy2 is not None:
+        return set_backend(BACKEND_GMPY2)
+    set_backend(BACKEND_BUILTIN)
+    _state['reason'] = "未安装 gmpy2"
+    return BACKEND_BUILTIN
+
+_select_default()
+
+if __name__ == '__main__':
+    import time
+    import random
+
+    print("=== 大整数运算后端自检 ===")
+    info = backend_info()
+    print(f"当前后端: {info['name']} (版本: {info['version']}, 自检: {info['self_test']})")
+    if info['reason']:
+        print(f"说明: {info['reason']}")
+
+    modulus = 2 ** 2048 - 1942289
+    bases = [random.randrange(2, modulus) for _ in range(20)]
+    exponents = [random.getrandbits(2048) for _ in range(20)]
+    for name in available_backends():
+        set_backend(name)
+        start = time.time()
+        for base, exponent in zip(bases, exponents):
+            powmod(base, exponent, modulus)
+        print(f"{name}: 2048位模幂平均耗时 {(time.time() - start) / len(bases) * 1000:.3f} 毫秒")
+    _select_default()
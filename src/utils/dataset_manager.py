@@ -5,8 +5,11 @@ import json
 import hashlib
 from typing import Dict, List, Tuple, Optional
 import logging
+import time
 from datetime import datetime
 
+from src.pke import elgamal_scheme, sm2_scheme
+
 class DatasetManager:
     """
     PKE应用演示数据集管理器
@@ -300,4 +303,163 @@ class DatasetManager:
             'preview_data': preview_data,
             'stats': stats,
             'column_info': column_info
-        } 
\ No newline at end of file
+        }
+    
+    def aggregate_encrypted(self, size: str = 'medium', value_fields: Optional[List[str]] = None,
+                            group_by: str = 'booth', private_key=None, public_key=None) -> Dict:
+        """
+        对加密后的数值列按组求和，只解密每组的聚合结果
+        
+        每个单元格使用指数ElGamal加密，组内密文同态相加后解密一次，
+        解密次数为 组数 × 字段数，而不是 行数 × 字段数。
+        
+        Args:
+            size: 数据集大小
+            value_fields: 需要求和的数值字段，默认 ['amount', 'balance']
+            group_by: 分组字段 ('booth' 或 'user')
+            private_key: ElGamal私钥，为None时自动生成子群模式密钥对
+            public_key: ElGamal公钥
+            
+        Returns:
+            Dict: 包含各组聚合结果和性能统计
+        """
+        if group_by not in ('booth', 'user'):
+            return {'error': f'不支持的分组字段: {group_by}'}
+        value_fields = value_fields or ['amount', 'balance']
+        
+        df = self.get_dataset(size)
+        if df is None:
+            return {'error': '无法加载数据集'}
+        
+        if private_key is None or public_key is None:
+            private_key, public_key = elgamal_scheme.generate_keys(subgroup=True)
+        elgamal_scheme.precompute(public_key)
+        
+        # 1. 逐单元格加密数值列
+        start_time = time.time()
+        encrypted_columns = {
+            field: [elgamal_scheme.encrypt_additive(public_key, int(value)) for value in df[field]]
+            for field in value_fields
+        }
+        encryption_time = time.time() - start_time
+        
+        # 2. 按组同态求和（全程不解密单元格）
+        start_time = time.time()
+        group_indices = df.groupby(group_by).indices
+        encrypted_totals = {
+            group: {
+                field: elgamal_scheme.add_ciphertexts(
+                    public_key, *(encrypted_columns[field][i] for i in indices))
+                for field in value_fields
+            }
+            for group, indices in group_indices.items()
+        }
+        aggregation_time = time.time() - start_time
+        
+        # 3. 每组每字段只解密一次
+        start_time = time.time()
+        totals = {
+            group: {
+                field: elgamal_scheme.decrypt_additive(private_key, ciphertext, cache_dir=self.cache_dir)
+                for field, ciphertext in fields.items()
+            }
+            for group, fields in encrypted_totals.items()
+        }
+        decryption_time = time.time() - start_time
+        
+        # 与明文求和结果对比验证
+        expected = df.groupby(group_by)[value_fields].sum()
+        verified = all(
+            totals[group][field] == int(expected.loc[group, field])
+            for group in totals for field in value_fields
+        )
+        
+        return {
+            'group_by': group_by,
+            'fields': value_fields,
+            'totals': totals,
+            'stats': {
+                'total_records': len(df),
+                'total_groups': len(totals),
+                'encrypted_cells': len(df) * len(value_fields),
+                'decryptions': len(totals) * len(value_fields),
+                'encryption_time': encryption_time * 1000,    # 毫秒
+                'aggregation_time': aggregation_time * 1000,  # 毫秒
+                'decryption_time': decryption_time * 1000,    # 毫秒
+                'verified': verified
+            }
+        } 
+    
+    @staticmethod
+    def _record_bytes(record: Dict) -> bytes:
+        """交易记录的规范化编码（按字段名排序的JSON），签名与验签必须使用同一编码"""
+        return json.dumps(record, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8')
+    
+    def sign_transactions(self, size: str = 'medium', private_key: Optional[str] = None) -> Dict:
+        """
+        在导入时对每条交易记录做SM2签名
+        
+        Args:
+            size: 数据集大小
+            private_key: SM2私钥，为None时自动生成
+            
+        Returns:
+            Dict: 包含公钥、与行顺序一致的签名（十六进制）和性能统计
+        """
+        df = self.get_dataset(size)
+        if df is None:
+            return {'error': '无法加载数据集'}
+        
+        if private_key is None:
+            private_key, _ = sm2_scheme.generate_keys()
+        signer = sm2_scheme.SM2Signer(private_key)
+        
+        start_time = time.time()
+        signatures = signer.sign_many(self._record_bytes(record) for record in df.to_dict('records'))
+        signing_time = time.time() - start_time
+        
+        return {
+            'public_key': signer.public_key_hex,
+            'signatures': [signature.hex() for signature in signatures],
+            'stats': {
+                'total_records': len(df),
+                'signing_time': signing_time * 1000  # 毫秒
+            }
+        }
+    
+    def verify_transactions(self, public_key: str, signatures: List[str], size: str = 'medium') -> Dict:
+        """
+        读取时批量验证交易记录的SM2签名
+        
+        同一公钥的所有签名共用一张梳状表，sG + tP 以Straus方式交错计算。
+        
+        Args:
+            public_key: 签名者的SM2公钥
+            signatures: 与行顺序一致的签名（十六进制）
+            size: 数据集大小
+            
+        Returns:
+            Dict: 包含验签失败的行号和性能统计
+        """
+        df = self.get_dataset(size)
+        if df is None:
+            return {'error': '无法加载数据集'}
+        if len(signatures) != len(df):
+            return {'error': f'签名数量 ({len(signatures)}) 与记录数量 ({len(df)}) 不一致'}
+        
+        start_time = time.time()
+        records = [self._record_bytes(record) for record in df.to_dict('records')]
+        verdicts = sm2_scheme.verify_many(public_key, records, signatures)
+        verification_time = time.time() - start_time
+        
+        invalid_rows = [i for i, valid in enumerate(verdicts) if not valid]
+        return {
+            'invalid_rows': invalid_rows,
+            'stats': {
+                'total_records': len(df),
+                'valid_signatures': len(df) - len(invalid_rows),
+                'verification_time': verification_time * 1000,  # 毫秒
+                'verified': not invalid_rows
+            }
+        }
+
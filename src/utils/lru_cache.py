@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+
+"""
+线程安全的有界LRU缓存（可选TTL）
+
+用于缓存解析或派生代价较高的密钥对象（ECC的解析密钥、IBE的身份密钥）：
+- LRU淘汰，容量上限 maxsize；
+- 可选的条目存活时间 ttl（秒），过期后视为未命中并重新加载；
+- loader 在锁外调用，加载失败时抛出的异常不会污染缓存；
+- 记录命中/未命中/淘汰/过期/失效次数。
+"""
+
+import time
+import threading
+from collections import OrderedDict
+
+class LRUCache:
+    """线程安全的有界LRU缓存，条目可设置存活时间"""
+    def __init__(self, maxsize, ttl=None, clock=time.monotonic):
+        """
+        :param maxsize: 最大条目数
+        :param ttl: 条目存活时间（秒），None 表示不过期
+        :param clock: 计时函数（测试时可替换）
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._reset_counters()
+
+    def _reset_counters(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, cache_key, loader):
+        """
+        取出缓存项，不存在或已过期时调用 loader() 加载并放入缓存。
+
+        :param cache_key: 缓存键
+        :param loader: 无参数的加载函数
+        :return: 缓存的对象
+        """
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is not None:
+                value, stored_at = entry
+                if self.ttl is None or self._clock() - stored_at < self.ttl:
+                    self._entries.move_to_end(cache_key)
+                    self.hits += 1
+                    return value
+                del self._entries[cache_key]
+                self.expirations += 1
+            self.misses += 1
+
+        # 加载放在锁外进行（PBKDF2等会释放GIL），加载失败时抛出的异常不会污染缓存
+        value = loader()
+        with self._lock:
+            self._entries[cache_key] = (value, self._clock())
+            self._entries.move_to_end(cache_key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def discard_if(self, predicate):
+        """
+        删除键满足 predicate(cache_key) 的所有条目。
+
+        :param predicate: 以缓存键为参数的判断函数
+        :return: 删除的条目数
+        """
+        with self._lock:
+            stale = [key for key in self._entries if predicate(key)]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+            return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._reset_counters()
+
+    def stats(self):
+        """
+        :return: 字典 {'size', 'maxsize', 'ttl', 'hits', 'misses', 'hit_rate',
+                 'evictions', 'expirations', 'invalidations'}
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations
+            }
@@ -0,0 +1,319 @@
+# -*- coding: utf-8 -*-
+
+"""
+SM3杂凑算法提供者
+
+本地OpenSSL支持SM3时通过 hashlib.new('sm3') 调用C实现，否则回退到本模块的纯Python实现
+（按轮阶段拆分的压缩函数、预旋转的轮常量、每个哈希对象预分配的消息扩展数组）。
+导入时用标准测试向量（GB/T 32905 附录A）做一次自检，不通过则回退到纯Python实现。
+所有接口都接收和返回 bytes，调用方无需关心当前后端。
+
+可通过环境变量 CRYPTO_SM3_BACKEND=python 强制使用纯Python实现，
+用 backend_info() 查看当前生效的后端。
+"""
+
+import os
+import struct
+import hashlib
+
+BACKEND_OPENSSL = 'openssl'
+BACKEND_PYTHON = 'python'
+
+DIGEST_SIZE = 32
+BLOCK_SIZE = 64
+
+_MASK = 0xFFFFFFFF
+_IV = (0x7380166F, 0x4914B2B9, 0x172442D7, 0xDA8A0600,
+       0xA96F30BC, 0x163138AA, 0xE38DEE4D, 0xB0FB0E4E)
+
+def _rotl(x, n):
+    n %= 32
+    return ((x << n) | (x >> (32 - n))) & _MASK
+
+# 轮常量预先循环左移 j 位：T'_j = T_j <<< (j mod 32)
+_T = tuple(_rotl(0x79CC4519 if j < 16 else 0x7A879D8A, j) for j in range(64))
+
+class _PySM3:
+    """纯Python的SM3哈希对象，接口与 hashlib 对象一致（update/digest/hexdigest/copy）"""
+    name = 'sm3'
+    digest_size = DIGEST_SIZE
+    block_size = BLOCK_SIZE
+
+    def __init__(self, data=b''):
+        self._v = list(_IV)
+        self._buffer = b''
+        self._length = 0
+        # 消息扩展数组按对象预分配，处理每个分组时复用
+        self._w = [0] * 68
+        self._w1 = [0] * 64
+        if data:
+            self.update(data)
+
+    def update(self, data):
+        data = bytes(data)
+        self._length += len(data)
+        buffer = self._buffer + data
+        blocks = len(buffer) // BLOCK_SIZE
+        for i in range(blocks):
+            self._compress(buffer, i * BLOCK_SIZE)
+        self._buffer = buffer[blocks * BLOCK_SIZE:]
+
+    def copy(self):
+        other = _PySM3.__new__(_PySM3)
+        other._v = list(self._v)
+        other._buffer = self._buffer
+        other._length = self._length
+        other._w = [0] * 68
+        other._w1 = [0] * 64
+        return other
+
+    def digest(self):
+        clone = self.copy()
+        bit_length = self._length * 8
+        padding = b'\x80' + b'\x00' * ((55 - self._length) % BLOCK_SIZE) + struct.pack('>Q', bit_length)
+        clone.update(padding)
+        return struct.pack('>8I', *clone._v)
+
+    def hexdigest(self):
+        return self.digest().hex()
+
+    def _compress(self, data, offset):
+        W = self._w
+        W1 = self._w1
+        W[0:16] = struct.unpack_from('>16I', data, offset)
+        for j in range(16, 68):
+            x = W[j - 16] ^ W[j - 9]
+            w3 = W[j - 3]
+            x ^= ((w3 << 15) | (w3 >> 17)) & _MASK
+            # P1(x) = x ^ (x <<< 15) ^ (x <<< 23)
+            x = x ^ (((x << 15) | (x >> 17)) & _MASK) ^ (((x << 23) | (x >> 9)) & _MASK)
+            w13 = W[j - 13]
+            W[j] = x ^ (((w13 << 7) | (w13 >> 25)) & _MASK) ^ W[j - 6]
+        for j in range(64):
+            W1[j] = W[j] ^ W[j + 4]
+
+        A, B, C, D, E, F, G, H = self._v
+        T = _T
+        # 第0-15轮：FF = GG = 异或
+        for j in range(16):
+            a12 = ((A << 12) | (A >> 20)) & _MASK
+            ss1 = (a12 + E + T[j]) & _MASK
+            ss1 = ((ss1 << 7) | (ss1 >> 25)) & _MASK
+            tt1 = ((A ^ B ^ C) + D + (ss1 ^ a12) + W1[j]) & _MASK
+            tt2 = ((E ^ F ^ G) + H + ss1 + W[j]) & _MASK
+            D = C
+            C = ((B << 9) | (B >> 23)) & _MASK
+            B = A
+            A = tt1
+            H = G
+            G = ((F << 19) | (F >> 13)) & _MASK
+            F = E
+            E = tt2 ^ (((tt2 << 9) | (tt2 >> 23)) & _MASK) ^ (((tt2 << 17) | (tt2 >> 15)) & _MASK)
+        # 第16-63轮：FF 为多数函数，GG 为选择函数
+        for j in range(16, 64):
+            a12 = ((A << 12) | (A >> 20)) & _MASK
+            ss1 = (a12 + E + T[j]) & _MASK
+            ss1 = ((ss1 << 7) | (ss1 >> 25)) & _MASK
+            tt1 = (((A & B) | (A & C) | (B & C)) + D + (ss1 ^ a12) + W1[j]) & _MASK
+            tt2 = (((E & F) | (~E & G)) + H + ss1 + W[j]) & _MASK
+            D = C
+            C = ((B << 9) | (B >> 23)) & _MASK
+            B = A
+            A = tt1
+            H = G
+            G = ((F << 19) | (F >> 13)) & _MASK
+            F = E
+            E = tt2 ^ (((tt2 << 9) | (tt2 >> 23)) & _MASK) ^ (((tt2 << 17) | (tt2 >> 15)) & _MASK)
+
+        v = self._v
+        v[0] ^= A
+        v[1] ^= B
+        v[2] ^= C
+        v[3] ^= D
+        v[4] ^= E
+        v[5] ^= F
+        v[6] ^= G
+        v[7] ^= H
+
+def _openssl_new(data=b''):
+    return hashlib.new('sm3', data)
+
+def _openssl_available():
+    try:
+        hashlib.new('sm3')
+        return True
+    except (ValueError, TypeError):
+        return False
+
+_BACKENDS = {
+    BACKEND_PYTHON: _PySM3,
+}
+if _openssl_available():
+    _BACKENDS[BACKEND_OPENSSL] = _openssl_new
+
+_state = {
+    'name': BACKEND_PYTHON,
+    'self_test': None,
+    'reason': None
+}
+_new = _PySM3
+
+def new(data=b''):
+    """
+    创建SM3哈希对象（支持 update/digest/hexdigest/copy）。
+
+    :param data: 初始数据
+    :return: 哈希对象
+    """
+    return _new(data)
+
+def sm3_hash(data):
+    """
+    计算SM3摘要。
+
+    :param data: 输入数据 (bytes)
+    :return: 32字节摘要
+    """
+    return _new(data).digest()
+
+def kdf(z, klen):
+    """
+    SM2密钥派生函数（GB/T 32918.4 5.4.3）：K = H(Z || 1) || H(Z || 2) || ...，截取前 klen 字节。
+    Z 只吸收一次，之后每个计数器从该状态复制，长输出只需对计数器做增量哈希。
+
+    :param z: 共享秘密 Z (bytes)
+    :param klen: 输出长度（字节）
+    :return: klen 字节的密钥流
+    """
+    if klen <= 0:
+        return b''
+    prefix = _new(z)
+    blocks = []
+    for counter in range(1, (klen + DIGEST_SIZE - 1) // DIGEST_SIZE + 1):
+        h = prefix.copy()
+        h.update(counter.to_bytes(4, 'big'))
+        blocks.append(h.digest())
+    return b''.join(blocks)[:klen]
+
+# 标准测试向量（GB/T 32905-2016 附录A）
+_TEST_VECTORS = [
+    (b'abc', '66c7f0f462eeedd9d1f2d46bdc10e4e24167c4875cf2f7a2297da02b8f4ba8e0'),
+    (b'abcd' * 16, 'debe9ff92275b8a138604889c18e5a4d6fdb70e5387e5765293dcba39c0c5732'),
+]
+
+def self_test(name):
+    """
+    用标准测试向量检查指定后端，同时验证分段 update 与 copy 的结果。
+
+    :param name: 后端名称
+    :return: 是否全部通过
+    """
+    factory = _BACKENDS[name]
+    try:
+        for message, expected in _TEST_VECTORS:
+            if factory(message).hexdigest() != expected:
+                return False
+            h = factory(message[:1])
+            clone = h.copy()
+            h.update(message[1:])
+            clone.update(message[1:])
+            if h.hexdigest() != expected or clone.hexdigest() != expected:
+                return False
+        return True
+    except Exception:
+        return False
+
+def set_backend(name):
+    """
+    切换SM3后端（切换前会执行自检）。
+
+    :param name: 'openssl' 或 'python'
+    :return: 实际生效的后端名称
+    """
+    global _new
+    if name not in _BACKENDS:
+        raise ValueError(f"不可用的SM3后端: {name}. 可用后端: {list(_BACKENDS.keys())}")
+    if not self_test(name):
+        _state.update(name=BACKEND_PYTHON, self_test=False, reason=f"{name} 自检失败，已回退到纯Python实现")
+        _new = _BACKENDS[BACKEND_PYTHON]
+        return BACKEND_PYTHON
+    _state.update(name=name, self_test=True, reason=None)
+    _new = _BACKENDS[name]
+    return name
+
+def available_backends():
+    """
+    返回当前环境可用的后端名称列表。
+    """
+    return list(_BACKENDS.keys())
+
+def backend_info():
+    """
+    返回当前SM3后端信息。
+
+    :return: 字典 {'name': 后端名称, 'self_test': 自检是否通过, 'reason': 回退原因（无则为None）, 'available': 可用后端}
+    """
+    return {
+        'name': _state['name'],
+        'self_test': _state['self_test'],
+        'reason': _state['reason'],
+        'available': available_backends()
+    }
+
+def _select_default():
+    requested = os.environ.get('CRYPTO_SM3_BACKEND', '').strip().lower()
+    if requested:
+        if requested in _BACKENDS:
+            return set_backend(requested)
+        set_backend(BACKEND_PYTHON)
+        _state['reason'] = f"请求的后端 {requested} 不可用"
+        return BACKEND_PYTHON
+    if BACKEND_OPENSSL in _BACKENDS:
+        return set_backend(BACKEND_OPENSSL)
+    set_backend(BACKEND_PYTHON)
+    _state['reason'] = "本地OpenSSL不支持SM3"
+    return BACKEND_PYTHON
+
+_select_default()
+
+if __name__ == '__main__':
+    import time
+    from gmssl import sm3 as gmssl_sm3, func
+
+    print("=== SM3 提供者自检 ===")
+    info = backend_info()
+    print(f"当前后端: {info['name']} (自检: {info['self_test']})")
+    if info['reason']:
+        print(f"说明: {info['reason']}")
+
+    # KDF 与 gmssl 交叉验证
+    z = os.urandom(64)
+    for klen in (1, 32, 33, 1000):
+        assert kdf(z, klen).hex() == gmssl_sm3.sm3_kdf(z.hex().encode('utf8'), klen)
+    print("✅ KDF 输出与 gmssl 一致")
+
+    def bench(func_, iterations):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            func_()
+        return (time.perf_counter() - start) / iterations * 1e6
+
+    print("\n--- 微基准（单次耗时，微秒） ---")
+    for size in (32, 1024, 16 * 1024):
+        data = os.urandom(size)
+        iterations = max(5, 20000 // (size // 32 + 1))
+        row = [f"SM3 {size}B:"]
+        for name in available_backends():
+            set_backend(name)
+            row.append(f"{name} {bench(lambda: sm3_hash(data), iterations):.1f}")
+        row.append(f"gmssl {bench(lambda: gmssl_sm3.sm3_hash(func.bytes_to_list(data)), max(3, iterations // 20)):.1f}")
+        print("  ".join(row))
+    for klen in (32, 1024):
+        row = [f"KDF 输出{klen}B:"]
+        for name in available_backends():
+            set_backend(name)
+            row.append(f"{name} {bench(lambda: kdf(z, klen), 200):.1f}")
+        z_hex = z.hex().encode('utf8')
+        row.append(f"gmssl {bench(lambda: gmssl_sm3.sm3_kdf(z_hex, klen), 20):.1f}")
+        print("  ".join(row))
+    _select_default()
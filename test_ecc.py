@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+
+"""
+ECC (ECIES) 扩展功能测试脚本
+
+覆盖在基础加解密之上新增的接口：
+1. 解析密钥的LRU缓存
+2. native 与 eciespy 两种引擎及压缩临时公钥
+3. 后台临时密钥池
+4. 多接收方信封
+5. 流式加解密（截断、重排、追加与超大块大小的检测）
+
+可直接运行（python test_ecc.py），也可由 pytest 收集。
+"""
+
+import io
+import os
+import sys
+
+# 添加src目录到路径
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+import ecies
+
+from src.pke import ecc_scheme as ecc
+
+MESSAGE = b"This is a much longer secret message for ECIES, which can handle large data!"
+
+def _expect_value_error(func, *args, **kwargs):
+    try:
+        func(*args, **kwargs)
+    except ValueError:
+        return
+    raise AssertionError(f"{func.__name__} 应抛出 ValueError")
+
+def test_key_cache():
+    private_key, public_key = ecc.generate_keys()
+    ecc.clear_key_cache(maxsize=2)
+    try:
+        assert ecc.load_public_key(public_key) is ecc.load_public_key(public_key)
+        assert ecc.load_public_key(public_key.removeprefix('0x')) is ecc.load_public_key(public_key)
+        ecc.decrypt(private_key, ecc.encrypt(public_key, MESSAGE))
+        ecc.load_public_key(ecc.generate_keys()[1])
+        stats = ecc.key_cache_info()
+        assert stats['hits'] >= 2 and stats['size'] == 2 and stats['evictions'] >= 1
+    finally:
+        ecc.clear_key_cache(maxsize=ecc.DEFAULT_KEY_CACHE_SIZE)
+
+def test_engines_and_compressed_keys():
+    private_key, public_key = ecc.generate_keys()
+    for engine in ecc.ENGINES:
+        for compressed in (False, True):
+            ciphertext = ecc.encrypt(public_key, MESSAGE, engine=engine, compressed=compressed)
+            assert len(ciphertext) == len(MESSAGE) + ecc.ciphertext_overhead(engine, compressed)
+            assert ecc.decrypt(private_key, ciphertext) == MESSAGE
+    # eciespy 引擎与 ecies 库互通
+    assert ecies.decrypt(private_key, ecc.encrypt(public_key, MESSAGE, engine='eciespy')) == MESSAGE
+    assert ecc.decrypt(private_key, ecies.encrypt(public_key, MESSAGE)) == MESSAGE
+    assert ecc.expansion_ratio(100, compressed=True) < ecc.expansion_ratio(100)
+    _expect_value_error(ecc.encrypt, public_key, MESSAGE, engine='rsa')
+
+def test_ephemeral_pool():
+    private_key, public_key = ecc.generate_keys()
+    ecc.start_ephemeral_pool(depth=16, workers=2)
+    try:
+        ciphertexts = [ecc.encrypt(public_key, MESSAGE) for _ in range(32)]
+        stats = ecc.ephemeral_pool_stats()
+    finally:
+        ecc.stop_ephemeral_pool()
+    assert stats['depth'] == 16 and stats['consumed'] + stats['fallbacks'] == 32
+    # 每个临时密钥只使用一次
+    assert len({ciphertext[1:66] for ciphertext in ciphertexts}) == 32
+    assert all(ecc.decrypt(private_key, ciphertext) == MESSAGE for ciphertext in ciphertexts)
+    assert ecc.ephemeral_pool_stats() is None
+
+def test_multi_recipient_envelope():
+    keypairs = [ecc.generate_keys() for _ in range(5)]
+    envelope = ecc.encrypt_multi([public_key for _, public_key in keypairs], MESSAGE)
+    for private_key, _ in keypairs:
+        assert ecc.decrypt_multi(private_key, envelope) == MESSAGE
+    outsider, _ = ecc.generate_keys()
+    _expect_value_error(ecc.decrypt_multi, outsider, envelope)
+    tampered = bytearray(envelope)
+    tampered[-1] ^= 1
+    _expect_value_error(ecc.decrypt_multi, keypairs[0][0], bytes(tampered))
+
+def _encrypted_stream(public_key, data, chunk_size):
+    output = io.BytesIO()
+    ecc.encrypt_stream(public_key, io.BytesIO(data), output, chunk_size=chunk_size)
+    return output.getvalue()
+
+def _decrypt_stream(private_key, stream, **kwargs):
+    output = io.BytesIO()
+    ecc.decrypt_stream(private_key, io.BytesIO(stream), output, **kwargs)
+    return output.getvalue()
+
+def test_stream_round_trip():
+    private_key, public_key = ecc.generate_keys()
+    for size in (0, 1, 1024, 4096, 10000):
+        data = os.urandom(size)
+        assert _decrypt_stream(private_key, _encrypted_stream(public_key, data, 1024)) == data
+
+def test_stream_rejects_truncation_and_reordering():
+    private_key, public_key = ecc.generate_keys()
+    chunk_size = 1024
+    stream = _encrypted_stream(public_key, os.urandom(4 * chunk_size + 100), chunk_size)
+    header_size = ecc._STREAM_HEADER_SIZE
+    block_size = chunk_size + ecc.TAG_SIZE
+    header, body = stream[:header_size], stream[header_size:]
+    blocks = [body[i:i + block_size] for i in range(0, len(body), block_size)]
+    assert len(blocks) == 5
+
+    # 在块边界处截断：倒数第二块没有"最后一块"标记
+    _expect_value_error(_decrypt_stream, private_key, header + b''.join(blocks[:2]))
+    # 截断在块中间
+    _expect_value_error(_decrypt_stream, private_key, stream[:-50])
+    # 只剩头部
+    _expect_value_error(_decrypt_stream, private_key, header)
+    # 交换前两块
+    _expect_value_error(_decrypt_stream, private_key, header + blocks[1] + blocks[0] + b''.join(blocks[2:]))
+    # 在末尾追加一块
+    _expect_value_error(_decrypt_stream, private_key, stream + blocks[1])
+
+def test_stream_max_chunk_size():
+    private_key, public_key = ecc.generate_keys()
+    data = os.urandom(5000)
+    stream = _encrypted_stream(public_key, data, 4096)
+    _expect_value_error(_decrypt_stream, private_key, stream, max_chunk_size=1024)
+    assert _decrypt_stream(private_key, stream, max_chunk_size=4096) == data
+    # 未认证头部中伪造的超大块大小在分配缓冲区之前被拒绝
+    forged = stream[:4] + (0xFFFFFFFF).to_bytes(4, 'big') + stream[8:]
+    _expect_value_error(_decrypt_stream, private_key, forged)
+
+def main():
+    tests = [(name, func) for name, func in globals().items() if name.startswith('test_') and callable(func)]
+    for name, func in tests:
+        func()
+        print(f"✅ {name}")
+    print(f"🎉 {len(tests)} 项ECC测试全部通过")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+
+"""
+ElGamal 扩展功能测试脚本
+
+覆盖在基础加解密之上新增的接口：
+1. 内置群参数、固定基预计算表与后台随机数池（并发建表只构建一次）
+2. decrypt_many 批量解密与错误隔离
+3. 素数阶子群模式（私钥范围、子群成员检查）
+4. 混合加密（KEM/DEM）与篡改检测
+5. 加法同态聚合
+6. 定长二进制编码与旧格式兼容
+7. 批量密钥生成（跨进程传递密钥）
+
+可直接运行（python test_elgamal.py），也可由 pytest 收集。
+"""
+
+import os
+import sys
+import pickle
+import tempfile
+import threading
+
+# 添加src目录到路径
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from src.pke import elgamal_scheme as elgamal
+
+MESSAGE = b"MinsaPay transaction #42"
+
+_keys = {}
+
+def _keypair(subgroup=False):
+    """同一测试进程内复用密钥对"""
+    if subgroup not in _keys:
+        _keys[subgroup] = elgamal.generate_keys(subgroup=subgroup, verbose=False)
+    return _keys[subgroup]
+
+def test_builtin_parameter_sets():
+    sets = elgamal.list_parameter_sets()
+    assert {'modp2048', 'ffdhe2048', 'modp2048_256'} <= set(sets)
+    private_key, public_key = _keypair()
+    assert public_key.parameter_set == elgamal.DEFAULT_PARAMETER_SETS[2048]
+    assert 2 <= private_key.x <= public_key.p - 2
+    assert elgamal.decrypt(private_key, elgamal.encrypt(public_key, MESSAGE)) == MESSAGE
+
+def test_precompute_built_once_under_concurrency():
+    _, public_key = elgamal.generate_keys(verbose=False)
+    built = []
+    original_init = elgamal.FixedBaseTable.__init__
+
+    def counting_init(self, *args, **kwargs):
+        built.append(args[0])
+        original_init(self, *args, **kwargs)
+
+    elgamal.FixedBaseTable.__init__ = counting_init
+    try:
+        pool = elgamal.start_randomness_pool(public_key, low_watermark=4, high_watermark=32, workers=4)
+        threads = [threading.Thread(target=lambda: [elgamal.encrypt(public_key, MESSAGE) for _ in range(20)])
+                   for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        stats = pool.stats()
+        elgamal.stop_randomness_pool(public_key)
+    finally:
+        elgamal.FixedBaseTable.__init__ = original_init
+    # g 和 y 各一张表
+    assert len(built) == 2, built
+    assert stats['produced'] > 0 and stats['high_watermark'] == 32
+    assert elgamal.precomputation_info(public_key)['built']
+
+def test_decrypt_many_isolates_errors():
+    private_key, public_key = _keypair()
+    batch = [elgamal.encrypt(public_key, f"record-{i}".encode()) for i in range(8)]
+    batch.insert(3, b"\x00\x00\x00\x05bad")
+    results = elgamal.decrypt_many(private_key, batch)
+    assert len(results) == 9
+    assert results[3]['error'] is not None and results[3]['plaintext'] is None
+    assert [r['plaintext'] for r in results if r['error'] is None] == [f"record-{i}".encode() for i in range(8)]
+
+def test_subgroup_mode():
+    private_key, public_key = _keypair(subgroup=True)
+    assert public_key.q.bit_length() == 256
+    assert 1 <= private_key.x < public_key.q
+    assert elgamal.decrypt(private_key, elgamal.encrypt(public_key, MESSAGE)) == MESSAGE
+    # p-1 的阶为2，不在q阶子群中
+    c1_bytes = elgamal.long_to_bytes(public_key.p - 1)
+    forged = len(c1_bytes).to_bytes(4, 'big') + c1_bytes + (1).to_bytes(4, 'big') + b"\x00"
+    try:
+        elgamal.decrypt(private_key, forged)
+        raise AssertionError("子群外的c1应被拒绝")
+    except ValueError:
+        pass
+
+def test_hybrid_round_trip_and_tamper():
+    private_key, public_key = _keypair()
+    data = os.urandom(100000)
+    ciphertext = elgamal.encrypt_hybrid(public_key, data)
+    assert elgamal.decrypt_hybrid(private_key, ciphertext) == data
+    tampered = bytearray(ciphertext)
+    tampered[-1] ^= 1
+    try:
+        elgamal.decrypt_hybrid(private_key, bytes(tampered))
+        raise AssertionError("应检测到混合密文被篡改")
+    except ValueError:
+        pass
+
+def test_additive_aggregation():
+    private_key, public_key = _keypair(subgroup=True)
+    values = [500, 70, 25, 1000, 3]
+    total = elgamal.add_ciphertexts(public_key, *[elgamal.encrypt_additive(public_key, v) for v in values])
+    with tempfile.TemporaryDirectory() as cache_dir:
+        assert elgamal.decrypt_additive(private_key, total, bound=2 ** 16, cache_dir=cache_dir) == sum(values)
+        assert len(os.listdir(cache_dir)) == 1
+
+        # 位数相同的两个上界各自保存一个文件，交替使用时不会重建或互相覆盖
+        for bound in (100000, 120000):
+            assert elgamal.decrypt_additive(private_key, total, bound=bound, cache_dir=cache_dir) == sum(values)
+        files = sorted(os.listdir(cache_dir))
+        assert len(files) == 3 and any(name.endswith('_100000.bin') for name in files)
+        mtimes = {name: os.stat(os.path.join(cache_dir, name)).st_mtime_ns for name in files}
+        for bound in (100000, 120000, 100000):
+            table = elgamal.get_dlog_table(private_key, bound, cache_dir)
+            assert table.bound == bound
+            # 清空进程内缓存，模拟重启后从磁盘加载
+            elgamal._dlog_tables.clear()
+            reloaded = elgamal.get_dlog_table(private_key, bound, cache_dir)
+            assert reloaded.bound == bound and reloaded is not table
+        assert {name: os.stat(os.path.join(cache_dir, name)).st_mtime_ns for name in files} == mtimes
+    try:
+        elgamal.encrypt_additive(public_key, -1)
+        raise AssertionError("负数应被拒绝")
+    except ValueError:
+        pass
+
+def test_codec_round_trip():
+    for subgroup in (False, True):
+        private_key, public_key = _keypair(subgroup)
+        for key in (public_key, private_key):
+            restored = elgamal.import_key_b64(elgamal.export_key_b64(key))
+            assert (restored.p, restored.g, restored.y, restored.x, restored.q) == (key.p, key.g, key.y, key.x, key.q)
+    private_key, public_key = _keypair()
+    legacy = elgamal.encrypt(public_key, MESSAGE, wire='legacy')
+    fixed = elgamal.encrypt(public_key, MESSAGE)
+    assert fixed[0] == elgamal.WIRE_FIXED
+    assert elgamal.decrypt(private_key, legacy) == elgamal.decrypt(private_key, fixed) == MESSAGE
+
+def test_generate_keys_many():
+    keypairs = elgamal.generate_keys_many(3, workers=2)
+    assert len({public_key.y for _, public_key in keypairs}) == 3
+    for private_key, public_key in keypairs:
+        assert elgamal.decrypt(private_key, elgamal.encrypt(public_key, MESSAGE)) == MESSAGE
+    # 密钥可以pickle（锁与预计算表不随密钥传递）
+    private_key, public_key = _keypair()
+    elgamal.precompute(public_key)
+    restored = pickle.loads(pickle.dumps(public_key))
+    assert restored._fixed_base is None
+    assert elgamal.decrypt(private_key, elgamal.encrypt(restored, MESSAGE)) == MESSAGE
+
+def main():
+    tests = [(name, func) for name, func in globals().items() if name.startswith('test_') and callable(func)]
+    for name, func in tests:
+        func()
+        print(f"✅ {name}")
+    print(f"🎉 {len(tests)} 项ElGamal测试全部通过")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+
+"""
+IBE身份密钥管理测试脚本
+
+对三种IBE方案分别测试：
+1. 身份密钥缓存：命中缓存，setup() 更换主密钥后旧条目失效
+2. 持久化存储：进程重启并恢复主密钥后直接取回，槽位损坏时按未命中重新派生
+3. KDF档位：私钥与密文档位不一致时报错，未登记或成本过高的档位被拒绝
+4. 批量提取（extract_many）与Web接口的参数校验
+
+可直接运行（python test_ibe_keys.py），也可由 pytest 收集。
+"""
+
+import os
+import sys
+import tempfile
+
+# 添加src目录到路径
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from src.ibe.boneh_franklin_scheme_simple import SimpleBonehFranklinIBE
+from src.ibe.boneh_boyen_scheme import BonehBoyenIBE
+from src.ibe.sakai_kasahara_scheme import SakaiKasaharaIBE
+from src.ibe.key_cache import key_cache_info, clear_key_cache
+from src.ibe.key_store import IdentityKeyStore, SLOT_SIZE
+
+SCHEMES = (SimpleBonehFranklinIBE, BonehBoyenIBE, SakaiKasaharaIBE)
+IDENTITIES = [f"DOC{i:04d}@cardiology.hospital.com" for i in range(10)]
+
+def _expect_value_error(func, *args, **kwargs):
+    try:
+        func(*args, **kwargs)
+    except ValueError:
+        return
+    raise AssertionError(f"{func.__name__} 应抛出 ValueError")
+
+def test_cache_invalidated_on_setup():
+    for scheme_class in SCHEMES:
+        clear_key_cache()
+        pkg = scheme_class(kdf_profile='interactive')
+        pkg.setup()
+        first = pkg.extract(IDENTITIES[0])
+        assert pkg.extract(IDENTITIES[0]) == first
+        assert key_cache_info()['hits'] == 1
+        # 返回的是副本，调用方修改不会污染缓存
+        first['private_key'] = 'tampered'
+        assert pkg.extract(IDENTITIES[0])['private_key'] != 'tampered'
+
+        pkg.setup()
+        assert key_cache_info()['invalidations'] == 1
+        assert pkg.extract(IDENTITIES[0])['private_key'] != first['private_key']
+        # 另一个实例的 setup() 不影响当前实例的缓存
+        other = scheme_class(kdf_profile='interactive')
+        other.setup()
+        hits = key_cache_info()['hits']
+        pkg.extract(IDENTITIES[0])
+        assert key_cache_info()['hits'] == hits + 1
+
+def test_key_store_round_trip():
+    for scheme_class in SCHEMES:
+        with tempfile.TemporaryDirectory() as store_dir:
+            pkg = scheme_class(key_store_dir=store_dir, kdf_profile='interactive')
+            master = pkg.setup()
+            original = [pkg.extract(identity) for identity in IDENTITIES]
+            assert len(pkg._key_store) == len(IDENTITIES)
+            pkg.close_key_store()
+
+            # 模拟进程重启：清空内存缓存，从 setup 结果恢复主密钥
+            clear_key_cache()
+            restarted = scheme_class(key_store_dir=store_dir, kdf_profile='interactive')
+            restarted.setup(restore_from=master)
+            assert [restarted.extract(identity) for identity in IDENTITIES] == original
+            assert restarted._key_store.stats()['hits'] == len(IDENTITIES)
+            message = restarted.encrypt(IDENTITIES[0], "warm restart")
+            assert restarted.decrypt(original[0], message) == b"warm restart"
+
+            # 新主密钥使用新的存储文件
+            restarted.setup()
+            assert len(restarted._key_store) == 0
+            restarted.close_key_store()
+            assert len(os.listdir(store_dir)) == 2
+
+def test_key_store_growth_and_wrong_master():
+    with tempfile.TemporaryDirectory() as store_dir:
+        secrets = (os.urandom(32),)
+        with IdentityKeyStore(store_dir, 'TEST-IBE', secrets, capacity=16) as store:
+            for i in range(100):
+                assert store.put(f"user{i}", {'identity': f"user{i}", 'private_key': f"{i:064x}"})
+            assert len(store) == 100 and store.capacity >= 128
+        with IdentityKeyStore(store_dir, 'TEST-IBE', secrets) as store:
+            assert all(store.get(f"user{i}")['private_key'] == f"{i:064x}" for i in range(100))
+            assert store.get("nobody") is None
+        # 文件内容属于另一个主密钥（例如被误拷贝）时拒绝打开
+        path = os.path.join(store_dir, os.listdir(store_dir)[0])
+        other_secrets = (os.urandom(32),)
+        IdentityKeyStore(store_dir, 'TEST-IBE', other_secrets).close()
+        other_path = next(os.path.join(store_dir, name) for name in os.listdir(store_dir)
+                          if os.path.join(store_dir, name) != path)
+        os.replace(path, other_path)
+        _expect_value_error(IdentityKeyStore, store_dir, 'TEST-IBE', other_secrets)
+
+def test_key_store_corrupted_slot():
+    for scheme_class in SCHEMES:
+        with tempfile.TemporaryDirectory() as store_dir:
+            pkg = scheme_class(key_store_dir=store_dir, kdf_profile='interactive')
+            pkg.setup()
+            expected = pkg.extract(IDENTITIES[0])
+            store = pkg._key_store
+            offset, found = store._probe(store._digest(f"{pkg.kdf_profile.id}|{IDENTITIES[0]}"))
+            assert found
+            # 模拟崩溃时写了一半的槽位
+            store._map[offset + SLOT_SIZE - 40:offset + SLOT_SIZE] = bytes(40)
+
+            clear_key_cache()
+            assert pkg.extract(IDENTITIES[0]) == expected
+            stats = store.stats()
+            assert stats['corrupted'] == 1 and stats['entries'] == 1
+            # 重新派生后槽位已被覆盖
+            clear_key_cache()
+            assert pkg.extract(IDENTITIES[0]) == expected
+            assert store.stats()['hits'] == 1
+            pkg.close_key_store()
+
+def test_kdf_profile_mismatch():
+    for scheme_class in SCHEMES:
+        pkg = scheme_class(kdf_profile='bulk')
+        pkg.setup()
+        archived = pkg.encrypt(IDENTITIES[1], "bulk record")
+        assert archived['kdf_profile'] == pkg.kdf_profile.id
+        pkg.set_kdf_profile('interactive')
+        key = pkg.extract(IDENTITIES[1])
+        assert key['kdf_profile'] != archived['kdf_profile']
+        _expect_value_error(pkg.decrypt, key, archived)
+        key = pkg.extract(IDENTITIES[1], kdf_profile=archived['kdf_profile'])
+        assert pkg.decrypt(key, archived) == b"bulk record"
+
+def test_kdf_profile_untrusted_ids_rejected():
+    for scheme_class in SCHEMES:
+        pkg = scheme_class(kdf_profile='interactive')
+        pkg.setup()
+        # 密文中的档位ID只接受已登记的档位
+        _expect_value_error(pkg.extract, IDENTITIES[0], kdf_profile='forged:pbkdf2:2000000000')
+        _expect_value_error(pkg.extract, IDENTITIES[0], kdf_profile='not-a-profile')
+        # 调用方自己登记的档位也有成本上限
+        _expect_value_error(pkg.register_kdf_profile, 'huge:pbkdf2:2000000000')
+        custom = pkg.register_kdf_profile('custom:pbkdf2:1000')
+        assert pkg.extract(IDENTITIES[0], kdf_profile=custom.id)['kdf_profile'] == custom.id
+        assert pkg.kdf_profile.name == 'interactive'
+
+def test_extract_many():
+    for scheme_class in SCHEMES:
+        pkg = scheme_class(kdf_profile='interactive')
+        pkg.setup()
+        for workers in (1, 4):
+            results = list(pkg.extract_many(IDENTITIES + [None], workers=workers))
+            assert len(results) == len(IDENTITIES) + 1
+            failed = [item for item in results if item['error'] is not None]
+            assert len(failed) == 1 and failed[0]['identity'] is None and failed[0]['key'] is None
+            keys = {item['identity']: item['key'] for item in results if item['error'] is None}
+            assert set(keys) == set(IDENTITIES)
+            assert all(keys[identity] == pkg.extract(identity) for identity in IDENTITIES)
+
+def test_app_extract_many_validation():
+    from app import app, ibe_systems
+    client = app.test_client()
+    saved = os.environ.get('CRYPTO_IBE_KEY_STORE')
+    with tempfile.TemporaryDirectory() as store_dir:
+        # 主密钥文件与存储写入临时目录，不影响开发环境中配置的存储
+        os.environ['CRYPTO_IBE_KEY_STORE'] = store_dir
+        try:
+            assert client.post('/api/ibe/setup', json={'scheme': 'boneh_franklin'}).status_code == 200
+            for workers in ("4", True, 0, -1, 1.5):
+                response = client.post('/api/ibe/extract_many', json={
+                    'scheme': 'boneh_franklin', 'identities': IDENTITIES[:2], 'workers': workers})
+                assert response.status_code == 400, workers
+            response = client.post('/api/ibe/extract_many', json={
+                'scheme': 'boneh_franklin', 'identities': IDENTITIES[:2], 'workers': 10 ** 9})
+            assert response.status_code == 200
+            assert len(response.get_data(as_text=True).splitlines()) == 2
+
+            # 服务重启后 setup 恢复同一主密钥
+            ibe_systems.pop('boneh_franklin')['ibe_instance'].close_key_store()
+            response = client.post('/api/ibe/setup', json={'scheme': 'boneh_franklin'})
+            assert response.get_json()['restored'] is True
+        finally:
+            system = ibe_systems.pop('boneh_franklin', None)
+            if system is not None:
+                system['ibe_instance'].close_key_store()
+            if saved is None:
+                os.environ.pop('CRYPTO_IBE_KEY_STORE', None)
+            else:
+                os.environ['CRYPTO_IBE_KEY_STORE'] = saved
+
+def main():
+    tests = [(name, func) for name, func in globals().items() if name.startswith('test_') and callable(func)]
+    for name, func in tests:
+        func()
+        print(f"✅ {name}")
+    print(f"🎉 {len(tests)} 项IBE身份密钥测试全部通过")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+
+"""
+国密 SM2/SM3/SM4 扩展功能测试脚本
+
+覆盖在基础加解密之上新增的接口：
+1. SM3 提供者（标准向量、各后端一致、KDF 与 gmssl 一致）与 SM4 分组/CTR
+2. SM2 加解密与 gmssl 的 C1C3C2 格式互通
+3. SM2Encryptor / SM2Decryptor 批量加解密与错误隔离
+4. SM2 签名、验签、批量验签（与 gmssl 互通）
+5. SM2 + SM4 批量混合加密（篡改与 AAD 不一致的检测）
+
+可直接运行（python test_sm2_scheme.py），也可由 pytest 收集。
+"""
+
+import os
+import sys
+
+# 添加src目录到路径
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from gmssl import sm3 as gmssl_sm3
+from gmssl.sm2 import CryptSM2
+from gmssl.sm4 import CryptSM4, SM4_ENCRYPT
+
+from src.pke import sm2_scheme as sm2
+from src.utils import sm3_provider, sm4_cipher
+
+MESSAGE = b"SM2 test message for MinsaPay"
+
+def _expect_value_error(func, *args, **kwargs):
+    try:
+        func(*args, **kwargs)
+    except ValueError:
+        return
+    raise AssertionError(f"{func.__name__} 应抛出 ValueError")
+
+def test_sm3_backends():
+    expected = '66c7f0f462eeedd9d1f2d46bdc10e4e24167c4875cf2f7a2297da02b8f4ba8e0'
+    current = sm3_provider.backend_info()['name']
+    try:
+        for backend in sm3_provider.available_backends():
+            assert sm3_provider.set_backend(backend) == backend
+            assert sm3_provider.sm3_hash(b'abc').hex() == expected
+            z = os.urandom(64)
+            for klen in (1, 32, 33, 1000):
+                assert sm3_provider.kdf(z, klen).hex() == gmssl_sm3.sm3_kdf(z.hex().encode('utf8'), klen)
+    finally:
+        sm3_provider.set_backend(current)
+    _expect_value_error(sm3_provider.set_backend, 'md5')
+
+def test_sm4_cipher():
+    # GB/T 32907-2016 附录A 示例1
+    key = bytes.fromhex('0123456789abcdeffedcba9876543210')
+    cipher = sm4_cipher.SM4(key)
+    assert cipher.encrypt_block(key).hex() == '681edf34d206965e86b3e94f536e4246'
+    assert cipher.decrypt_block(bytes.fromhex('681edf34d206965e86b3e94f536e4246')) == key
+
+    key = os.urandom(sm4_cipher.KEY_SIZE)
+    data = os.urandom(sm4_cipher.BLOCK_SIZE * 8)
+    cipher = sm4_cipher.SM4(key)
+    gm = CryptSM4()
+    gm.set_key(key, SM4_ENCRYPT)
+    assert b''.join(cipher.encrypt_block(data[i:i + 16]) for i in range(0, len(data), 16)) == gm.crypt_ecb(data)[:len(data)]
+
+    nonce = os.urandom(sm4_cipher.CTR_NONCE_SIZE)
+    for size in (0, 1, 16, 100):
+        payload = os.urandom(size)
+        assert cipher.ctr_xor(nonce, cipher.ctr_xor(nonce, payload)) == payload
+    _expect_value_error(cipher.ctr_xor, b'short', data)
+
+def test_encrypt_gmssl_interop():
+    private_key, public_key = sm2.generate_keys()
+    ciphertext = sm2.encrypt(public_key, MESSAGE)
+    assert len(ciphertext) == sm2.C1_SIZE + sm2.C3_SIZE + len(MESSAGE)
+    assert sm2.decrypt(private_key, ciphertext) == MESSAGE
+    # gmssl 的 C1 不带04前缀
+    gmssl_sm2 = CryptSM2(private_key=private_key, public_key=public_key, mode=1)
+    assert gmssl_sm2.decrypt(ciphertext[1:]) == MESSAGE
+    assert sm2.decrypt(private_key, b'\x04' + gmssl_sm2.encrypt(MESSAGE)) == MESSAGE
+    tampered = bytearray(ciphertext)
+    tampered[-1] ^= 1
+    _expect_value_error(sm2.decrypt, private_key, bytes(tampered))
+
+def test_encryptor_decrypt_many():
+    private_key, public_key = sm2.generate_keys()
+    messages = [f"record-{i}".encode() for i in range(6)]
+    for precompute in (True, False):
+        ciphertexts = sm2.SM2Encryptor(public_key, precompute=precompute).encrypt_many(messages)
+        ciphertexts.insert(2, b'\x04' + bytes(10))
+        results = sm2.SM2Decryptor(private_key).decrypt_many(ciphertexts)
+        assert results[2]['plaintext'] is None and results[2]['error']
+        assert [r['plaintext'] for r in results if r['error'] is None] == messages
+
+def test_sign_verify():
+    private_key, public_key = sm2.generate_keys()
+    signature = sm2.sign(private_key, MESSAGE)
+    assert len(signature) == sm2.SIGNATURE_SIZE
+    assert sm2.verify(public_key, MESSAGE, signature)
+    assert sm2.verify(public_key, MESSAGE, signature.hex())
+    assert not sm2.verify(public_key, MESSAGE + b'!', signature)
+    assert not sm2.verify(public_key, MESSAGE, signature, user_id=b'someone-else')
+    # 与 gmssl 互通
+    gmssl_sm2 = CryptSM2(private_key=private_key, public_key=public_key, mode=1)
+    assert gmssl_sm2.verify_with_sm3(signature.hex(), MESSAGE)
+    assert sm2.verify(public_key, MESSAGE, gmssl_sm2.sign_with_sm3(MESSAGE))
+
+def test_verify_many():
+    private_key, public_key = sm2.generate_keys()
+    messages = [f"tx-{i}".encode() for i in range(8)]
+    signatures = sm2.SM2Signer(private_key).sign_many(messages)
+    signatures[3] = signatures[4]
+    signatures[5] = b'\x00' * sm2.SIGNATURE_SIZE
+    expected = [True] * 8
+    expected[3] = expected[5] = False
+    assert sm2.verify_many(public_key, messages, signatures) == expected
+    assert sm2.SM2Verifier(public_key, precompute=False).verify_many(messages, signatures) == expected
+    _expect_value_error(sm2.verify_many, public_key, messages, signatures[:-1])
+
+def test_sm4_batch():
+    private_key, public_key = sm2.generate_keys()
+    records = [os.urandom(size) for size in (0, 1, 16, 100, 1000)]
+    header, ciphertexts = sm2.encrypt_batch(public_key, records, aad=b'amount')
+    assert len(header) == sm2.BATCH_HEADER_SIZE
+    assert all(len(c) == len(r) + sm2.BATCH_RECORD_OVERHEAD for c, r in zip(ciphertexts, records))
+    assert sm2.decrypt_batch(private_key, header, ciphertexts, aad=b'amount') == records
+
+    # AAD 不一致
+    _expect_value_error(sm2.decrypt_batch, private_key, header, ciphertexts, aad=b'merchant')
+    # 篡改单条记录只影响该记录
+    tampered = list(ciphertexts)
+    tampered[2] = tampered[2][:-1] + bytes([tampered[2][-1] ^ 1])
+    results = sm2.SM4BatchDecryptor(private_key, header).decrypt_many(tampered, aad=b'amount')
+    assert results[2]['plaintext'] is None and results[2]['error']
+    assert [r['plaintext'] for i, r in enumerate(results) if i != 2] == records[:2] + records[3:]
+    # 记录不能跨批次使用
+    other_header, _ = sm2.encrypt_batch(public_key, [], aad=b'amount')
+    _expect_value_error(sm2.SM4BatchDecryptor(private_key, other_header).decrypt, ciphertexts[1], b'amount')
+    _expect_value_error(sm2.SM4BatchDecryptor, private_key, b'SM4B' + header[4:-1])
+
+def main():
+    tests = [(name, func) for name, func in globals().items() if name.startswith('test_') and callable(func)]
+    for name, func in tests:
+        func()
+        print(f"✅ {name}")
+    print(f"🎉 {len(tests)} 项国密测试全部通过")
+
+if __name__ == '__main__':
+    main()